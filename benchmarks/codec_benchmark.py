@@ -0,0 +1,100 @@
+"""Benchmark of the compression payload codec on agent workflow payloads.
+
+Builds a synthetic conversation growing by one tool-using turn at a time and
+encodes the LLMCallInput that the workflow would send at each turn, reporting
+the bytes saved and the CPU cost of encoding and decoding per turn.
+
+zstd is skipped unless the zstd extra is installed (uv sync --extra zstd).
+
+Usage:
+    uv run python -m benchmarks.codec_benchmark --turns 50
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import Dict, List
+
+from temporalio.converter import DataConverter
+
+from temporal.agent.codec import CompressionCodec, zstandard
+from temporal.agent.llm_manager import LLMCallInput
+
+WORDS = (
+    "workflow activity worker task queue retry timeout signal query update history "
+    "replay deterministic schedule heartbeat namespace child cancel event payload"
+).split()
+
+def tool_result(rng: random.Random, size: int) -> str:
+    """Generate a tool result resembling search results of the given size."""
+    lines = []
+    while sum(len(line) for line in lines) < size:
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20)))
+        lines.append(f'{{"channel": "#eng-{rng.randint(1, 40)}", "ts": "{rng.randint(10**9, 2 * 10**9)}", "text": "{text}"}}')
+    return "\n".join(lines)
+
+def conversation_turn(rng: random.Random, turn: int, result_size: int) -> List[Dict]:
+    """Generate the contents of one user turn calling one tool."""
+    return [
+        {"role": "user", "parts": [{"text": f"Question {turn}: how does the {rng.choice(WORDS)} work?"}]},
+        {"role": "model", "parts": [{"function_call": {"name": "search_slack", "args": {"query": rng.choice(WORDS)}}}]},
+        {"role": "user", "parts": [{"function_response": {"name": "search_slack", "response": {"content": tool_result(rng, result_size)}}}]},
+        {"role": "model", "parts": [{"text": " ".join(rng.choice(WORDS) for _ in range(80))}]},
+    ]
+
+async def benchmark(algorithm: str, turns: int, result_size: int) -> None:
+    rng = random.Random(42)
+    codec = CompressionCodec(algorithm=algorithm)
+    converter = DataConverter.default.payload_converter
+
+    contents: List[Dict] = []
+    total_raw = total_encoded = 0
+    total_encode = total_decode = 0.0
+
+    print(f"\n{algorithm} (threshold {codec.threshold} bytes)")
+    print(f"{'turn':>5} {'raw KB':>10} {'encoded KB':>11} {'saved':>7} {'encode ms':>10} {'decode ms':>10}")
+    for turn in range(1, turns + 1):
+        contents.extend(conversation_turn(rng, turn, result_size))
+        payloads = converter.to_payloads([LLMCallInput(agent_name="root-agent", contents=contents)])
+
+        start = time.process_time()
+        encoded = await codec.encode(payloads)
+        encode_time = time.process_time() - start
+
+        start = time.process_time()
+        await codec.decode(encoded)
+        decode_time = time.process_time() - start
+
+        raw = sum(p.ByteSize() for p in payloads)
+        size = sum(p.ByteSize() for p in encoded)
+        total_raw += raw
+        total_encoded += size
+        total_encode += encode_time
+        total_decode += decode_time
+
+        if turn in (1, 5, 10, 25, 50, 100, 250, 500) or turn == turns:
+            print(
+                f"{turn:>5} {raw / 1024:>10.1f} {size / 1024:>11.1f} {1 - size / raw:>7.1%} "
+                f"{encode_time * 1000:>10.2f} {decode_time * 1000:>10.2f}"
+            )
+
+    print(
+        f"total {total_raw / 1024:>10.1f} {total_encoded / 1024:>11.1f} {1 - total_encoded / total_raw:>7.1%} "
+        f"{total_encode * 1000:>10.2f} {total_decode * 1000:>10.2f}"
+    )
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=50, help="number of conversation turns")
+    parser.add_argument("--result-size", type=int, default=5000, help="size of each tool result in bytes")
+    parser.add_argument("--algorithms", nargs="+", default=["gzip", "zstd"])
+    args = parser.parse_args()
+
+    for algorithm in args.algorithms:
+        if algorithm == "zstd" and zstandard is None:
+            print("\nzstd skipped, install the zstd extra to benchmark it")
+            continue
+        await benchmark(algorithm, args.turns, args.result_size)
+
+if __name__ == "__main__":
+    asyncio.run(main())
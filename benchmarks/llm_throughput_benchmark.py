@@ -0,0 +1,84 @@
+"""Benchmark of LLM call throughput, blocking threads against async calls.
+
+Simulates a worker handling many concurrent LLM calls of a fixed latency:
+
+- threads: the previous synchronous call_llm, each call blocking a thread of
+  the worker's ThreadPoolExecutor on generate_content
+- async: the async call_llm on generate_content_async, bounded like the
+  worker's max_concurrent_activities
+
+The models are served by a FakeLLMBackend with the given latency, so no Vertex AI
+calls are made.
+
+Usage:
+    uv run python -m benchmarks.llm_throughput_benchmark --calls 2000 --latency 2
+"""
+import argparse
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+from temporal.agent import Agent, FakeLLMBackend, FakeReply
+from temporal.agent.llm_manager import LLMCallInput, LLMManager
+
+def call_input() -> LLMCallInput:
+    return LLMCallInput(agent_name="root-agent", contents=[{"role": "user", "parts": [{"text": "Hello"}]}])
+
+async def run_threads(manager: LLMManager, calls: int, threads: int) -> int:
+    """Run the calls as blocking generate_content calls on a thread pool, returning the peak thread count."""
+    model, tool = manager.llms["root-agent"]
+    loop = asyncio.get_running_loop()
+    peak_threads = 0
+
+    def blocking_call() -> Dict:
+        nonlocal peak_threads
+        peak_threads = max(peak_threads, threading.active_count())
+        return model.generate_content(contents=call_input().contents, tools=[tool]).to_dict()
+
+    with ThreadPoolExecutor(threads) as executor:
+        await asyncio.gather(*(loop.run_in_executor(executor, blocking_call) for _ in range(calls)))
+    return peak_threads
+
+async def run_async(manager: LLMManager, calls: int, max_concurrent_activities: int) -> int:
+    """Run the calls through the async call_llm activity, returning the peak thread count."""
+    slots = asyncio.Semaphore(max_concurrent_activities)
+    peak_threads = 0
+
+    async def call() -> Dict:
+        nonlocal peak_threads
+        async with slots:
+            peak_threads = max(peak_threads, threading.active_count())
+            return await manager.call_llm(call_input())
+
+    await asyncio.gather(*(call() for _ in range(calls)))
+    return peak_threads
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000, help="number of LLM calls")
+    parser.add_argument("--latency", type=float, default=2.0, help="latency of each LLM call in seconds")
+    parser.add_argument("--threads", type=int, default=100, help="thread pool size of the blocking worker")
+    parser.add_argument("--max-concurrent-activities", type=int, default=1000, help="activity slots of the async worker")
+    args = parser.parse_args()
+
+    backend = FakeLLMBackend(
+        default=FakeReply(text="Done.", prompt_tokens=1000, candidate_tokens=10),
+        latency=args.latency,
+    )
+    manager = LLMManager(Agent(name="root-agent"), backend=backend)
+
+    print(f"{args.calls} calls of {args.latency}s")
+    print(f"{'mode':>8} {'concurrency':>12} {'seconds':>9} {'calls/s':>9} {'threads':>8}")
+    for mode, concurrency, run in (
+        ("threads", args.threads, run_threads),
+        ("async", args.max_concurrent_activities, run_async),
+    ):
+        start = time.perf_counter()
+        peak_threads = await run(manager, args.calls, concurrency)
+        elapsed = time.perf_counter() - start
+        print(f"{mode:>8} {concurrency:>12} {elapsed:>9.2f} {args.calls / elapsed:>9.1f} {peak_threads:>8}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
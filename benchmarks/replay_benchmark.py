@@ -0,0 +1,197 @@
+"""Benchmark of AgentWorkflow replay time over conversation histories.
+
+Runs sessions of 10 to 500 turns against a scripted LLM activity, each turn
+calling a chain of nested sub-agents, then replays the recorded root history
+with Temporal's Replayer. This is the work a worker does when a session is
+evicted from its workflow cache, so the numbers drive the worker cache sizing.
+
+Reports per history: events, history and payload bytes, replay time and the
+peak Python memory of the replay. Results can be saved and compared against a
+saved baseline, failing when replay time regresses past the tolerance.
+
+Requires a Temporal server: the --address one, or a downloaded dev server.
+
+Usage:
+    uv run python -m benchmarks.replay_benchmark --turns 10 50 100 250 500
+    uv run python -m benchmarks.replay_benchmark --save benchmarks/results/replay.json
+    uv run python -m benchmarks.replay_benchmark --baseline benchmarks/results/replay.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from google.protobuf.message import Message
+from temporalio import activity
+from temporalio.api.common.v1 import Payload
+from temporalio.client import Client, WorkflowHistory
+from temporalio.testing import WorkflowEnvironment
+from temporalio.worker import Replayer, Worker
+
+from temporal.agent import Agent, Session
+from temporal.agent.llm_manager import LLMCallInput
+from temporal.agent.workflow import AgentWorkflow
+
+# The workflow starts sub-agents on this task queue
+TASK_QUEUE = "agent-task-queue"
+
+def agent_chain(depth: int) -> Agent:
+    """Build a root agent calling a chain of depth nested sub-agents."""
+    agent = None
+    for level in reversed(range(depth + 1)):
+        agent = Agent(
+            name="root-agent" if level == 0 else f"sub-agent-{level}",
+            sub_agents=[agent] if agent else [],
+            max_history_events=sys.maxsize, # measure a single run, however long
+            max_history_bytes=sys.maxsize,
+        )
+    return agent
+
+def llm_response(parts: List[Dict], tokens: int) -> Dict:
+    return {
+        "candidates": [{"content": {"role": "model", "parts": parts}, "finish_reason": "STOP"}],
+        "usage_metadata": {
+            "prompt_token_count": tokens,
+            "candidates_token_count": tokens // 10,
+            "total_token_count": tokens + tokens // 10,
+        },
+    }
+
+def scripted_llm(depth: int, answer_size: int) -> callable:
+    """Build a call_llm activity calling the next sub-agent on each prompt, then answering."""
+    @activity.defn(name="call_llm")
+    def call_llm(call_input: LLMCallInput) -> Dict:
+        tokens = len(json.dumps(call_input.contents)) // 4
+        last_parts = call_input.contents[-1]["parts"] if call_input.contents else []
+        level = 0 if call_input.agent_name == "root-agent" else int(call_input.agent_name.rsplit("-", 1)[1])
+        if level < depth and not any("function_response" in part for part in last_parts):
+            sub_agent = f"sub-agent-{level + 1}"
+            return llm_response([{"function_call": {"name": sub_agent, "args": {"request": "look it up"}}}], tokens)
+        return llm_response([{"text": "x" * answer_size}], tokens)
+    return call_llm
+
+def payload_bytes(message: Message) -> int:
+    """Sum the data size of the payloads nested in a protobuf message."""
+    if isinstance(message, Payload):
+        return len(message.data)
+    total = 0
+    for field, value in message.ListFields():
+        if field.type != field.TYPE_MESSAGE:
+            continue
+        if field.label == field.LABEL_REPEATED:
+            values = value.values() if field.message_type.GetOptions().map_entry else value
+            total += sum(payload_bytes(v) for v in values if isinstance(v, Message))
+        else:
+            total += payload_bytes(value)
+    return total
+
+async def record_history(client: Client, turns: int, depth: int) -> WorkflowHistory:
+    """Run a session of the given number of turns and fetch its root history."""
+    session = Session(agent=agent_chain(depth), client=client, task_queue=TASK_QUEUE)
+    await session.start()
+    for turn in range(turns):
+        await session.prompt(f"Question {turn}")
+    await session.stop()
+    return await client.get_workflow_handle(session.workflow_id).fetch_history()
+
+async def replay(history: WorkflowHistory) -> Dict:
+    """Replay a history, measuring its time and peak Python memory."""
+    replayer = Replayer(workflows=[AgentWorkflow])
+    tracemalloc.start()
+    start = time.perf_counter()
+    await replayer.replay_workflow(history)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"replay_ms": elapsed * 1000, "peak_kb": peak / 1024}
+
+async def benchmark(client: Client, turns_list: List[int], depth: int, answer_size: int) -> List[Dict]:
+    results = []
+    async with Worker(
+        client,
+        task_queue=TASK_QUEUE,
+        workflows=[AgentWorkflow],
+        activities=[scripted_llm(depth, answer_size)],
+        activity_executor=ThreadPoolExecutor(10),
+    ):
+        print(f"{'turns':>6} {'events':>7} {'history KB':>11} {'payload KB':>11} {'replay ms':>10} {'peak KB':>9}")
+        for turns in turns_list:
+            history = await record_history(client, turns, depth)
+            result = {
+                "turns": turns,
+                "depth": depth,
+                "events": len(history.events),
+                "history_kb": sum(e.ByteSize() for e in history.events) / 1024,
+                "payload_kb": sum(payload_bytes(e) for e in history.events) / 1024,
+                **await replay(history),
+            }
+            results.append(result)
+            print(
+                f"{turns:>6} {result['events']:>7} {result['history_kb']:>11.1f} {result['payload_kb']:>11.1f} "
+                f"{result['replay_ms']:>10.1f} {result['peak_kb']:>9.0f}"
+            )
+    return results
+
+def compare(results: List[Dict], baseline_path: str, tolerance: float) -> bool:
+    """Compare replay times with a saved baseline, returning whether none regressed."""
+    with open(baseline_path) as f:
+        baseline = {(r["turns"], r["depth"]): r for r in json.load(f)["results"]}
+    ok = True
+    print(f"\nagainst {baseline_path} (tolerance {tolerance:.0%})")
+    for result in results:
+        base = baseline.get((result["turns"], result["depth"]))
+        if base is None:
+            continue
+        change = result["replay_ms"] / base["replay_ms"] - 1
+        regressed = change > tolerance
+        ok = ok and not regressed
+        print(f"{result['turns']:>6} turns: replay {change:+.1%}{'  REGRESSION' if regressed else ''}")
+    return ok
+
+def save(results: List[Dict], path: str) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": results,
+        }, f, indent=2)
+    print(f"\nsaved {path}")
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 50, 100, 250, 500], help="conversation turns of each history")
+    parser.add_argument("--depth", type=int, default=2, help="depth of the nested sub-agents called on each turn")
+    parser.add_argument("--answer-size", type=int, default=500, help="size of each model answer in bytes")
+    parser.add_argument("--address", help="Temporal server address, a local dev server is started if omitted")
+    parser.add_argument("--save", help="file to save the results to")
+    parser.add_argument("--baseline", help="saved results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="replay time increase reported as a regression")
+    args = parser.parse_args()
+
+    env = None
+    if args.address:
+        client = await Client.connect(args.address)
+    else:
+        env = await WorkflowEnvironment.start_local()
+        client = env.client
+    try:
+        results = await benchmark(client, args.turns, args.depth, args.answer_size)
+    finally:
+        if env:
+            await env.shutdown()
+
+    if args.save:
+        save(results, args.save)
+    if args.baseline and not compare(results, args.baseline, args.tolerance):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+"""Load benchmark of concurrent agent sessions, with the LLM served offline.
+
+Starts many sessions at once, each prompting a root agent which delegates to a
+sub-agent on every turn, while a FakeLLMBackend answers the LLM calls after the
+given latency. No Vertex AI credentials are needed and nothing is billed, so the
+numbers reflect the workflow layer: prompt latency percentiles and turns per second.
+
+Requires a Temporal server: the --address one, or a downloaded dev server.
+
+Usage:
+    uv run python -m benchmarks.session_load_benchmark --sessions 1000 --turns 3 --latency 1
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+from temporalio.client import Client
+from temporalio.testing import WorkflowEnvironment
+from temporalio.worker import Worker
+
+from temporal.agent import Agent, FakeLLMBackend, FakeReply, Session
+from temporal.agent.llm_manager import LLMManager
+from temporal.agent.workflow import AgentWorkflow
+
+# The workflow starts sub-agents on this task queue
+TASK_QUEUE = "agent-task-queue"
+
+def build_agent() -> Agent:
+    sub_agent = Agent(name="search-agent")
+    return Agent(name="root-agent", sub_agents=[sub_agent])
+
+def build_backend(latency: float) -> FakeLLMBackend:
+    """Root agent calls the sub-agent, then answers with its result."""
+    return (
+        FakeLLMBackend(latency=latency)
+        .add_rule(FakeReply(text="Here is what I found."), agent="root-agent", after_function="search-agent")
+        .add_rule(FakeReply.call("search-agent", request="look it up"), agent="root-agent")
+        .add_rule(FakeReply(text="Found 3 results."), agent="search-agent")
+    )
+
+async def run_session(client: Client, agent: Agent, turns: int, latencies: List[float]) -> None:
+    async with Session(agent=agent, client=client, task_queue=TASK_QUEUE) as session:
+        for turn in range(turns):
+            start = time.perf_counter()
+            await session.prompt(f"Question {turn}")
+            latencies.append(time.perf_counter() - start)
+
+async def benchmark(client: Client, sessions: int, turns: int, latency: float) -> None:
+    agent = build_agent()
+    backend = build_backend(latency)
+    llm_manager = LLMManager(agent, backend=backend)
+    latencies: List[float] = []
+    async with Worker(
+        client,
+        task_queue=TASK_QUEUE,
+        workflows=[AgentWorkflow],
+        activities=[llm_manager.call_llm, llm_manager.summarize_contents],
+        max_concurrent_activities=10000,
+        max_concurrent_workflow_tasks=1000,
+    ):
+        start = time.perf_counter()
+        await asyncio.gather(*(run_session(client, agent, turns, latencies) for _ in range(sessions)))
+        elapsed = time.perf_counter() - start
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(f"{sessions} sessions of {turns} turns, LLM latency {latency}s, {sum(backend.calls.values())} LLM calls")
+    print(f"{'seconds':>9} {'turns/s':>9} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7}")
+    print(
+        f"{elapsed:>9.2f} {len(latencies) / elapsed:>9.1f} "
+        f"{quantiles[49]:>7.2f} {quantiles[94]:>7.2f} {quantiles[98]:>7.2f}"
+    )
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=1000, help="number of concurrent sessions")
+    parser.add_argument("--turns", type=int, default=3, help="prompts sent by each session")
+    parser.add_argument("--latency", type=float, default=1.0, help="latency of each LLM call in seconds")
+    parser.add_argument("--address", help="Temporal server address, a local dev server is started if omitted")
+    args = parser.parse_args()
+
+    env = None
+    if args.address:
+        client = await Client.connect(args.address)
+    else:
+        env = await WorkflowEnvironment.start_local()
+        client = env.client
+    try:
+        await benchmark(client, args.sessions, args.turns, args.latency)
+    finally:
+        if env:
+            await env.shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -16,7 +16,7 @@ agent = Agent(
     name="Store Support Agent",
     model_name="gemini-2.0-flash",
     instruction="You are a store support API assistant to help with online orders.",
-    functions = [greet, get_order_status]
+    local_functions = [greet, get_order_status]
 )
 
 async def main():
@@ -55,6 +55,7 @@ async def main():
         name="GitHub Research Agent",
         model_name="models/gemini-2.5-pro-preview-05-06",
         instruction=get_system_prompt(),
+        context_cache=True,
         sub_agents=[repository_agent, code_search_agent, file_download_agent]
     )
 
@@ -9,6 +9,8 @@ from github import Github, GithubException
 from github.Repository import Repository
 from github.ContentFile import ContentFile
 
+from temporal.agent import activity_options, cache_results
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
@@ -41,6 +43,7 @@ def _get_github_client() -> Github:
         # Use unauthenticated access (lower rate limits)
         return Github()
 
+@cache_results(ttl=600)
 def get_repos(request: GitHubRepoRequest) -> str:
     """Get repositories from a GitHub organization using the organization's repos endpoint.
 
@@ -49,6 +52,9 @@ def get_repos(request: GitHubRepoRequest) -> str:
 
     Returns:
         Formatted string with repository results
+
+    Raises:
+        GithubException: If the GitHub API request fails, e.g. when rate limited
     """
     try:
         g = _get_github_client()
@@ -183,18 +189,20 @@ def get_repos(request: GitHubRepoRequest) -> str:
             else:
                 raise org_e
         
+    # errors are raised rather than returned, so that the activity is retried
+    # and the error is never served from the tool result cache
     except GithubException as e:
         logger.error(f"GitHub API error during repository retrieval: {e.status} - {getattr(e, 'data', {})}")
         if e.status == 403:
-            return f"GitHub API rate limit exceeded. Without a GITHUB_TOKEN, you're limited to 60 requests/hour. Please add a GITHUB_TOKEN environment variable for 5,000 requests/hour, or try again later."
+            logger.error("GitHub API rate limit exceeded. Without a GITHUB_TOKEN, you're limited to 60 requests/hour. Please add a GITHUB_TOKEN environment variable for 5,000 requests/hour.")
         elif e.status == 401:
-            return "GitHub API authentication failed. Please check your GITHUB_TOKEN."
-        else:
-            return f"GitHub API error: {getattr(e, 'data', {}).get('message', str(e))}"
+            logger.error("GitHub API authentication failed. Please check your GITHUB_TOKEN.")
+        raise
     except Exception as e:
         logger.error(f"Unexpected error during repository retrieval: {str(e)}")
-        return f"Error retrieving repositories: {str(e)}"
+        raise
 
+@activity_options(start_to_close_timeout=180, maximum_attempts=3)
 def search_github_code(request: GitHubCodeSearchRequest) -> str:
     """Search for code in GitHub repositories.
 
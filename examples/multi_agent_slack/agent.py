@@ -4,7 +4,7 @@ import asyncio
 import logging
 
 from textwrap import dedent
-from temporal.agent import Agent, Runner, Session, AgentConsole
+from temporal.agent import Agent, ModelRouting, Runner, Session, AgentConsole
 
 from .tools import get_slack_channels, search_slack, get_thread_messages
 from .sys_prompt import get_system_prompt
@@ -13,26 +13,35 @@ from .schemas import ChannelSchema, SearchSchema, ThreadSchema
 async def main():
     """Main interactive loop with Slack-enabled agent."""
 
+    # Sub-agents answer with the fast model, and escalate to the pro one on hard turns
+    sub_agent_routing = ModelRouting(
+        models=["models/gemini-2.5-pro-preview-05-06"],
+        long_context_tokens=100_000,
+    )
+
     channel_agent = Agent(
         name="Channel Explorer",
-        model_name="models/gemini-2.5-pro-preview-05-06",
+        model_name="gemini-2.0-flash",
         instruction="You help find and navigate Slack channels.",
+        routing=sub_agent_routing,
         functions=[get_slack_channels],
         input_schema=ChannelSchema
     )
     
     search_agent = Agent(
         name="Search Specialist",
-        model_name="models/gemini-2.5-pro-preview-05-06",
+        model_name="gemini-2.0-flash",
         instruction="You specialize in searching Slack for relevant information.",
+        routing=sub_agent_routing,
         functions=[search_slack],
         input_schema=SearchSchema
     )
     
     thread_summary_agent = Agent(
         name="Thread Specialist",
-        model_name="models/gemini-2.5-pro-preview-05-06",
+        model_name="gemini-2.0-flash",
         instruction="You specialize in summarizing Slack threads.",
+        routing=sub_agent_routing,
         functions=[get_thread_messages],
         input_schema=ThreadSchema
     )
@@ -41,6 +50,7 @@ async def main():
         name="Slack Research Agent",
         model_name="models/gemini-2.5-pro-preview-05-06",
         instruction=get_system_prompt(),
+        context_cache=True,
         sub_agents=[channel_agent, search_agent, thread_summary_agent]
     )
 
@@ -7,6 +7,8 @@ from datetime import datetime
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
 
+from temporal.agent import cache_results
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
@@ -36,6 +38,7 @@ class SlackSearchResult:
     pagination: Optional[Dict[str, Any]] = None
     has_more: bool = False
 
+@cache_results(ttl=600)
 def get_slack_channels(request: GetChannelsRequest) -> List[Dict[str, Any]]:
     """Get a list of Slack channels from the workspace.
 
@@ -15,6 +15,7 @@ async def main():
         name="Slack Research Agent",
         model_name="models/gemini-2.5-pro-preview-05-06",
         instruction=get_system_prompt(),
+        context_cache=True,
         functions=[get_slack_channels, search_slack, get_thread_messages]
     )
         
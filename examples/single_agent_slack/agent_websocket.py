@@ -5,25 +5,12 @@ import asyncio
 from slack_bolt.async_app import AsyncApp
 from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
 
-from temporal.agent import Agent, Runner
+from temporal.agent import Agent, Runner, Session
 
 from .tools import get_slack_channels, search_slack, get_thread_messages
 from .sys_prompt import get_system_prompt
 
 
-# Stream agent thoughts back to slack
-async def _poll_thoughts_to_slack(agent, say, watermark=0):
-    try:
-        while True:
-            thoughts = await agent.thoughts(watermark=watermark)
-            if thoughts:
-                for line in thoughts:
-                    await say(f"🧠 {line}")
-                watermark += len(thoughts)
-            await asyncio.sleep(2)
-    except asyncio.CancelledError:
-        pass
-
 async def main():
     # Slack credentials
     bot_token  = os.environ["SLACK_BOT_TOKEN"]
@@ -37,8 +24,43 @@ async def main():
         functions=[get_slack_channels, search_slack, get_thread_messages],
     )
 
-    async with Runner(app_name="slack_agent", agent=agent) as runner:
+    async with Runner(app_name="slack_agent", agent=agent) as runner, \
+            Session(client=runner.client, agent=agent) as session:
         slack_app = AsyncApp(token=bot_token)
+        watermark = 0
+        turn_lock = asyncio.Lock() # handlers share the session, one turn at a time
+
+        # Stream agent thoughts back to slack
+        async def _stream_thoughts_to_slack(say):
+            nonlocal watermark
+            try:
+                async for line in session.stream_thoughts(watermark=watermark):
+                    await say(f"🧠 {line}")
+                    watermark += 1
+            except asyncio.CancelledError:
+                pass
+
+        # Send the text to the agent, streaming its thoughts, and post its reply
+        async def _prompt_to_slack(text, say):
+            nonlocal watermark
+            async with turn_lock:
+                await say("🤔 Thinking…")
+                thoughts_task = asyncio.create_task(_stream_thoughts_to_slack(say))
+                try:
+                    reply = await session.prompt(text)
+                finally:
+                    thoughts_task.cancel()
+                    await asyncio.gather(thoughts_task, return_exceptions=True)
+
+                # post the thoughts the stream had not received yet, but the reply,
+                # the turn's last thought, is posted on its own
+                remaining = await session.thoughts(watermark)
+                watermark += len(remaining)
+                if remaining and remaining[-1] == reply:
+                    remaining.pop()
+                for line in remaining:
+                    await say(f"🧠 {line}")
+                await say(f"🤖 {reply}")
 
         # Handle mentions
         @slack_app.event("app_mention")
@@ -54,14 +76,7 @@ async def main():
                 await say("🤖 Please include a question after mentioning me.")
                 return
 
-            await say("🤔 Thinking…")
-            thoughts_task = asyncio.create_task(_poll_thoughts_to_slack(agent, say))
-
-            try:
-                response = await runner.prompt(user_text)
-                await say(f"🤖 {response}")
-            finally:
-                thoughts_task.cancel()
+            await _prompt_to_slack(user_text, say)
 
         # Handle direct messages
         @slack_app.event("message")           
@@ -76,13 +91,7 @@ async def main():
             if not text:
                 return
 
-            await say("🤔 Thinking…")
-            poll = asyncio.create_task(_poll_thoughts_to_slack(agent, say))
-            try:
-                reply = await runner.prompt(text)
-                await say(f"🤖 {reply}")
-            finally:
-                poll.cancel()
+            await _prompt_to_slack(text, say)
 
         # Websocket listener
         handler = AsyncSocketModeHandler(slack_app, app_token)
@@ -7,6 +7,8 @@ from datetime import datetime
 from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
 
+from temporal.agent import cache_results
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
@@ -49,6 +51,7 @@ class ThreadInput:
     """
     thread_url: str
 
+@cache_results(ttl=600)
 def get_slack_channels(request: GetChannelsRequest) -> List[Dict[str, Any]]:
     """Get a list of Slack channels from the workspace.
 
@@ -1,6 +1,43 @@
-from .agent import Agent
+import temporalio.workflow
+
+from .agent import Agent, ActivityOptions, ContextPolicy, ModelRouting, activity_options, local_activity, cache_results
 from .runner import Runner
 from .session import Session
+from .session_pool import SessionPool
+from .tool_cache import ToolResultCache
+
+# the backends import Vertex AI, which must not be reloaded in the workflow sandbox
+with temporalio.workflow.unsafe.imports_passed_through():
+    from .llm_backend import LLMBackend, VertexBackend
+    from .fake_llm import FakeLLMBackend, FakeReply, FakeRule
+
+from .response_cache import InMemoryResponseCache, ResponseCache, SQLiteResponseCache
+from .timing import FileSpanSink, InMemorySpanSink, SpanSink, TimingInterceptor
 from .console import AgentConsole
 
-__all__ = ["Agent", "Runner", "Session", "AgentConsole"]
+__all__ = [
+    "Agent",
+    "ActivityOptions",
+    "ContextPolicy",
+    "ModelRouting",
+    "activity_options",
+    "local_activity",
+    "cache_results",
+    "Runner",
+    "Session",
+    "SessionPool",
+    "ToolResultCache",
+    "LLMBackend",
+    "VertexBackend",
+    "FakeLLMBackend",
+    "FakeReply",
+    "FakeRule",
+    "ResponseCache",
+    "InMemoryResponseCache",
+    "SQLiteResponseCache",
+    "SpanSink",
+    "InMemorySpanSink",
+    "FileSpanSink",
+    "TimingInterceptor",
+    "AgentConsole",
+]
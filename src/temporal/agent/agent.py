@@ -1,6 +1,138 @@
 import inflection
 
-from typing import List, Dict, Any
+from dataclasses import dataclass, field
+from datetime import timedelta
+from enum import StrEnum
+from typing import List, Dict, Any, Optional
+
+from temporalio.common import RetryPolicy
+
+class ContextPolicy(StrEnum):
+    """How much of the parent's conversation a sub-agent receives."""
+    FULL = "full"
+    NONE = "none"
+    LAST_N = "last_n"
+    USER_ONLY = "user_only"
+    SUMMARY = "summary"
+
+@dataclass
+class ActivityOptions:
+    """Scheduling options of an activity, with durations in seconds.
+
+    Attributes:
+        start_to_close_timeout: Maximum time of a single attempt
+        schedule_to_close_timeout: Maximum time including retries, unlimited if None
+        heartbeat_timeout: Maximum time between heartbeats, for functions calling activity.heartbeat()
+        maximum_attempts: Maximum number of attempts, unlimited if 0
+        initial_interval: Delay before the first retry
+        backoff_coefficient: Multiplier of the delay for each following retry
+        maximum_interval: Maximum delay between retries, 100 times the initial interval if None
+        non_retryable_error_types: Error type names that fail the activity without retrying
+    """
+    start_to_close_timeout: float = 60
+    schedule_to_close_timeout: Optional[float] = None
+    heartbeat_timeout: Optional[float] = None
+    maximum_attempts: int = 0
+    initial_interval: float = 1
+    backoff_coefficient: float = 2.0
+    maximum_interval: Optional[float] = None
+    non_retryable_error_types: List[str] = field(default_factory=list)
+
+    def to_kwargs(self, local: bool = False) -> Dict[str, Any]:
+        """Convert to keyword arguments of workflow.execute_activity or execute_local_activity."""
+        kwargs = {
+            "start_to_close_timeout": timedelta(seconds=self.start_to_close_timeout),
+            "retry_policy": RetryPolicy(
+                initial_interval=timedelta(seconds=self.initial_interval),
+                backoff_coefficient=self.backoff_coefficient,
+                maximum_interval=timedelta(seconds=self.maximum_interval) if self.maximum_interval else None,
+                maximum_attempts=self.maximum_attempts,
+                non_retryable_error_types=self.non_retryable_error_types or None,
+            ),
+        }
+        if self.schedule_to_close_timeout:
+            kwargs["schedule_to_close_timeout"] = timedelta(seconds=self.schedule_to_close_timeout)
+        if self.heartbeat_timeout and not local: # local activities don't heartbeat
+            kwargs["heartbeat_timeout"] = timedelta(seconds=self.heartbeat_timeout)
+        return kwargs
+
+@dataclass
+class ModelRouting:
+    """Models an agent escalates to, picked for each LLM call.
+
+    Calls use the agent's model_name, the cheapest tier, unless the turn is escalated:
+    to the next tier after a malformed function call, or to the top tier when the
+    conversation exceeds long_context_tokens, the prompt contains an escalation
+    keyword, or the session asks for it with Session.escalate().
+
+    Attributes:
+        models: Models above the agent's model_name, cheapest first, e.g. ["gemini-2.5-pro"]
+        escalate_on_malformed_call: Escalate the turn to the next tier after a malformed function call
+        long_context_tokens: Tokens of the last LLM call above which calls use the top tier, never if None
+        escalation_keywords: Case-insensitive words of the prompt escalating the turn to the top tier
+    """
+    models: List[str] = field(default_factory=list)
+    escalate_on_malformed_call: bool = True
+    long_context_tokens: Optional[int] = None
+    escalation_keywords: List[str] = field(default_factory=list)
+
+def activity_options(**kwargs) -> callable:
+    """Declare the activity options of a tool function.
+
+    Example:
+        @activity_options(start_to_close_timeout=300, maximum_attempts=3)
+        def search_github_code(search: CodeSearchSchema) -> str: ...
+
+    Args:
+        kwargs: Fields of ActivityOptions
+    """
+    options = ActivityOptions(**kwargs)
+
+    def decorator(fn: callable) -> callable:
+        fn.__temporal_agent_activity_options = options
+        return fn
+    return decorator
+
+def get_activity_options(fn: callable) -> ActivityOptions:
+    """Get the activity options declared on a tool function, if any."""
+    return getattr(fn, "__temporal_agent_activity_options", None)
+
+def local_activity(fn: callable) -> callable:
+    """Mark a tool function to run as a local activity.
+
+    Local activities run in the worker processing the workflow task, skipping
+    the task queue round trip. Use it for fast functions without side effects
+    worth retrying separately, such as lookups and formatting.
+    """
+    fn.__temporal_agent_local_activity = True
+    return fn
+
+def is_local_activity(fn: callable) -> bool:
+    """Check whether a tool function is marked to run as a local activity."""
+    return getattr(fn, "__temporal_agent_local_activity", False)
+
+def cache_results(ttl: float = 300) -> callable:
+    """Cache the results of a tool function on the worker, across sessions.
+
+    Calls with the same arguments within the TTL are served from the worker's
+    ToolResultCache instead of running the function again. Use it for reads of
+    slowly changing data, such as listing repositories or channels.
+
+    Example:
+        @cache_results(ttl=600)
+        def get_repos() -> str: ...
+
+    Args:
+        ttl: Seconds a result is served from the cache
+    """
+    def decorator(fn: callable) -> callable:
+        fn.__temporal_agent_cache_ttl = ttl
+        return fn
+    return decorator
+
+def get_cache_ttl(fn: callable) -> Optional[float]:
+    """Get the result cache TTL declared on a tool function, if any."""
+    return getattr(fn, "__temporal_agent_cache_ttl", None)
 
 class Agent:
     """Agent class that manages the Temporal worker and workflow execution."""
@@ -11,8 +143,29 @@ class Agent:
         model_name: str = "gemini-2.0-flash",
         instruction: str = "You are a store support API assistant to help with online orders.",
         functions: List[callable] = None,
+        local_functions: List[callable] = None,
+        cached_functions: List[callable] = None,
+        cache_ttl: float = 300,
         sub_agents: List['Agent'] = None,
-        input_schema: Dict[str, Any] = {}
+        input_schema: Dict[str, Any] = {},
+        delta_contents: bool = False,
+        max_history_events: int = 10000,
+        max_history_bytes: int = 20 * 1024 * 1024,
+        continue_as_new_keep_turns: int = 20,
+        max_concurrent_calls: int = 10,
+        context_policy: ContextPolicy = ContextPolicy.FULL,
+        context_turns: int = 3,
+        token_budget: int = None,
+        window_keep_turns: int = 2,
+        max_queued_prompts: int = 10,
+        usage_search_attributes: bool = False,
+        stream: bool = False,
+        context_cache: bool = False,
+        context_cache_ttl: float = 3600,
+        context_cache_turns: int = 0,
+        routing: ModelRouting = None,
+        activity_options: ActivityOptions = None,
+        llm_activity_options: ActivityOptions = None
     ):
         """Initialize the agent.
 
@@ -21,12 +174,79 @@ class Agent:
             model_name: Vertex AI model name
             instruction: System instruction for the LLM
             functions: List of functions available to the agent
+            local_functions: List of functions available to the agent, run as local activities.
+                Functions decorated with @local_activity are run as local activities as well
+            cached_functions: Functions of the agent whose results are cached by the worker across
+                sessions. Functions decorated with @cache_results are cached with their own TTL
+            cache_ttl: Seconds the results of cached_functions are served from the cache
             sub_agents: List of specialized sub-agents
             input_schema: JSON schema defining the expected input format
+            delta_contents: Send only new turns to the LLM activity, relying on the
+                worker-local conversation cache for the rest of the conversation
+            max_history_events: History length after which a root session continues as new
+            max_history_bytes: History size after which a root session continues as new
+            continue_as_new_keep_turns: Number of recent user turns carried over to the new run
+            max_concurrent_calls: Maximum number of function calls of one LLM response run concurrently
+            context_policy: Parent conversation passed to this agent when invoked as a sub-agent
+            context_turns: Number of recent user turns passed with ContextPolicy.LAST_N
+            token_budget: Conversation size in tokens above which older turns are summarized.
+                Checked before every LLM call, so a long tool loop within one turn has its
+                older function call exchanges summarized too
+            window_keep_turns: Number of recent user turns kept as is when summarizing, or of
+                function call exchanges when summarizing within a turn
+            max_queued_prompts: Number of prompts a root session queues behind the current turn
+                before rejecting new prompts
+            usage_search_attributes: Set the session's token usage as the AgentPromptTokens,
+                AgentCandidateTokens, AgentCachedTokens and AgentTotalTokens search attributes
+                after each turn. They must be registered on the namespace as Int attributes
+            stream: Stream the LLM responses, forwarding their partial text to the session as
+                it is generated. Set a heartbeat_timeout in llm_activity_options to detect stalled streams
+            context_cache: Serve the agent's instruction and tool declarations from a Vertex AI
+                cached content. The model must support context caching, and the cached prefix must
+                reach its minimum cacheable size, otherwise calls are made uncached
+            context_cache_ttl: Seconds a cached content lives without being used
+            context_cache_turns: Number of early user turns of the conversation cached along with
+                the instruction and tool declarations
+            routing: Models the agent escalates to from model_name, per turn. Calls always
+                use model_name if None
+            activity_options: Default activity options of the agent's functions. Options declared
+                on a function with @activity_options take precedence
+            llm_activity_options: Activity options of the agent's LLM calls
         """
         self.name = inflection.parameterize(name)
         self.model_name = model_name
         self.instruction = instruction
-        self.functions = functions or []
+        self.functions = (functions or []) + (local_functions or [])
+        self.local_functions = [
+            fn.__name__ for fn in self.functions
+            if fn in (local_functions or []) or is_local_activity(fn)
+        ]
+        self.cache_ttls = {
+            fn.__name__: get_cache_ttl(fn) or cache_ttl
+            for fn in self.functions
+            if fn in (cached_functions or []) or get_cache_ttl(fn)
+        }
         self.sub_agents = sub_agents or []
-        self.input_schema = input_schema
\ No newline at end of file
+        self.input_schema = input_schema
+        self.delta_contents = delta_contents
+        self.max_history_events = max_history_events
+        self.max_history_bytes = max_history_bytes
+        self.continue_as_new_keep_turns = continue_as_new_keep_turns
+        self.max_concurrent_calls = max_concurrent_calls
+        self.context_policy = ContextPolicy(context_policy)
+        self.context_turns = context_turns
+        self.token_budget = token_budget
+        self.window_keep_turns = window_keep_turns
+        self.max_queued_prompts = max_queued_prompts
+        self.usage_search_attributes = usage_search_attributes
+        self.stream = stream
+        self.context_cache = context_cache
+        self.context_cache_ttl = context_cache_ttl
+        self.context_cache_turns = context_cache_turns
+        self.routing = routing or ModelRouting()
+        self.activity_options = activity_options or ActivityOptions()
+        self.llm_activity_options = llm_activity_options or ActivityOptions()
+        self.function_options = {
+            fn.__name__: get_activity_options(fn) or self.activity_options
+            for fn in self.functions
+        }
\ No newline at end of file
@@ -0,0 +1,256 @@
+import asyncio
+import dataclasses
+import gzip
+import hashlib
+import os
+import re
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from typing import List, Sequence
+
+try:
+    import zstandard
+except ImportError: # zstd compression is optional
+    zstandard = None
+
+from temporalio.api.common.v1 import Payload
+from temporalio.client import Client
+from temporalio.converter import DataConverter, PayloadCodec
+
+# Encoding of payloads replaced by a reference to a blob
+OFFLOAD_ENCODING = b"binary/blob-ref"
+
+# Encodings of compressed payloads, by compression algorithm
+COMPRESSION_ENCODINGS = {
+    "zstd": b"binary/zstd",
+    "gzip": b"binary/gzip",
+}
+
+# Blob keys, the SHA-256 hash of the offloaded payload in lowercase hex
+BLOB_KEY_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+
+class BlobStore(ABC):
+    """Content-addressed storage for offloaded payloads."""
+
+    @abstractmethod
+    async def put(self, key: str, data: bytes) -> None:
+        """Store the data under the given content hash."""
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes:
+        """Load the data stored under the given content hash."""
+
+class FileBlobStore(BlobStore):
+    """Blob store keeping one file per blob in a local directory.
+
+    Blobs are named after their content hash, so identical payloads from
+    different sessions are stored once. Blobs are never deleted on their own:
+    call prune() periodically, keeping blobs for longer than the namespace's
+    history retention, or workflows can no longer be replayed. Keys other
+    than a SHA-256 hex digest are rejected with a ValueError, since they come
+    from payload data.
+    """
+
+    def __init__(self, directory: str) -> None:
+        """Initialize the store.
+
+        Args:
+            directory: Directory holding the blobs, created if missing
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        # keys come from payload data, so only hashes may name a file in the directory
+        if not BLOB_KEY_PATTERN.fullmatch(key):
+            raise ValueError(f"Invalid blob key: {key[:80]!r}")
+        return os.path.join(self.directory, key)
+
+    def _write(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        if os.path.exists(path):
+            os.utime(path) # keep blobs still in use from being pruned
+            return
+        # write to a unique temporary file first so readers never see a partial blob,
+        # and concurrent writers of the same blob never share a file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=f"{key}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _prune(self, older_than: float) -> int:
+        cutoff = time.time() - older_than
+        removed = 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file() and entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                        removed += 1
+                except FileNotFoundError: # removed or replaced concurrently
+                    pass
+        return removed
+
+    def _read(self, key: str) -> bytes:
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+    async def put(self, key: str, data: bytes) -> None:
+        await asyncio.to_thread(self._write, key, data)
+
+    async def get(self, key: str) -> bytes:
+        return await asyncio.to_thread(self._read, key)
+
+    async def prune(self, older_than: float) -> int:
+        """Delete the blobs neither written nor offloaded again for the given time.
+
+        Args:
+            older_than: Age in seconds of the blobs to delete, e.g. the namespace's
+                history retention plus the longest session duration
+
+        Returns:
+            Number of deleted files, including the leftovers of interrupted writes
+        """
+        return await asyncio.to_thread(self._prune, older_than)
+
+class OffloadCodec(PayloadCodec):
+    """Payload codec moving large payloads into a blob store.
+
+    Payloads over the threshold are stored under their SHA-256 hash and
+    replaced in the history by a small reference payload.
+    """
+
+    def __init__(self, store: BlobStore, threshold: int = 128 * 1024) -> None:
+        """Initialize the codec.
+
+        Args:
+            store: Blob store holding the offloaded payloads
+            threshold: Serialized payload size in bytes above which payloads are offloaded
+        """
+        self.store = store
+        self.threshold = threshold
+
+    async def encode(self, payloads: Sequence[Payload]) -> List[Payload]:
+        encoded = []
+        for payload in payloads:
+            if payload.ByteSize() <= self.threshold:
+                encoded.append(payload)
+                continue
+            data = payload.SerializeToString()
+            key = hashlib.sha256(data).hexdigest()
+            await self.store.put(key, data)
+            encoded.append(Payload(metadata={"encoding": OFFLOAD_ENCODING}, data=key.encode()))
+        return encoded
+
+    async def decode(self, payloads: Sequence[Payload]) -> List[Payload]:
+        decoded = []
+        for payload in payloads:
+            if payload.metadata.get("encoding") != OFFLOAD_ENCODING:
+                decoded.append(payload)
+                continue
+            data = await self.store.get(payload.data.decode())
+            decoded.append(Payload.FromString(data))
+        return decoded
+
+class CompressionCodec(PayloadCodec):
+    """Payload codec compressing payloads with zstd or gzip.
+
+    The algorithm is recorded in the encoding of each compressed payload, so
+    payloads compressed with either algorithm, and uncompressed payloads from
+    older histories, can always be decoded.
+    """
+
+    def __init__(self, algorithm: str = None, threshold: int = 1024, level: int = None) -> None:
+        """Initialize the codec.
+
+        Args:
+            algorithm: "zstd" or "gzip", defaults to zstd when the zstandard package is installed
+            threshold: Serialized payload size in bytes above which payloads are compressed
+            level: Compression level, defaults to the algorithm's default level
+        """
+        self.algorithm = algorithm or ("zstd" if zstandard else "gzip")
+        if self.algorithm not in COMPRESSION_ENCODINGS:
+            raise ValueError(f"Unsupported compression algorithm: {self.algorithm}")
+        if self.algorithm == "zstd" and zstandard is None:
+            raise ValueError("zstd compression requires the zstandard package")
+        self.threshold = threshold
+        self.level = level
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.algorithm == "zstd":
+            level = 3 if self.level is None else self.level
+            return zstandard.ZstdCompressor(level=level).compress(data)
+        level = 6 if self.level is None else self.level
+        return gzip.compress(data, compresslevel=level, mtime=0)
+
+    def _decompress(self, encoding: bytes, data: bytes) -> bytes:
+        if encoding == COMPRESSION_ENCODINGS["zstd"]:
+            if zstandard is None:
+                raise ValueError("Payload is zstd compressed but the zstandard package is not installed")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    async def encode(self, payloads: Sequence[Payload]) -> List[Payload]:
+        encoded = []
+        for payload in payloads:
+            if payload.ByteSize() <= self.threshold:
+                encoded.append(payload)
+                continue
+            data = payload.SerializeToString()
+            compressed = self._compress(data)
+            if len(compressed) >= len(data):
+                encoded.append(payload) # not worth it
+                continue
+            encoded.append(Payload(
+                metadata={"encoding": COMPRESSION_ENCODINGS[self.algorithm]},
+                data=compressed,
+            ))
+        return encoded
+
+    async def decode(self, payloads: Sequence[Payload]) -> List[Payload]:
+        decoded = []
+        for payload in payloads:
+            encoding = payload.metadata.get("encoding")
+            if encoding not in COMPRESSION_ENCODINGS.values():
+                decoded.append(payload)
+                continue
+            decoded.append(Payload.FromString(self._decompress(encoding, payload.data)))
+        return decoded
+
+class CodecChain(PayloadCodec):
+    """Payload codec applying several codecs in order.
+
+    Payloads are encoded by each codec in turn and decoded in reverse order,
+    e.g. CodecChain([CompressionCodec(), OffloadCodec(store)]) compresses
+    payloads before offloading the ones still over the threshold.
+    """
+
+    def __init__(self, codecs: Sequence[PayloadCodec]) -> None:
+        self.codecs = list(codecs)
+
+    async def encode(self, payloads: Sequence[Payload]) -> List[Payload]:
+        for codec in self.codecs:
+            payloads = await codec.encode(payloads)
+        return list(payloads)
+
+    async def decode(self, payloads: Sequence[Payload]) -> List[Payload]:
+        for codec in reversed(self.codecs):
+            payloads = await codec.decode(payloads)
+        return list(payloads)
+
+def data_converter(payload_codec: PayloadCodec) -> DataConverter:
+    """Build the default data converter with the given payload codec."""
+    return dataclasses.replace(DataConverter.default, payload_codec=payload_codec)
+
+def with_payload_codec(client: Client, payload_codec: PayloadCodec) -> Client:
+    """Create a client sharing the connection of the given client, using the given payload codec."""
+    config = client.config()
+    config["data_converter"] = dataclasses.replace(config["data_converter"], payload_codec=payload_codec)
+    return Client(**config)
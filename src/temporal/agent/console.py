@@ -13,7 +13,7 @@ class AgentConsole:
     def __init__(self, session: Session):
         self.session = session
         self.console = Console()
-        self.watermark = 0  # Initialize watermark for polling thoughts
+        self.watermark = 0  # Thoughts of the session received so far
 
     async def run(self, welcome_message: str = "Welcome to the agent console! Type 'help' for commands.") -> None:
         """Run the agent in a console application."""
@@ -31,16 +31,15 @@ class AgentConsole:
                 print("\n👋 Goodbye!")
                 break
 
-    async def _poll_agent_thoughts(self):
-        """Poll and display agent's thought process."""
+    async def _show_thought(self, line: str) -> None:
+        await aioconsole.aprint(f'\n\033[90m💭 {line}\033[0m')
+
+    async def _stream_agent_thoughts(self):
+        """Stream and display agent's thought process."""
         try:
-            while True:
-                thoughts = await self.session.thoughts(watermark=self.watermark)
-                if thoughts:
-                    for line in thoughts:
-                        await aioconsole.aprint(f'\n\033[90m💭 {line}\033[0m')
-                    self.watermark += len(thoughts)
-                await asyncio.sleep(2)  # Poll every 2 seconds
+            async for line in self.session.stream_thoughts(watermark=self.watermark):
+                await self._show_thought(line)
+                self.watermark += 1
         except asyncio.CancelledError:
             pass
 
@@ -68,17 +67,25 @@ class AgentConsole:
             
         print("🤖 Agent is thinking...")
         
-        # Start polling task to monitor agent's thoughts
-        polling_task = asyncio.create_task(self._poll_agent_thoughts())
+        # Start streaming task to monitor agent's thoughts
+        thoughts_task = asyncio.create_task(self._stream_agent_thoughts())
         
         try:
             result = await self.session.prompt(user_input)
-            # Format the markdown response for better terminal display
-            formatted_result = self._format_markdown_for_terminal(result)
-            await aioconsole.aprint(f"\n🤖 Agent: {formatted_result}\n")
-            self.watermark += 1  # Increment watermark after processing input
         finally:
-            # Always cancel the polling task when done
-            polling_task.cancel()
-            
+            # Always cancel the streaming task when done
+            thoughts_task.cancel()
+            await asyncio.gather(thoughts_task, return_exceptions=True)
+
+        # show the thoughts of the turn the stream had not received yet, but the
+        # answer, the turn's last thought, is printed as the response below
+        remaining = await self.session.thoughts(self.watermark)
+        self.watermark += len(remaining)
+        if remaining and remaining[-1] == result:
+            remaining.pop()
+        for line in remaining:
+            await self._show_thought(line)
+        # Format the markdown response for better terminal display
+        formatted_result = self._format_markdown_for_terminal(result)
+        await aioconsole.aprint(f"\n🤖 Agent: {formatted_result}\n")
         return result
\ No newline at end of file
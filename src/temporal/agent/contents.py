@@ -0,0 +1,9 @@
+from typing import Dict
+
+
+def is_user_prompt(content: Dict) -> bool:
+    """Check whether a serialized content is a user prompt rather than a function response."""
+    return (
+        content.get("role") == "user"
+        and not any("function_response" in part for part in content.get("parts", []))
+    )
@@ -0,0 +1,191 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from vertexai.generative_models import Content, Tool
+from vertexai.preview import caching
+from vertexai.preview.generative_models import GenerativeModel as CachedGenerativeModel
+
+from temporal.agent.contents import is_user_prompt
+
+def early_turns_end(contents: List[Dict], turns: int) -> int:
+    """Position of the first content after the first turns of the conversation.
+
+    Returns 0 unless a later turn has started, so the cached turns never
+    include the turn in progress.
+    """
+    turn_starts = [i for i, c in enumerate(contents) if is_user_prompt(c)]
+    if turns <= 0 or len(turn_starts) <= turns:
+        return 0
+    return turn_starts[turns]
+
+@dataclass
+class _ContextCachePolicy:
+    model_name: str
+    instruction: str
+    tool: Tool
+    ttl: float
+    turns: int
+    digest: str # Hash of the model, instruction and tool declarations
+
+@dataclass
+class _CacheEntry:
+    cached_content: Optional[caching.CachedContent] # None when the prefix could not be cached
+    model: Optional[CachedGenerativeModel]
+    expires_at: float # Monotonic time at which the cached content expires
+    ttl: float
+
+class ContextCache:
+    """
+    Worker-side registry of Vertex AI cached contents holding the stable prefix
+    of each agent's requests: its instruction, tool declarations and optionally
+    the early turns of the conversation.
+
+    Cached contents are created on first use, their TTL is extended while they
+    are used, and callers fall back to uncached calls whenever a prefix cannot
+    be cached, e.g. because it is below the model's minimum cacheable size.
+    """
+
+    def __init__(self, max_entries: int = 1000, refresh_margin: float = 0.5) -> None:
+        """Initialize the registry.
+
+        Args:
+            max_entries: Maximum number of cached contents tracked. The least recently
+                used ones are forgotten and expire with their TTL
+            refresh_margin: Fraction of the TTL left under which a used cached content
+                has its TTL extended
+        """
+        self.max_entries = max_entries
+        self.refresh_margin = refresh_margin
+        self.policies: Dict[str, _ContextCachePolicy] = {}
+        self.entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self.locks: Dict[str, asyncio.Lock] = {}
+        self.hits = 0
+        self.created = 0
+        self.refreshed = 0
+        self.fallbacks = 0
+
+    def register(self, agent_name: str, model_name: str, instruction: str, tool: Tool, ttl: float, turns: int = 0) -> None:
+        """Enable context caching for an agent.
+
+        Args:
+            agent_name: Agent whose requests are cached
+            model_name: Model of the agent. Cached contents are bound to a model
+            instruction: System instruction of the agent
+            tool: Tool declarations of the agent
+            ttl: Seconds a cached content lives without being used
+            turns: Number of early user turns of the conversation cached along with the instruction
+        """
+        declaration = {"model": model_name, "instruction": instruction, "tool": tool.to_dict()}
+        digest = hashlib.sha256(json.dumps(declaration, sort_keys=True).encode()).hexdigest()
+        self.policies[agent_name] = _ContextCachePolicy(model_name, instruction, tool, ttl, turns, digest)
+
+    async def resolve(
+        self, agent_name: str, contents: List[Dict]
+    ) -> Tuple[Optional[CachedGenerativeModel], Optional[str], List[Dict]]:
+        """Find or create the cached content of a call's prefix.
+
+        Args:
+            agent_name: Agent making the call
+            contents: Serialized conversation of the call
+
+        Returns:
+            The model bound to the cached content, the cache key and the contents left
+            to send, or no model when the call must be made uncached with all contents
+        """
+        policy = self.policies.get(agent_name)
+        if policy is None:
+            return None, None, contents
+
+        end = early_turns_end(contents, policy.turns)
+        prefix = contents[:end]
+        key = hashlib.sha256(
+            (policy.digest + json.dumps(prefix, sort_keys=True)).encode()
+        ).hexdigest()
+
+        # concurrent calls of the same agent create the cached content once
+        lock = self.locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = self.entries.get(key)
+            now = time.monotonic()
+            if entry is not None and entry.expires_at <= now:
+                self._forget(key)
+                entry = None
+            if entry is None:
+                entry = await self._create(agent_name, policy, prefix, key)
+            elif entry.cached_content and entry.expires_at - now < entry.ttl * self.refresh_margin:
+                entry = await self._refresh(key, entry)
+            if entry is None or entry.model is None:
+                self.fallbacks += 1
+                return None, None, contents
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry.model, key, contents[end:]
+
+    async def _create(
+        self, agent_name: str, policy: _ContextCachePolicy, prefix: List[Dict], key: str
+    ) -> _CacheEntry:
+        try:
+            cached_content = await asyncio.to_thread(
+                caching.CachedContent.create,
+                model_name=policy.model_name.removeprefix("models/"), # resolved as a publisher model
+                system_instruction=policy.instruction,
+                tools=[policy.tool],
+                contents=[Content.from_dict(c) for c in prefix] or None,
+                ttl=timedelta(seconds=policy.ttl),
+                display_name=f"{agent_name}-{key[:8]}",
+            )
+            model = CachedGenerativeModel.from_cached_content(cached_content)
+            self.created += 1
+            logging.info(f'Created context cache {cached_content.name} for agent {agent_name}')
+        except Exception as e:
+            # e.g. a prefix below the minimum cacheable tokens: call uncached until the TTL expires
+            logging.warning(f'Failed to create context cache for agent {agent_name}, calling uncached: {e}')
+            cached_content, model = None, None
+        entry = _CacheEntry(cached_content, model, time.monotonic() + policy.ttl, policy.ttl)
+        self._store(key, entry)
+        return entry
+
+    async def _refresh(self, key: str, entry: _CacheEntry) -> Optional[_CacheEntry]:
+        try:
+            await asyncio.to_thread(entry.cached_content.update, ttl=timedelta(seconds=entry.ttl))
+        except Exception as e:
+            logging.warning(f'Failed to refresh context cache {entry.cached_content.name}: {e}')
+            self._forget(key)
+            return None
+        entry.expires_at = time.monotonic() + entry.ttl
+        self.refreshed += 1
+        return entry
+
+    def invalidate(self, key: str) -> None:
+        """Forget a cached content found expired or deleted by the service."""
+        self.fallbacks += 1
+        self._forget(key)
+
+    def _store(self, key: str, entry: _CacheEntry) -> None:
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self._forget(next(iter(self.entries)))
+
+    def _forget(self, key: str) -> None:
+        self.entries.pop(key, None)
+        lock = self.locks.get(key)
+        if lock is not None and not lock.locked():
+            del self.locks[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Counts of calls served from cached contents, created and refreshed caches, and uncached fallbacks."""
+        return {
+            "hits": self.hits,
+            "created": self.created,
+            "refreshed": self.refreshed,
+            "fallbacks": self.fallbacks,
+            "entries": sum(1 for entry in self.entries.values() if entry.model is not None),
+        }
@@ -0,0 +1,245 @@
+import asyncio
+import json
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Union
+
+from vertexai.generative_models import Content, GenerationResponse
+
+from .llm_backend import LLMBackend
+
+@dataclass
+class FakeReply:
+    """Response of the fake model.
+
+    Attributes:
+        text: Text of the response
+        function_calls: Function calls of the response, as {"name": ..., "args": {...}}
+        latency: Seconds the response takes, the backend's latency if None
+        prompt_tokens: Reported prompt tokens, estimated from the request if None
+        candidate_tokens: Reported response tokens, estimated from the response if None
+        finish_reason: Finish reason of the candidate
+    """
+    text: Optional[str] = None
+    function_calls: List[Dict[str, Any]] = field(default_factory=list)
+    latency: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    candidate_tokens: Optional[int] = None
+    finish_reason: str = "STOP"
+
+    @classmethod
+    def call(cls, name: str, **args) -> "FakeReply":
+        """Reply with a single function call."""
+        return cls(function_calls=[{"name": name, "args": args}])
+
+@dataclass
+class FakeRequest:
+    """Request received by the fake model, passed to rules replying with a callable."""
+    agent_name: str
+    model_name: str
+    instruction: str
+    contents: List[Dict]
+    function_calling: bool # False when the tool config disables function calls, e.g. for summaries
+
+    def last_prompt(self) -> str:
+        """Text of the last user prompt."""
+        for content in reversed(self.contents):
+            if content.get("role") != "user":
+                continue
+            texts = [part["text"] for part in content.get("parts", []) if "text" in part]
+            if texts:
+                return "".join(texts)
+        return ""
+
+    def last_function_response(self) -> Optional[str]:
+        """Name of the function whose response ends the conversation, if any."""
+        if not self.contents:
+            return None
+        for part in self.contents[-1].get("parts", []):
+            if "function_response" in part:
+                return part["function_response"].get("name")
+        return None
+
+Reply = Union[FakeReply, List[FakeReply], Callable[[FakeRequest], Optional[FakeReply]]]
+
+@dataclass
+class FakeRule:
+    """Reply of the fake model to the requests matching all the set conditions.
+
+    Attributes:
+        reply: A reply, a list of replies played in order with the last one repeated,
+            or a callable building the reply of a request, None to leave it to the next rules
+        agent: Name of the agent making the request
+        model: Model name of the agent making the request
+        prompt_contains: Text contained in the last user prompt
+        after_function: Function whose response ends the conversation
+    """
+    reply: Reply
+    agent: Optional[str] = None
+    model: Optional[str] = None
+    prompt_contains: Optional[str] = None
+    after_function: Optional[str] = None
+    played: int = field(default=0, init=False) # Replies of the list played so far
+
+    def matches(self, request: FakeRequest) -> bool:
+        return (
+            (self.agent is None or self.agent == request.agent_name)
+            and (self.model is None or self.model == request.model_name)
+            and (self.prompt_contains is None or self.prompt_contains in request.last_prompt())
+            and (self.after_function is None or self.after_function == request.last_function_response())
+        )
+
+    def next_reply(self, request: FakeRequest) -> Optional[FakeReply]:
+        if callable(self.reply):
+            return self.reply(request)
+        if isinstance(self.reply, list):
+            reply = self.reply[min(self.played, len(self.reply) - 1)]
+            self.played += 1
+            return reply
+        return self.reply
+
+class FakeLLMBackend(LLMBackend):
+    """
+    Offline backend answering with scripted replies after a configurable latency,
+    to test and load-test agents without Vertex AI credentials or costs.
+
+    Rules are tried in order, and requests matching none get the default reply.
+    Token counts are estimated from the request and response sizes unless the
+    reply sets them.
+    """
+
+    def __init__(
+        self,
+        rules: Optional[List[FakeRule]] = None,
+        default: Optional[FakeReply] = None,
+        latency: float = 0.0,
+        chars_per_token: int = 4,
+        stream_chunks: int = 4,
+    ) -> None:
+        """Initialize the backend.
+
+        Args:
+            rules: Rules replying to the matching requests
+            default: Reply to the requests matching no rule, a "Done." text if None
+            latency: Seconds each reply takes, unless the reply sets its own
+            chars_per_token: Characters per token of the estimated token counts
+            stream_chunks: Number of chunks a streamed text reply is split into
+        """
+        self.rules = list(rules or [])
+        self.default = default or FakeReply(text="Done.")
+        self.latency = latency
+        self.chars_per_token = chars_per_token
+        self.stream_chunks = stream_chunks
+        self.calls: Dict[str, int] = {} # Number of requests by agent name
+
+    def add_rule(self, reply: Reply, **conditions) -> "FakeLLMBackend":
+        """Append a rule, taking the FakeRule conditions as keyword arguments."""
+        self.rules.append(FakeRule(reply=reply, **conditions))
+        return self
+
+    def create_model(self, agent_name: str, model_name: str, instruction: str) -> "FakeModel":
+        return FakeModel(self, agent_name, model_name, instruction)
+
+    def reply(self, request: FakeRequest) -> FakeReply:
+        """Reply of the first matching rule, or the default reply."""
+        self.calls[request.agent_name] = self.calls.get(request.agent_name, 0) + 1
+        for rule in self.rules:
+            if rule.matches(request):
+                reply = rule.next_reply(request)
+                if reply is not None:
+                    return reply
+        return self.default
+
+    def tokens(self, value: Any) -> int:
+        serialized = value if isinstance(value, str) else json.dumps(value)
+        return math.ceil(len(serialized) / self.chars_per_token)
+
+class FakeModel:
+    """Model of an agent answered by a FakeLLMBackend."""
+
+    def __init__(self, backend: FakeLLMBackend, agent_name: str, model_name: str, instruction: str) -> None:
+        self.backend = backend
+        self.agent_name = agent_name
+        self.model_name = model_name
+        self.instruction = instruction
+
+    def _request(self, contents: List[Content], tool_config: Any) -> FakeRequest:
+        return FakeRequest(
+            agent_name=self.agent_name,
+            model_name=self.model_name,
+            instruction=self.instruction,
+            contents=[c.to_dict() if hasattr(c, "to_dict") else c for c in contents],
+            function_calling=tool_config is None,
+        )
+
+    def _parts(self, request: FakeRequest, reply: FakeReply) -> List[Dict]:
+        parts = [{"text": reply.text}] if reply.text else []
+        if request.function_calling:
+            parts += [{"function_call": call} for call in reply.function_calls]
+        return parts or [{"text": self.backend.default.text or ""}]
+
+    def _usage(self, request: FakeRequest, reply: FakeReply, parts: List[Dict]) -> Dict:
+        prompt_tokens = reply.prompt_tokens
+        if prompt_tokens is None:
+            prompt_tokens = self.backend.tokens(self.instruction) + self.backend.tokens(request.contents)
+        candidate_tokens = reply.candidate_tokens
+        if candidate_tokens is None:
+            candidate_tokens = self.backend.tokens(parts)
+        return {
+            "prompt_token_count": prompt_tokens,
+            "candidates_token_count": candidate_tokens,
+            "total_token_count": prompt_tokens + candidate_tokens,
+        }
+
+    def _latency(self, reply: FakeReply) -> float:
+        return self.backend.latency if reply.latency is None else reply.latency
+
+    def _response(self, request: FakeRequest, reply: FakeReply) -> GenerationResponse:
+        parts = self._parts(request, reply)
+        return GenerationResponse.from_dict({
+            "candidates": [{
+                "content": {"role": "model", "parts": parts},
+                "finish_reason": reply.finish_reason,
+            }],
+            "usage_metadata": self._usage(request, reply, parts),
+        })
+
+    def generate_content(self, contents: List[Content], *, tool_config: Any = None, **kwargs) -> GenerationResponse:
+        """Blocking variant of generate_content_async, for comparisons with synchronous callers."""
+        request = self._request(contents, tool_config)
+        reply = self.backend.reply(request)
+        time.sleep(self._latency(reply))
+        return self._response(request, reply)
+
+    async def generate_content_async(
+        self,
+        contents: List[Content],
+        *,
+        tool_config: Any = None,
+        stream: bool = False,
+        **kwargs,
+    ) -> Union[GenerationResponse, AsyncIterator[GenerationResponse]]:
+        request = self._request(contents, tool_config)
+        reply = self.backend.reply(request)
+        if stream:
+            return self._stream(request, reply)
+        await asyncio.sleep(self._latency(reply))
+        return self._response(request, reply)
+
+    async def _stream(self, request: FakeRequest, reply: FakeReply) -> AsyncIterator[GenerationResponse]:
+        """Stream the text in chunks spread over the latency, then the function calls and usage."""
+        parts = self._parts(request, reply)
+        text = "".join(part.get("text", "") for part in parts)
+        chunks = self.backend.stream_chunks if text else 1
+        size = math.ceil(len(text) / chunks) if text else 0
+        for i in range(chunks):
+            await asyncio.sleep(self._latency(reply) / chunks)
+            chunk_parts = [{"text": text[i * size:(i + 1) * size]}] if text else []
+            candidate = {"content": {"role": "model", "parts": chunk_parts}}
+            chunk = {"candidates": [candidate]}
+            if i == chunks - 1:
+                candidate["content"]["parts"] += [part for part in parts if "text" not in part]
+                candidate["finish_reason"] = reply.finish_reason
+                chunk["usage_metadata"] = self._usage(request, reply, parts)
+            yield GenerationResponse.from_dict(chunk)
@@ -0,0 +1,64 @@
+from abc import ABC, abstractmethod
+from typing import Any, List, Optional, Protocol
+
+import vertexai
+from vertexai.generative_models import (
+    Content,
+    GenerationConfig,
+    GenerativeModel,
+    Tool,
+    ToolConfig,
+)
+
+class LLMModel(Protocol):
+    """Model called by LLMManager, with the interface of Vertex AI's GenerativeModel.
+
+    Requests and responses are Vertex AI types: generate_content_async returns a
+    GenerationResponse, or an async iterator of GenerationResponse chunks when stream is set.
+    """
+
+    async def generate_content_async(
+        self,
+        contents: List[Content],
+        *,
+        generation_config: Optional[GenerationConfig] = None,
+        tools: Optional[List[Tool]] = None,
+        tool_config: Optional[ToolConfig] = None,
+        stream: bool = False,
+    ) -> Any:
+        ...
+
+class LLMBackend(ABC):
+    """Provider of the models of the agents."""
+
+    # Whether the models can be served from Vertex AI cached contents
+    supports_context_cache: bool = False
+
+    @abstractmethod
+    def create_model(self, agent_name: str, model_name: str, instruction: str) -> LLMModel:
+        """Create the model of an agent.
+
+        Args:
+            agent_name: Agent the model answers for
+            model_name: Model name configured on the agent
+            instruction: System instruction of the agent
+        """
+
+class VertexBackend(LLMBackend):
+    """Backend calling Vertex AI's Gemini models."""
+
+    supports_context_cache = True
+
+    def __init__(self, project: Optional[str] = None, location: Optional[str] = None) -> None:
+        """Initialize the backend.
+
+        Args:
+            project: GCP project of the Vertex AI calls
+            location: Vertex AI region. vertexai.init is only called when the project or
+                location is set, so an existing initialization is kept otherwise
+        """
+        if project or location:
+            vertexai.init(project=project, location=location)
+
+    def create_model(self, agent_name: str, model_name: str, instruction: str) -> GenerativeModel:
+        return GenerativeModel(model_name, system_instruction=instruction)
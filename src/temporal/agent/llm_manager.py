@@ -1,18 +1,95 @@
+import hashlib
+import json
 import logging
-from typing import Dict, List, Tuple
-from dataclasses import dataclass
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
 
+from google.api_core import exceptions as google_exceptions
 from temporalio import activity
-from vertexai.generative_models import GenerativeModel, Content, GenerationConfig, Tool
+from temporalio.exceptions import ApplicationError
+from vertexai.generative_models import (
+    Content,
+    GenerationConfig,
+    Part,
+    Tool,
+    ToolConfig,
+)
 
 from .tools_util import create_enhanced_tool
 from .agent import Agent
+from .context_cache import ContextCache
+from .llm_backend import LLMBackend, LLMModel, VertexBackend
+from .response_cache import ResponseCache, is_cacheable, response_cache_key
+from .metrics import record_llm_call
+
+# Error type raised by call_llm when the conversation prefix is not cached on this worker
+CONVERSATION_CACHE_MISS = "ConversationCacheMiss"
+
+# Generation parameters of call_llm, deterministic so that responses can be cached
+CALL_LLM_GENERATION_CONFIG = {"temperature": 0}
+
+SUMMARY_PROMPT = (
+    "Summarize the conversation so far. Keep the user's requests, the facts and "
+    "results gathered by function calls, and any open questions. Reply with the summary only."
+)
+
+def chain_contents_hash(prefix_hash: str, contents: List[Dict]) -> str:
+    """Extend a conversation hash with the given serialized contents.
+
+    The hash is chained per content so that both the workflow and the activity
+    can compute the hash of a conversation incrementally.
+
+    Args:
+        prefix_hash: Hash of the conversation so far, empty for a new conversation
+        contents: Serialized contents to append to the conversation
+
+    Returns:
+        Hash of the conversation including the given contents
+    """
+    digest = prefix_hash
+    for content in contents:
+        serialized = json.dumps(content, sort_keys=True)
+        digest = hashlib.sha256(f"{digest}{serialized}".encode()).hexdigest()
+    return digest
 
 @dataclass
 class LLMCallInput:
-    """Input for the LLM call activity."""
+    """Input for the LLM call activity.
+
+    When prefix_hash is set, contents only holds the turns appended after the
+    conversation identified by prefix_hash, which must be cached on the worker.
+    """
     agent_name: str
     contents: List[Dict]
+    prefix_hash: Optional[str] = None
+    cache_contents: bool = False
+    stream: bool = False
+    stream_to: Optional[str] = None # Workflow receiving the partial text of a streamed response
+    agent_path: Optional[str] = None
+    model_tier: int = 0 # Index of the model in the agent's tiers, its model_name first
+
+@dataclass
+class PartialText:
+    """Text streamed by an agent's LLM call since the previous partial text."""
+    agent_path: str
+    text: str
+
+@dataclass
+class SummarizeInput:
+    """Input for the summarization activity."""
+    agent_name: str
+    contents: List[Dict]
+    max_output_tokens: int = 1024
+
+@dataclass
+class SummarizeOutput:
+    """Output of the summarization activity."""
+    text: str
+    usage_metadata: Dict = field(default_factory=dict)
 
 class LLMManager:
     """Manager for LLMs and tools to facilitate Temporal Activity calls.
@@ -21,17 +98,43 @@ class LLMManager:
     Attributes:
         agent: The root Agent instance containing the model and tools
         llms: Dictionary of LLMs and tools
+        escalation_models: Models of the agents' routing tiers above their model_name
+        conversations: Worker-local conversation cache keyed by workflow run ID
+        context_cache: Vertex AI cached contents of the agents with context_cache enabled
+        response_cache: Cache of call_llm responses, if any
     """
 
-    llms: Dict[str, Tuple[GenerativeModel, Tool]]
+    llms: Dict[str, Tuple[LLMModel, Tool]]
+    conversations: "OrderedDict[str, Tuple[str, List[Dict]]]"
     
-    def __init__(self, root_agent: Agent) -> None:
+    def __init__(
+        self,
+        root_agent: Agent,
+        max_cached_conversations: int = 1000,
+        stream_flush_interval: float = 0.25,
+        response_cache: Optional[ResponseCache] = None,
+        backend: Optional[LLMBackend] = None,
+    ) -> None:
         """Initialize the LLM with the agent's model and tools.
 
         Args:
             agent: The Agent instance containing the model and tools
+            max_cached_conversations: Maximum number of workflow runs to cache conversations for
+            stream_flush_interval: Minimum seconds between two partial texts forwarded by a streamed call
+            response_cache: Cache serving identical call_llm requests without calling the model
+            backend: Provider of the agents' models, Vertex AI if None
         """
         self.llms = {}
+        self.model_names: Dict[str, str] = {}
+        self.escalation_models: Dict[str, List[Tuple[str, LLMModel]]] = {}
+        self.instructions: Dict[str, str] = {}
+        self.conversations = OrderedDict()
+        self.max_cached_conversations = max_cached_conversations
+        self.stream_flush_interval = stream_flush_interval
+        self._conversations_lock = threading.Lock()
+        self.context_cache = ContextCache()
+        self.response_cache = response_cache
+        self.backend = backend or VertexBackend()
         self._build_llms(root_agent)
     
     def _build_llms(self, agent: Agent) -> None:
@@ -42,30 +145,246 @@ class LLMManager:
         )
         logging.debug(f'Creating tool for agent: {agent.name} with functions: {agent.functions} and sub_agents: {agent.sub_agents}')
         
-        model = GenerativeModel(
-            agent.model_name,
-            system_instruction=agent.instruction,
-        )
+        model = self.backend.create_model(agent.name, agent.model_name, agent.instruction)
         self.llms[agent.name] = [model, tool]
+        self.model_names[agent.name] = agent.model_name
+        self.escalation_models[agent.name] = [
+            (model_name, self.backend.create_model(agent.name, model_name, agent.instruction))
+            for model_name in agent.routing.models
+        ]
+        self.instructions[agent.name] = agent.instruction
+        if agent.context_cache and self.backend.supports_context_cache:
+            self.context_cache.register(
+                agent.name,
+                agent.model_name,
+                agent.instruction,
+                tool,
+                ttl=agent.context_cache_ttl,
+                turns=agent.context_cache_turns,
+            )
         
         for sub_agent in agent.sub_agents:
             self._build_llms(sub_agent)
 
+    def _resolve_contents(self, call_input: LLMCallInput) -> List[Dict]:
+        """Resolve the full conversation for the call, expanding a delta against the cache."""
+        if call_input.prefix_hash is None:
+            return call_input.contents
+
+        run_id = activity.info().workflow_run_id
+        with self._conversations_lock:
+            cached = self.conversations.get(run_id)
+        if cached is None or cached[0] != call_input.prefix_hash:
+            raise ApplicationError(
+                f"Conversation prefix {call_input.prefix_hash} is not cached for run {run_id}",
+                type=CONVERSATION_CACHE_MISS,
+                non_retryable=True,
+            )
+        return cached[1] + call_input.contents
+
+    def _cache_contents(self, call_input: LLMCallInput, contents: List[Dict]) -> None:
+        """Cache the conversation of the call for the next delta call of the same run."""
+        conversation_hash = chain_contents_hash(call_input.prefix_hash or "", call_input.contents)
+        run_id = activity.info().workflow_run_id
+        with self._conversations_lock:
+            self.conversations[run_id] = (conversation_hash, contents)
+            self.conversations.move_to_end(run_id)
+            while len(self.conversations) > self.max_cached_conversations:
+                self.conversations.popitem(last=False)
+
     @activity.defn
-    def call_llm(self, call_input: LLMCallInput) -> Dict:
-        """Activity to call the LLM with the given input."""
+    async def call_llm(self, call_input: LLMCallInput) -> Dict:
+        """Activity to call the LLM with the given input.
+
+        Runs on the worker's event loop, so concurrent calls are only bounded
+        by the worker's max_concurrent_activities.
+        """
         
-        model = self.llms[call_input.agent_name][0]
+        model_name, model = self._tier_model(call_input.agent_name, call_input.model_tier)
         tool = self.llms[call_input.agent_name][1]
 
-        # Convert dict to Content objects
-        vertex_contents = [Content.from_dict(c) for c in call_input.contents]
+        contents = self._resolve_contents(call_input)
 
         activity.logger.debug(f'Generates content with tool: {tool}')
 
-        # Generate response
-        return model.generate_content(
+        response = None
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key = response_cache_key(
+                model_name,
+                self.instructions[call_input.agent_name],
+                tool,
+                contents,
+                CALL_LLM_GENERATION_CONFIG,
+            )
+            response = self.response_cache.get(cache_key)
+            if response is not None:
+                activity.logger.debug(f'Response cache hit for agent {call_input.agent_name}')
+
+        if response is None:
+            # Generate response
+            start = time.perf_counter()
+            response = await self._generate(call_input, model, tool, contents)
+            self._record_llm_call(call_input.agent_name, model_name, "call_llm", start, response)
+            if cache_key is not None and is_cacheable(response):
+                self.response_cache.put(cache_key, response)
+
+        # Cache the conversation only once the call succeeded, so a retry still finds its prefix
+        if call_input.cache_contents:
+            self._cache_contents(call_input, contents)
+        return response
+
+    def _tier_model(self, agent_name: str, tier: int) -> Tuple[str, LLMModel]:
+        """Model name and model of an agent's routing tier, the top tier beyond it."""
+        escalation_models = self.escalation_models.get(agent_name)
+        if tier <= 0 or not escalation_models:
+            return self.model_names[agent_name], self.llms[agent_name][0]
+        return escalation_models[min(tier, len(escalation_models)) - 1]
+
+    async def _generate(self, call_input: LLMCallInput, model: LLMModel, tool: Tool, contents: List[Dict]) -> Dict:
+        """Generate the response, from the agent's cached content when there is one."""
+        if model is not self.llms[call_input.agent_name][0]: # the cached content is bound to the agent's model_name
+            return await self._generate_with(call_input, model, [tool], contents)
+        cached_model, cache_key, remaining = await self.context_cache.resolve(call_input.agent_name, contents)
+        if cached_model is not None:
+            try:
+                # the instruction and tools are part of the cached content
+                return await self._generate_with(call_input, cached_model, None, remaining)
+            except google_exceptions.NotFound as e:
+                # the cached content expired or was deleted before its TTL was extended
+                activity.logger.info(f'Context cache of agent {call_input.agent_name} not found, calling uncached: {e}')
+                self.context_cache.invalidate(cache_key)
+        return await self._generate_with(call_input, model, [tool], contents)
+
+    async def _generate_with(
+        self,
+        call_input: LLMCallInput,
+        model: LLMModel,
+        tools: Optional[List[Tool]],
+        contents: List[Dict],
+    ) -> Dict:
+        # Convert dict to Content objects
+        vertex_contents = [Content.from_dict(c) for c in contents]
+        if call_input.stream:
+            return await self._stream_llm(model, tools, vertex_contents, call_input)
+        return (await model.generate_content_async(
             contents=vertex_contents,
-            generation_config=GenerationConfig(temperature=0),
+            generation_config=GenerationConfig(**CALL_LLM_GENERATION_CONFIG),
+            tools=tools,
+        )).to_dict()
+
+    async def _stream_llm(
+        self,
+        model: LLMModel,
+        tools: Optional[List[Tool]],
+        vertex_contents: List[Content],
+        call_input: LLMCallInput,
+    ) -> Dict:
+        """Stream the LLM response, forwarding partial text, and assemble the full response."""
+        stream = await model.generate_content_async(
+            contents=vertex_contents,
+            generation_config=GenerationConfig(**CALL_LLM_GENERATION_CONFIG),
+            tools=tools,
+            stream=True,
+        )
+        text_length = 0
+        pending = ""
+        parts: List[Dict] = [] # in arrival order, adjacent text chunks merged
+        candidate: Dict = {}
+        usage_metadata: Dict = {}
+        last_flush = time.monotonic()
+        async for chunk in stream:
+            chunk = chunk.to_dict()
+            usage_metadata = chunk.get("usage_metadata") or usage_metadata
+            if not chunk.get("candidates"):
+                continue
+            chunk_candidate = chunk["candidates"][0]
+            for part in chunk_candidate.get("content", {}).get("parts", []):
+                if "text" in part:
+                    text_length += len(part["text"])
+                    pending += part["text"]
+                    if parts and "text" in parts[-1]:
+                        parts[-1] = {**parts[-1], "text": parts[-1]["text"] + part["text"]}
+                        continue
+                if part:
+                    parts.append(part)
+            candidate.update({k: v for k, v in chunk_candidate.items() if k not in ("content", "index")})
+            activity.heartbeat(text_length)
+
+            if pending and time.monotonic() - last_flush >= self.stream_flush_interval:
+                await self._forward_partial_text(call_input, pending)
+                pending = ""
+                last_flush = time.monotonic()
+
+        if pending:
+            await self._forward_partial_text(call_input, pending)
+
+        candidate["content"] = {"role": "model", "parts": parts}
+        return {"candidates": [candidate], "usage_metadata": usage_metadata}
+
+    async def _forward_partial_text(self, call_input: LLMCallInput, text: str) -> None:
+        """Signal partial text to the session, on a best effort basis."""
+        if not call_input.stream_to:
+            return
+        try:
+            handle = activity.client().get_workflow_handle(call_input.stream_to)
+            await handle.signal("add_partial_text", PartialText(
+                agent_path=call_input.agent_path or call_input.agent_name,
+                text=text,
+            ))
+        except Exception as e:
+            activity.logger.warning(f'Failed to forward partial text to {call_input.stream_to}: {e}')
+
+    @activity.defn
+    async def summarize_contents(self, summarize_input: SummarizeInput) -> SummarizeOutput:
+        """Activity to summarize the given contents with the agent's model.
+
+        The summary is empty if the model returned no text, e.g. when blocked by safety filters.
+        """
+
+        model = self.llms[summarize_input.agent_name][0]
+        tool = self.llms[summarize_input.agent_name][1]
+
+        vertex_contents = [Content.from_dict(c) for c in summarize_input.contents]
+        vertex_contents.append(Content(role="user", parts=[Part.from_text(SUMMARY_PROMPT)]))
+
+        # Tools are declared for the function calls in the contents, but not callable
+        start = time.perf_counter()
+        response = await model.generate_content_async(
+            contents=vertex_contents,
+            generation_config=GenerationConfig(
+                temperature=0,
+                max_output_tokens=summarize_input.max_output_tokens,
+            ),
             tools=[tool],
-        ).to_dict()
\ No newline at end of file
+            tool_config=ToolConfig(
+                function_calling_config=ToolConfig.FunctionCallingConfig(
+                    mode=ToolConfig.FunctionCallingConfig.Mode.NONE,
+                )
+            ),
+        )
+        response_dict = response.to_dict()
+        self._record_llm_call(
+            summarize_input.agent_name,
+            self.model_names[summarize_input.agent_name],
+            "summarize_contents",
+            start,
+            response_dict,
+        )
+        try:
+            text = response.text
+        except ValueError: # no candidate or no text part
+            text = ""
+        return SummarizeOutput(text=text, usage_metadata=response_dict.get("usage_metadata", {}))
+
+    def _record_llm_call(self, agent_name: str, model_name: str, operation: str, start: float, response: Dict) -> None:
+        if not activity.in_activity(): # called directly, e.g. from a benchmark
+            return
+        record_llm_call(
+            activity.metric_meter(),
+            agent_name,
+            model_name,
+            operation,
+            timedelta(seconds=time.perf_counter() - start),
+            response.get("usage_metadata", {}),
+        )
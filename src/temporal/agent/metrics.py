@@ -0,0 +1,109 @@
+import time
+from datetime import timedelta
+from typing import Any, Dict
+
+from temporalio import activity
+from temporalio.common import MetricMeter
+from temporalio.runtime import PrometheusConfig, Runtime, TelemetryConfig
+from temporalio.worker import (
+    ActivityInboundInterceptor,
+    ExecuteActivityInput,
+    Interceptor,
+)
+
+# Metric names, exported with the SDK metrics through the runtime's telemetry
+LLM_LATENCY = "agent_llm_latency"
+LLM_INPUT_TOKENS = "agent_llm_input_tokens"
+LLM_OUTPUT_TOKENS = "agent_llm_output_tokens"
+LLM_CACHED_TOKENS = "agent_llm_cached_tokens"
+LLM_CACHED_TOKEN_RATIO = "agent_llm_cached_token_ratio"
+TOOL_LATENCY = "agent_tool_latency"
+TOOL_CALLS = "agent_tool_calls"
+TOOL_CACHE_LOOKUPS = "agent_tool_cache_lookups"
+ACTIVITY_SCHEDULE_TO_START_LATENCY = "agent_activity_schedule_to_start_latency"
+CHILD_WORKFLOW_DEPTH = "agent_child_workflow_depth"
+
+# Activities calling the LLM, recording their own metrics
+LLM_ACTIVITIES = {"call_llm", "summarize_contents"}
+
+def record_llm_call(
+    meter: MetricMeter,
+    agent_name: str,
+    model_name: str,
+    operation: str,
+    latency: timedelta,
+    usage_metadata: Dict[str, Any],
+) -> None:
+    """Record the latency and token usage of an LLM call.
+
+    Args:
+        meter: Metric meter of the calling activity
+        agent_name: Agent whose model was called
+        model_name: Model called
+        operation: Activity calling the model, e.g. call_llm or summarize_contents
+        latency: Duration of the call
+        usage_metadata: Usage metadata of the response, as a dict
+    """
+    attributes = {"agent": agent_name, "model": model_name, "operation": operation}
+    meter.create_histogram_timedelta(LLM_LATENCY, "LLM call latency", "ms").record(latency, attributes)
+    for name, key in (
+        (LLM_INPUT_TOKENS, "prompt_token_count"),
+        (LLM_OUTPUT_TOKENS, "candidates_token_count"),
+        (LLM_CACHED_TOKENS, "cached_content_token_count"),
+    ):
+        tokens = usage_metadata.get(key, 0)
+        if tokens:
+            meter.create_counter(name, unit="tokens").add(tokens, attributes)
+    prompt_tokens = usage_metadata.get("prompt_token_count", 0)
+    if prompt_tokens:
+        cached_tokens = usage_metadata.get("cached_content_token_count", 0)
+        meter.create_histogram_float(
+            LLM_CACHED_TOKEN_RATIO, "Share of the prompt tokens served from a context cache"
+        ).record(cached_tokens / prompt_tokens, attributes)
+
+def record_tool_cache_lookup(meter: MetricMeter, function_name: str, hit: bool) -> None:
+    """Count a lookup of the tool result cache, as a hit or a miss of the function."""
+    meter.create_counter(TOOL_CACHE_LOOKUPS, "Tool result cache lookups, by hit").add(
+        1, {"activity_type": function_name, "hit": hit}
+    )
+
+def prometheus_runtime(bind_address: str) -> Runtime:
+    """Build a Temporal runtime serving the SDK and agent metrics on a Prometheus endpoint.
+
+    Args:
+        bind_address: Address of the endpoint, e.g. "0.0.0.0:9464"
+    """
+    return Runtime(telemetry=TelemetryConfig(metrics=PrometheusConfig(bind_address=bind_address)))
+
+class MetricsInterceptor(Interceptor):
+    """
+    Worker interceptor recording the latency and errors of tool activities, and
+    the schedule-to-start latency of every activity, by activity type.
+    """
+
+    def intercept_activity(self, next: ActivityInboundInterceptor) -> ActivityInboundInterceptor:
+        return _MetricsActivityInbound(next)
+
+class _MetricsActivityInbound(ActivityInboundInterceptor):
+    async def execute_activity(self, input: ExecuteActivityInput) -> Any:
+        info = activity.info()
+        meter = activity.metric_meter()
+        attributes = {"activity_type": info.activity_type}
+        if info.current_attempt_scheduled_time and info.started_time:
+            meter.create_histogram_timedelta(
+                ACTIVITY_SCHEDULE_TO_START_LATENCY, "Activity schedule-to-start latency", "ms"
+            ).record(info.started_time - info.current_attempt_scheduled_time, attributes)
+        if info.activity_type in LLM_ACTIVITIES:
+            return await super().execute_activity(input)
+
+        start = time.perf_counter()
+        error = False
+        try:
+            return await super().execute_activity(input)
+        except BaseException:
+            error = True
+            raise
+        finally:
+            latency = timedelta(seconds=time.perf_counter() - start)
+            meter.create_histogram_timedelta(TOOL_LATENCY, "Tool call latency", "ms").record(latency, attributes)
+            meter.create_counter(TOOL_CALLS, "Tool calls, by error").add(1, {**attributes, "error": error})
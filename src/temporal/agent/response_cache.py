@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from vertexai.generative_models import Tool
+
+def response_cache_key(
+    model_name: str,
+    instruction: str,
+    tool: Tool,
+    contents: List[Dict],
+    generation_config: Dict[str, Any],
+) -> str:
+    """Build the cache key of an LLM request.
+
+    Args:
+        model_name: Model called
+        instruction: System instruction of the agent
+        tool: Tool declarations of the agent
+        contents: Serialized conversation sent to the model
+        generation_config: Generation parameters of the call, e.g. {"temperature": 0}
+    """
+    request = {
+        "model": model_name,
+        "instruction": instruction,
+        "tool": tool.to_dict(),
+        "generation_config": generation_config,
+        "contents": contents,
+    }
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode()).hexdigest()
+
+def is_cacheable(response: Dict) -> bool:
+    """Only complete responses are cached, not blocked or truncated ones."""
+    candidates = response.get("candidates") or []
+    return bool(candidates) and candidates[0].get("finish_reason") == "STOP"
+
+class ResponseCache(ABC):
+    """
+    Cache of LLM responses keyed by request, for calls made at temperature 0.
+    Responses are stored as JSON, so a hit returns a payload equal to the
+    to_dict() of the original response.
+    """
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Look up a response, counting a hit or a miss."""
+        serialized = self._get(key)
+        if serialized is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(serialized)
+
+    def put(self, key: str, response: Dict) -> None:
+        """Store a response, evicting the least recently used responses beyond the size limit."""
+        self._put(key, json.dumps(response))
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[str]:
+        """Serialized response of a key, marking it as recently used."""
+
+    @abstractmethod
+    def _put(self, key: str, serialized: str) -> None:
+        """Store a serialized response."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Drop all responses."""
+
+    @abstractmethod
+    def size(self) -> Dict[str, int]:
+        """Number of entries and bytes stored."""
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit and miss counts, along with the cache occupancy."""
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, **self.size()}
+
+class InMemoryResponseCache(ResponseCache):
+    """Response cache held in the worker's memory."""
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024) -> None:
+        """Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of cached responses
+            max_bytes: Maximum size of the cached responses, serialized as JSON
+        """
+        super().__init__()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[str, str]" = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[str]:
+        with self.lock:
+            serialized = self.entries.get(key)
+            if serialized is not None:
+                self.entries.move_to_end(key)
+            return serialized
+
+    def _put(self, key: str, serialized: str) -> None:
+        if len(serialized) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.bytes -= len(self.entries.pop(key))
+            self.entries[key] = serialized
+            self.bytes += len(serialized)
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def size(self) -> Dict[str, int]:
+        with self.lock:
+            return {"entries": len(self.entries), "bytes": self.bytes}
+
+class SQLiteResponseCache(ResponseCache):
+    """
+    Response cache stored in a SQLite file, read through a memory map, so that
+    responses survive worker restarts and can be shared by the workers of a host.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 1024 * 1024 * 1024) -> None:
+        """Initialize the cache, creating the database file if needed.
+
+        Args:
+            path: Path of the database file
+            max_bytes: Maximum size of the cached responses, serialized as JSON
+        """
+        super().__init__()
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(f"PRAGMA mmap_size={max_bytes}")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, used_at REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)")
+
+    def _get(self, key: str) -> Optional[str]:
+        with self.lock:
+            row = self.connection.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self.connection.execute("UPDATE responses SET used_at = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def _put(self, key: str, serialized: str) -> None:
+        size = len(serialized)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, used_at) VALUES (?, ?, ?, ?)",
+                (key, serialized, size, time.time()),
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        excess = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return
+        evicted = []
+        for key, size in self.connection.execute("SELECT key, size FROM responses ORDER BY used_at"):
+            evicted.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self.connection.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        self.evictions += len(evicted)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.connection.execute("DELETE FROM responses")
+
+    def size(self) -> Dict[str, int]:
+        with self.lock:
+            entries, size = self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {"entries": entries, "bytes": size}
+
+    def close(self) -> None:
+        self.connection.close()
@@ -6,13 +6,19 @@ from typing import List
 from concurrent.futures import ThreadPoolExecutor
 
 from temporalio.client import Client
+from temporalio.converter import PayloadCodec
 from temporalio.worker import Worker
 from temporalio import activity, workflow
 
 with workflow.unsafe.imports_passed_through():
-    import vertexai
     from temporal.agent import Agent
+    from temporal.agent.codec import data_converter
+    from temporal.agent.llm_backend import LLMBackend, VertexBackend
     from temporal.agent.llm_manager import LLMManager
+    from temporal.agent.response_cache import ResponseCache
+    from temporal.agent.tool_cache import ToolResultCache, cached_activity
+    from temporal.agent.timing import SpanSink, TimingInterceptor
+    from temporal.agent.metrics import MetricsInterceptor, prometheus_runtime
     from temporal.agent.workflow import AgentWorkflow
 
 class Runner:
@@ -29,22 +35,67 @@ class Runner:
         agent: Agent,
         region: str = "us-central1",
         temporal_address: str = "localhost:7233",
-        task_queue: str = "agent-task-queue"
+        task_queue: str = "agent-task-queue",
+        payload_codec: PayloadCodec = None,
+        tool_cache: ToolResultCache = None,
+        response_cache: ResponseCache = None,
+        llm_backend: LLMBackend = None,
+        span_sink: SpanSink = None,
+        metrics_address: str = None,
+        max_concurrent_activities: int = 1000,
+        max_tool_threads: int = None
     ):
+        """Initialize the runner.
+
+        Args:
+            app_name: Name of the application
+            agent: Root agent
+            region: Vertex AI region
+            temporal_address: Address of the Temporal server
+            task_queue: Task queue name of the worker
+            payload_codec: Payload codec of the client and worker
+            tool_cache: Cache of the results of the agents' cached functions,
+                a ToolResultCache with default bounds if None
+            response_cache: Cache of the LLM responses, e.g. an InMemoryResponseCache or a
+                SQLiteResponseCache. Identical LLM requests are sent to the model every time if None
+            llm_backend: Provider of the agents' models, e.g. a FakeLLMBackend to run offline.
+                Vertex AI in the region and the GCP_PROJECT_ID project if None
+            span_sink: Sink of the per-turn timing spans, recorded by a TimingInterceptor
+                on the client and worker when set
+            metrics_address: Address of a Prometheus endpoint serving the SDK and agent
+                metrics, e.g. "0.0.0.0:9464". Metrics are not exported if None
+            max_concurrent_activities: Maximum number of activities run at once by the worker.
+                LLM calls are async, so this is what bounds concurrent LLM calls
+            max_tool_threads: Number of threads running the synchronous tool functions,
+                max_concurrent_activities if None. Threads are only started as tools need them.
+                Fewer threads cap concurrent synchronous tools, but an activity waiting for a
+                thread has already started, so its start-to-close timeout runs while it waits
+        """
         self.app_name = app_name
         self.agent = agent
         self.region = region
         self.temporal_address = temporal_address
         self.task_queue = task_queue
+        self.payload_codec = payload_codec
         self.gcp_project = os.getenv("GCP_PROJECT_ID")
+        self.tool_cache = tool_cache or ToolResultCache()
+        self.response_cache = response_cache
+        self.llm_backend = llm_backend or VertexBackend(project=self.gcp_project, location=self.region)
+        self.span_sink = span_sink
+        self.metrics_address = metrics_address
+        self.max_concurrent_activities = max_concurrent_activities
+        self.max_tool_threads = max_tool_threads or max_concurrent_activities
+        if self.max_tool_threads < max_concurrent_activities:
+            logging.warning(
+                'max_tool_threads (%d) is below max_concurrent_activities (%d): synchronous tools '
+                'may time out while waiting for a thread',
+                self.max_tool_threads, max_concurrent_activities,
+            )
         
         self.worker_task = None
         self.activities = self._functions_to_activities(agent)
         self.client = None
         
-        # Initialize vertexai
-        vertexai.init(project=self.gcp_project, location=self.region)
-        
         logging.debug('Runner initialized with activities: %s', self.activities)
         
     def _functions_to_activities(self, agent: Agent) -> List[callable]:
@@ -52,6 +103,9 @@ class Runner:
         functions = []
 
         for fn in agent.functions:
+            if fn.__name__ in agent.cache_ttls:
+                functions.append(cached_activity(fn, self.tool_cache, agent.cache_ttls[fn.__name__]))
+                continue
             if not hasattr(fn, "__temporal_activity_definition"):
                 activity.defn(fn)
             functions.append(fn)
@@ -64,18 +118,29 @@ class Runner:
     async def _connect(self) -> None:
         """Connect to the Temporal server."""
         if self.client is None:
-            self.client = await Client.connect(self.temporal_address)    
+            options = {}
+            if self.payload_codec:
+                options["data_converter"] = data_converter(self.payload_codec)
+            if self.span_sink:
+                # the worker picks up the interceptor from the client
+                options["interceptors"] = [TimingInterceptor(self.span_sink)]
+            if self.metrics_address:
+                options["runtime"] = prometheus_runtime(self.metrics_address)
+            self.client = await Client.connect(self.temporal_address, **options)
     
     @cached_property
     async def worker(self) -> Worker:
         """Build the Temporal worker for the agent."""
         await self._connect()
+        llm_manager = LLMManager(self.agent, response_cache=self.response_cache, backend=self.llm_backend)
         return Worker(
             self.client,
             task_queue=self.task_queue,
             workflows=[AgentWorkflow],
-            activities=self.activities + [LLMManager(self.agent).call_llm],
-            activity_executor=ThreadPoolExecutor(100),
+            activities=self.activities + [llm_manager.call_llm, llm_manager.summarize_contents],
+            activity_executor=ThreadPoolExecutor(self.max_tool_threads), # sync tool functions only
+            max_concurrent_activities=self.max_concurrent_activities,
+            interceptors=[MetricsInterceptor()],
         )
         
     async def run(self) -> None:
@@ -1,9 +1,12 @@
+import asyncio
 import logging
-from typing import List, Dict, Union, Any
+from typing import AsyncIterator, List, Dict, Optional, Union, Any
 
 from temporalio.client import Client
+from temporalio.converter import PayloadCodec
 
-from .workflow import AgentWorkflow, AgentWorkflowInput
+from .codec import with_payload_codec
+from .workflow import AgentWorkflow, AgentWorkflowInput, AgentConfig, ModelChoice, TaggedModelContent, TokenUsage
 from .agent import Agent
 import secrets
 
@@ -19,7 +22,8 @@ class Session:
         agent: Agent,
         client: Client,
         session_id: str = None,
-        task_queue: str = "agent-task-queue"
+        task_queue: str = "agent-task-queue",
+        payload_codec: PayloadCodec = None
     ):
         """Initialize the session.
 
@@ -28,32 +32,66 @@ class Session:
             agent: The root agent for the workflow
             client: Connected Temporal client
             task_queue: Task queue name for the workflow
+            payload_codec: Payload codec installed on the client, must match the worker's codec
         """
         self.session_id = session_id if session_id else secrets.token_hex(3)
         self.agent = agent
-        self.client = client
+        self.client = with_payload_codec(client, payload_codec) if payload_codec else client
         self.task_queue = task_queue
         self.workflow_id = f'{self.agent.name}-{self.session_id}'
         self.agent_hierarchy = self._agent_hierarchy(agent)
+        self.agent_configs = self._agent_configs(agent)
+        self.started = False
         
         logging.debug('Session initialized with agent_hierarchy: %s', self.agent_hierarchy)
 
     def _agent_hierarchy(self, agent: Agent) -> Dict:
         """Generate a tree representation of the agent and its sub-agents."""
         return {sub_agent.name: self._agent_hierarchy(sub_agent) for sub_agent in agent.sub_agents}
+
+    def _agent_configs(self, agent: Agent) -> Dict[str, AgentConfig]:
+        """Collect the workflow settings of the agent and its sub-agents, keyed by agent name."""
+        configs = {
+            agent.name: AgentConfig(
+                delta_contents=agent.delta_contents,
+                max_history_events=agent.max_history_events,
+                max_history_bytes=agent.max_history_bytes,
+                continue_as_new_keep_turns=agent.continue_as_new_keep_turns,
+                max_concurrent_calls=agent.max_concurrent_calls,
+                context_policy=agent.context_policy,
+                context_turns=agent.context_turns,
+                token_budget=agent.token_budget,
+                window_keep_turns=agent.window_keep_turns,
+                max_queued_prompts=agent.max_queued_prompts,
+                usage_search_attributes=agent.usage_search_attributes,
+                stream=agent.stream,
+                model_tiers=[agent.model_name] + agent.routing.models,
+                routing=agent.routing,
+                local_functions=agent.local_functions,
+                function_options=agent.function_options,
+                llm_activity_options=agent.llm_activity_options,
+            )
+        }
+        for sub_agent in agent.sub_agents:
+            configs.update(self._agent_configs(sub_agent))
+        return configs
         
     async def start(self) -> None:
-        """Start the agent workflow."""
+        """Start the agent workflow, unless already started (e.g. by a SessionPool)."""
+        if self.started:
+            return
         await self.client.start_workflow(
             AgentWorkflow.run,
             AgentWorkflowInput(
                 agent_name=self.agent.name,
                 sub_agents=self.agent_hierarchy,
-                is_root_agent=True
+                is_root_agent=True,
+                agent_configs=self.agent_configs,
             ),
             id=self.workflow_id,
             task_queue=self.task_queue,
         )
+        self.started = True
         
         logging.debug('Started workflow with ID: %s', self.workflow_id)
     
@@ -81,6 +119,118 @@ class Session:
         result = await handle.query(AgentWorkflow.get_model_content, watermark)
         return result
 
+    async def stream_thoughts(self, watermark: int = 0, timeout: float = 60) -> AsyncIterator[str]:
+        """Stream the model responses from the workflow as they are produced.
+
+        Each iteration long-polls the workflow with the wait_for_thoughts update,
+        which only returns once new model content exists or the timeout expires.
+        
+        Args:
+            watermark: Position to start reading thoughts from
+            timeout: Seconds each long poll waits for new thoughts
+            
+        Yields:
+            Thought strings from the workflow
+        """
+        if not self.workflow_id:
+            raise RuntimeError("Session not started")
+
+        handle = self.client.get_workflow_handle(self.workflow_id)
+        while True:
+            thoughts = await handle.execute_update(
+                AgentWorkflow.wait_for_thoughts,
+                args=[watermark, timeout],
+            )
+            if not thoughts:
+                # timed out, or the workflow is continuing as new
+                await asyncio.sleep(1)
+                continue
+            for thought in thoughts:
+                yield thought
+            watermark += len(thoughts)
+
+    async def stream_partial_text(self, timeout: float = 60) -> AsyncIterator[Dict[str, str]]:
+        """Stream the text of the LLM responses in progress, for agents with stream=True.
+
+        Each iteration long-polls the workflow with the wait_for_partial_text update.
+        The text of a response is dropped once the full response is available
+        from stream_thoughts.
+
+        Args:
+            timeout: Seconds each long poll waits for new text
+
+        Yields:
+            Text streamed so far by agent path, e.g. {"root-agent/search-agent": "Found 3 repos"}
+        """
+        if not self.workflow_id:
+            raise RuntimeError("Session not started")
+
+        handle = self.client.get_workflow_handle(self.workflow_id)
+        version = -1
+        while True:
+            snapshot = await handle.execute_update(
+                AgentWorkflow.wait_for_partial_text,
+                args=[version, timeout],
+            )
+            if snapshot.version == version:
+                # timed out, or the workflow is continuing as new
+                await asyncio.sleep(1)
+                continue
+            version = snapshot.version
+            yield snapshot.texts
+
+    async def tagged_thoughts(self, watermark: int = 0) -> List[TaggedModelContent]:
+        """Get the model responses from the workflow, tagged with the agent path that produced them.
+        
+        Args:
+            watermark: Position to start reading thoughts from
+            
+        Returns:
+            List of thoughts with their agent paths, e.g. "root-agent/search-agent"
+        """
+        if not self.workflow_id:
+            raise RuntimeError("Session not started")
+            
+        handle = self.client.get_workflow_handle(self.workflow_id)
+        return await handle.query(AgentWorkflow.get_tagged_model_content, watermark)
+
+    async def usage(self) -> Dict[str, TokenUsage]:
+        """Get the token usage of the session.
+
+        Returns:
+            Token usage by agent name, including the sub-agents that finished
+        """
+        if not self.workflow_id:
+            raise RuntimeError("Session not started")
+
+        handle = self.client.get_workflow_handle(self.workflow_id)
+        return await handle.query(AgentWorkflow.get_usage)
+
+    async def model_choices(self) -> List[ModelChoice]:
+        """Get the models picked for the LLM calls of the agents with model routing.
+
+        Returns:
+            One choice per LLM call, with its turn, agent path, model and the reason of its tier.
+            Only the most recent choices are kept when the session continues as new
+        """
+        if not self.workflow_id:
+            raise RuntimeError("Session not started")
+
+        handle = self.client.get_workflow_handle(self.workflow_id)
+        return await handle.query(AgentWorkflow.get_model_choices)
+
+    async def escalate(self, tier: Optional[int] = None) -> None:
+        """Escalate the root agent's running turn, or its next one when idle, to a routing tier.
+
+        Args:
+            tier: Routing tier, 1 for the first model of the agent's routing, the top tier if None
+        """
+        if not self.workflow_id:
+            raise RuntimeError("Session not started")
+
+        handle = self.client.get_workflow_handle(self.workflow_id)
+        await handle.signal(AgentWorkflow.escalate, tier)
+
     async def prompt(self, prompt: Union[str, Dict[str, Any]]) -> str:
         """Send a prompt to the agent workflow.
 
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Set, Tuple
+
+from temporalio.client import Client
+from temporalio.converter import PayloadCodec
+
+from .agent import Agent
+from .session import Session
+
+class SessionPool:
+    """
+    Pool of pre-warmed root agent sessions.
+    It keeps up to `size` idle workflows started and past their first workflow task,
+    so that the first prompt of a session doesn't wait for the workflow to start.
+    Idle sessions older than `ttl` are stopped and replaced, so warm workflows
+    don't linger in the worker cache.
+    """
+
+    def __init__(
+        self,
+        agent: Agent,
+        client: Client,
+        size: int = 5,
+        ttl: float = 600,
+        task_queue: str = "agent-task-queue",
+        payload_codec: PayloadCodec = None
+    ):
+        """Initialize the pool.
+
+        Args:
+            agent: The root agent of the pooled sessions
+            client: Connected Temporal client
+            size: Maximum number of idle warm sessions
+            ttl: Seconds an idle warm session is kept before being replaced
+            task_queue: Task queue name for the workflows
+            payload_codec: Payload codec installed on the sessions' client
+        """
+        self.agent = agent
+        self.client = client
+        self.size = size
+        self.ttl = ttl
+        self.task_queue = task_queue
+        self.payload_codec = payload_codec
+        self.idle: Deque[Tuple[float, Session]] = deque() # (warmed at, session)
+        self.starting: Set[Session] = set() # Sessions started but not yet pooled or handed out
+        self.refill_task: asyncio.Task = None
+        self._refill_needed = asyncio.Event()
+
+    async def _warm_session(self) -> Session:
+        """Start a session and wait until its workflow is ready for prompts."""
+        session = Session(
+            agent=self.agent,
+            client=self.client,
+            task_queue=self.task_queue,
+            payload_codec=self.payload_codec,
+        )
+        # tracked until pooled or handed out, so close() stops it if warming is cancelled
+        self.starting.add(session)
+        try:
+            await session.start()
+            # queries are answered once the first workflow task completed
+            await session.thoughts()
+        except Exception:
+            self.starting.discard(session)
+            if session.started:
+                await self._stop(session)
+            raise
+        return session
+
+    async def _stop(self, session: Session) -> None:
+        try:
+            await session.stop()
+        except Exception as e:
+            logging.warning('Failed to stop pooled session %s: %s', session.workflow_id, e)
+
+    async def _evict_expired(self) -> None:
+        """Stop idle sessions older than the TTL."""
+        now = time.monotonic()
+        while self.idle and now - self.idle[0][0] > self.ttl:
+            _, session = self.idle.popleft()
+            logging.debug('Evicting expired pooled session %s', session.workflow_id)
+            await self._stop(session)
+
+    async def _fill(self) -> None:
+        """Evict expired sessions and warm new ones up to the pool size."""
+        await self._evict_expired()
+        missing = self.size - len(self.idle)
+        if missing <= 0:
+            return
+        results = await asyncio.gather(
+            *(self._warm_session() for _ in range(missing)),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                logging.warning('Failed to warm pooled session: %s', result)
+                continue
+            self.starting.discard(result)
+            self.idle.append((time.monotonic(), result))
+
+    async def _refill_loop(self) -> None:
+        """Refill the pool whenever a session is acquired, and evict expired sessions periodically."""
+        while True:
+            self._refill_needed.clear()
+            await self._fill()
+            try:
+                await asyncio.wait_for(self._refill_needed.wait(), timeout=self.ttl / 2)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self) -> None:
+        """Warm the pool and start refilling it in the background."""
+        await self._fill()
+        self.refill_task = asyncio.create_task(self._refill_loop())
+
+    async def acquire(self) -> Session:
+        """Hand out a warm session, or start a new one if the pool is empty.
+
+        Returns:
+            A started session, owned by the caller who is responsible for stopping it
+        """
+        await self._evict_expired()
+        if self.idle:
+            _, session = self.idle.popleft()
+        else:
+            session = await self._warm_session()
+            self.starting.discard(session)
+        self._refill_needed.set()
+        return session
+
+    async def close(self) -> None:
+        """Stop refilling the pool and stop all idle sessions, including those still warming up."""
+        if self.refill_task:
+            self.refill_task.cancel()
+            try:
+                await self.refill_task
+            except asyncio.CancelledError:
+                pass
+        while self.idle:
+            _, session = self.idle.popleft()
+            await self._stop(session)
+        while self.starting:
+            await self._stop(self.starting.pop())
+
+    async def __aenter__(self):
+        """Async context manager enter - warms the pool."""
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Async context manager exit - stops the idle sessions."""
+        await self.close()
@@ -0,0 +1,325 @@
+import json
+import logging
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, Type
+
+from temporalio import activity, client, workflow
+from temporalio.api.common.v1 import Payload
+from temporalio.worker import (
+    ActivityInboundInterceptor,
+    ExecuteActivityInput,
+    ExecuteWorkflowInput,
+    Interceptor,
+    StartActivityInput,
+    StartChildWorkflowInput,
+    StartLocalActivityInput,
+    WorkflowInboundInterceptor,
+    WorkflowInterceptorClassInput,
+    WorkflowOutboundInterceptor,
+)
+
+from .metrics import LLM_ACTIVITIES
+
+# Header carrying the root session's turn to activities and sub-agents
+TURN_HEADER = "temporal-agent-turn"
+
+@dataclass
+class Span:
+    """Timing of one phase of an agent turn.
+
+    Attributes:
+        phase: "serialization", "llm", "tool", "child_workflow" or "prompt" as seen by the
+            workflow or client, "activity_execution" as seen by the activity worker
+        name: Activity type, sub-agent name or update name
+        duration_ms: Duration of the phase
+        workflow_id: Workflow in which the phase ran
+        run_id: Run of the workflow
+        turn: Turn of the root session the phase belongs to, if known
+        start_time: Start of the phase in seconds since the epoch, workflow time for workflow phases
+        attributes: Phase specific details, e.g. attempt or error
+    """
+    phase: str
+    name: str
+    duration_ms: float
+    workflow_id: str
+    run_id: Optional[str] = None
+    turn: Optional[int] = None
+    start_time: float = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+class SpanSink(ABC):
+    """Destination of the recorded spans."""
+
+    @abstractmethod
+    def emit(self, span: Span) -> None:
+        """Record a span. Called from workflow and activity threads, so it must be quick and thread-safe."""
+
+class InMemorySpanSink(SpanSink):
+    """Sink keeping spans in memory, e.g. for tests and notebooks."""
+
+    def __init__(self) -> None:
+        self.spans: List[Span] = []
+        self.lock = threading.Lock()
+
+    def emit(self, span: Span) -> None:
+        with self.lock:
+            self.spans.append(span)
+
+    def turn_breakdown(self, turn: int) -> Dict[str, float]:
+        """Total milliseconds spent per phase during a turn."""
+        breakdown: Dict[str, float] = {}
+        with self.lock:
+            for span in self.spans:
+                if span.turn == turn:
+                    breakdown[span.phase] = breakdown.get(span.phase, 0) + span.duration_ms
+        return breakdown
+
+    def clear(self) -> None:
+        with self.lock:
+            self.spans.clear()
+
+class FileSpanSink(SpanSink):
+    """
+    Sink appending spans to a file as JSON lines.
+    Spans are written by a background thread, so that emitting them from a workflow
+    never blocks the workflow thread on file IO.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.file = open(path, "a")
+        self.queue: "queue.Queue[Optional[Span]]" = queue.Queue()
+        self.writer = threading.Thread(target=self._write, name="FileSpanSink", daemon=True)
+        self.writer.start()
+
+    def emit(self, span: Span) -> None:
+        self.queue.put(span)
+
+    def flush(self) -> None:
+        """Wait until the spans emitted so far are written."""
+        self.queue.join()
+
+    def close(self) -> None:
+        """Write the spans emitted so far and close the file."""
+        self.queue.put(None)
+        self.writer.join()
+        self.file.close()
+
+    def _write(self) -> None:
+        while True:
+            span = self.queue.get()
+            try:
+                if span is None:
+                    return
+                self.file.write(json.dumps(asdict(span), default=str) + "\n")
+                if self.queue.empty():
+                    self.file.flush()
+            except Exception:
+                logging.exception('Failed to write span to %s', self.path)
+            finally:
+                self.queue.task_done()
+
+def _activity_phase(activity_type: str) -> str:
+    return "llm" if activity_type in LLM_ACTIVITIES else "tool"
+
+def _error_name(task) -> Optional[str]:
+    if task.cancelled():
+        return "CancelledError"
+    error = task.exception()
+    return type(error.cause or error).__name__ if error else None
+
+class TimingInterceptor(client.Interceptor, Interceptor):
+    """
+    Client and worker interceptor recording the timing of each phase of an agent turn.
+    Workflows record serialization and the waits on LLM activities, tool activities
+    and sub-agents; activity workers record execution time; clients record prompts.
+    Spans are tagged with the root session's turn, propagated through headers.
+    Passing it to Client.connect enables it for workers using the client as well.
+    """
+
+    def __init__(self, sink: SpanSink) -> None:
+        """Initialize the interceptor.
+
+        Args:
+            sink: Destination of the recorded spans
+        """
+        self.sink = sink
+
+    def intercept_client(self, next: client.OutboundInterceptor) -> client.OutboundInterceptor:
+        return _TimingClientOutbound(next, self.sink)
+
+    def intercept_activity(self, next: ActivityInboundInterceptor) -> ActivityInboundInterceptor:
+        return _TimingActivityInbound(next, self.sink)
+
+    def workflow_interceptor_class(
+        self, input: WorkflowInterceptorClassInput
+    ) -> Optional[Type[WorkflowInboundInterceptor]]:
+        sink = self.sink
+
+        class _BoundTimingWorkflowInbound(_TimingWorkflowInbound):
+            def __init__(self, next: WorkflowInboundInterceptor) -> None:
+                super().__init__(next, sink)
+
+        return _BoundTimingWorkflowInbound
+
+class _TimingClientOutbound(client.OutboundInterceptor):
+    def __init__(self, next: client.OutboundInterceptor, sink: SpanSink) -> None:
+        super().__init__(next)
+        self.sink = sink
+
+    async def start_workflow_update(self, input: client.StartWorkflowUpdateInput) -> client.WorkflowUpdateHandle[Any]:
+        if input.update != "prompt":
+            return await super().start_workflow_update(input)
+        start_time = time.time()
+        start = time.perf_counter()
+        error = None
+        try:
+            return await super().start_workflow_update(input)
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self.sink.emit(Span(
+                phase="prompt",
+                name=input.update,
+                duration_ms=(time.perf_counter() - start) * 1000,
+                workflow_id=input.id,
+                run_id=input.run_id,
+                start_time=start_time,
+                attributes={"error": error} if error else {},
+            ))
+
+class _TimingActivityInbound(ActivityInboundInterceptor):
+    def __init__(self, next: ActivityInboundInterceptor, sink: SpanSink) -> None:
+        super().__init__(next)
+        self.sink = sink
+
+    async def execute_activity(self, input: ExecuteActivityInput) -> Any:
+        info = activity.info()
+        turn = None
+        if TURN_HEADER in input.headers:
+            turn = activity.payload_converter().from_payload(input.headers[TURN_HEADER], int)
+        attributes: Dict[str, Any] = {"attempt": info.attempt, "kind": _activity_phase(info.activity_type)}
+        if info.current_attempt_scheduled_time and info.started_time:
+            attributes["schedule_to_start_ms"] = (
+                info.started_time - info.current_attempt_scheduled_time
+            ).total_seconds() * 1000
+        start_time = time.time()
+        start = time.perf_counter()
+        try:
+            return await super().execute_activity(input)
+        except BaseException as e:
+            attributes["error"] = type(e).__name__
+            raise
+        finally:
+            self.sink.emit(Span(
+                phase="activity_execution",
+                name=info.activity_type,
+                duration_ms=(time.perf_counter() - start) * 1000,
+                workflow_id=info.workflow_id,
+                run_id=info.workflow_run_id,
+                turn=turn,
+                start_time=start_time,
+                attributes=attributes,
+            ))
+
+class _TimingWorkflowInbound(WorkflowInboundInterceptor):
+    def __init__(self, next: WorkflowInboundInterceptor, sink: SpanSink) -> None:
+        super().__init__(next)
+        self.sink = sink
+        self.inherited_turn: Optional[int] = None # Turn of the root session, for sub-agents
+
+    def init(self, outbound: WorkflowOutboundInterceptor) -> None:
+        super().init(_TimingWorkflowOutbound(outbound, self))
+
+    async def execute_workflow(self, input: ExecuteWorkflowInput) -> Any:
+        if TURN_HEADER in input.headers:
+            self.inherited_turn = workflow.payload_converter().from_payload(input.headers[TURN_HEADER], int)
+        return await super().execute_workflow(input)
+
+    def turn(self) -> Optional[int]:
+        if self.inherited_turn is not None:
+            return self.inherited_turn
+        return getattr(workflow.instance(), "turn", None)
+
+    def emit(self, phase: str, name: str, duration_ms: float, start_time: float, **attributes) -> None:
+        # spans are recorded once, when the phase actually runs
+        if workflow.unsafe.is_replaying():
+            return
+        info = workflow.info()
+        span = Span(
+            phase=phase,
+            name=name,
+            duration_ms=duration_ms,
+            workflow_id=info.workflow_id,
+            run_id=info.run_id,
+            turn=self.turn(),
+            start_time=start_time,
+            attributes={k: v for k, v in attributes.items() if v is not None},
+        )
+        with workflow.unsafe.sandbox_unrestricted():
+            self.sink.emit(span)
+
+class _TimingWorkflowOutbound(WorkflowOutboundInterceptor):
+    def __init__(self, next: WorkflowOutboundInterceptor, inbound: _TimingWorkflowInbound) -> None:
+        super().__init__(next)
+        self.inbound = inbound
+
+    def _with_turn(self, headers: Mapping[str, Payload]) -> Mapping[str, Payload]:
+        turn = self.inbound.turn()
+        if turn is None:
+            return headers
+        return {**headers, TURN_HEADER: workflow.payload_converter().to_payload(turn)}
+
+    def _time_activity(self, name: str, start: Any) -> workflow.ActivityHandle:
+        """Start an activity, recording its serialization and, once done, its wait."""
+        start_time = workflow.time()
+        with workflow.unsafe.sandbox_unrestricted():
+            started = time.perf_counter()
+            handle = start()
+            serialization_ms = (time.perf_counter() - started) * 1000
+        self.inbound.emit("serialization", name, serialization_ms, start_time)
+
+        def done(task) -> None:
+            self.inbound.emit(
+                _activity_phase(name),
+                name,
+                (workflow.time() - start_time) * 1000,
+                start_time,
+                error=_error_name(task),
+            )
+        handle.add_done_callback(done)
+        return handle
+
+    def start_activity(self, input: StartActivityInput) -> workflow.ActivityHandle:
+        input.headers = self._with_turn(input.headers)
+        return self._time_activity(input.activity, lambda: super(_TimingWorkflowOutbound, self).start_activity(input))
+
+    def start_local_activity(self, input: StartLocalActivityInput) -> workflow.ActivityHandle:
+        input.headers = self._with_turn(input.headers)
+        return self._time_activity(
+            input.activity,
+            lambda: super(_TimingWorkflowOutbound, self).start_local_activity(input),
+        )
+
+    async def start_child_workflow(self, input: StartChildWorkflowInput) -> workflow.ChildWorkflowHandle:
+        input.headers = self._with_turn(input.headers)
+        agent_name = getattr(input.args[0], "agent_name", input.workflow) if input.args else input.workflow
+        start_time = workflow.time()
+        handle = await super().start_child_workflow(input)
+
+        def done(task) -> None:
+            self.inbound.emit(
+                "child_workflow",
+                agent_name,
+                (workflow.time() - start_time) * 1000,
+                start_time,
+                child_workflow_id=input.id,
+                error=_error_name(task),
+            )
+        handle.add_done_callback(done)
+        return handle
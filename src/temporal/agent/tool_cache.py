@@ -0,0 +1,170 @@
+import dataclasses
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+from temporalio import activity
+
+from .metrics import record_tool_cache_lookup
+
+def _canonical(value: Any) -> Any:
+    """Convert an argument to plain JSON values, so equal arguments give equal keys."""
+    if hasattr(value, "model_dump"): # pydantic model
+        return _canonical(value.model_dump(mode="json"))
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return _canonical(dataclasses.asdict(value))
+    if isinstance(value, dict):
+        return {str(k): _canonical(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    return value
+
+def cache_key(function_name: str, args: Tuple, kwargs: Dict[str, Any]) -> str:
+    """Build the cache key of a function call.
+
+    The key is the hash of the arguments' canonical JSON: models and dataclasses
+    become dicts and dict keys are sorted, but values are kept exactly, so only
+    calls the function can't tell apart share a result.
+    """
+    canonical = json.dumps(
+        [function_name, _canonical(list(args)), _canonical(kwargs)],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+class ToolResultCache:
+    """
+    Worker-side cache of tool function results, shared by all sessions of the worker.
+    Entries expire after the TTL of their function, and the least recently used
+    entries are evicted beyond max_entries or max_bytes.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024):
+        """Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of cached results
+            max_bytes: Approximate maximum memory of the cached results
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict[str, Tuple[float, Any, int]] = OrderedDict() # key -> (expires at, result, size)
+        self.size = 0
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self.evictions = 0
+        self.lock = threading.Lock() # activities run in the worker's thread pool
+
+    def get(self, function_name: str, key: str) -> Tuple[bool, Any]:
+        """Look up a result, counting a hit or a miss for the function.
+
+        Returns:
+            Whether the result was found, and the result
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses[function_name] = self.misses.get(function_name, 0) + 1
+                return False, None
+            self.entries.move_to_end(key)
+            self.hits[function_name] = self.hits.get(function_name, 0) + 1
+            return True, entry[1]
+
+    def put(self, key: str, result: Any, ttl: float) -> None:
+        """Store a result for ttl seconds, evicting the least recently used results if needed."""
+        size = _result_size(result)
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (time.monotonic() + ttl, result, size)
+            self.size += size
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        _, _, size = self.entries.pop(key)
+        self.size -= size
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit and miss counts per function, along with the cache occupancy."""
+        with self.lock:
+            return {
+                "hits": dict(self.hits),
+                "misses": dict(self.misses),
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": self.size,
+            }
+
+def _result_size(result: Any) -> int:
+    if isinstance(result, (str, bytes)):
+        return len(result)
+    try:
+        return len(json.dumps(result, default=str))
+    except (TypeError, ValueError):
+        return sys.getsizeof(result)
+
+def cached_activity(fn: callable, cache: ToolResultCache, ttl: float) -> callable:
+    """Wrap a tool function in an activity serving its results from the cache.
+
+    The activity keeps the function's name and signature, so workflows call it
+    as before. Failed calls are not cached.
+
+    Args:
+        fn: Tool function
+        cache: Cache shared by the worker's activities
+        ttl: Seconds a result is served from the cache
+    """
+    name = fn.__name__
+
+    def lookup(key: str) -> Tuple[bool, Any]:
+        found, result = cache.get(name, key)
+        if activity.in_activity():
+            record_tool_cache_lookup(activity.metric_meter(), name, found)
+        if found:
+            logging.debug('Tool cache hit for %s', name)
+        return found, result
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            key = cache_key(name, args, kwargs)
+            found, result = lookup(key)
+            if found:
+                return result
+            result = await fn(*args, **kwargs)
+            cache.put(key, result, ttl)
+            return result
+    else:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = cache_key(name, args, kwargs)
+            found, result = lookup(key)
+            if found:
+                return result
+            result = fn(*args, **kwargs)
+            cache.put(key, result, ttl)
+            return result
+
+    # functools.wraps copies the activity definition of an already decorated function
+    wrapper.__dict__.pop("__temporal_activity_definition", None)
+    return activity.defn(name=name)(wrapper)
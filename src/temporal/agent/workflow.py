@@ -1,12 +1,18 @@
 import asyncio
 import json
-import secrets
+from collections import deque
 from datetime import timedelta
-from typing import List, Dict
+from typing import Deque, List, Dict, Optional, Tuple
 from dataclasses import dataclass, field
+from enum import StrEnum
 from temporalio import workflow
+from temporalio.common import SearchAttributeKey
+from temporalio.exceptions import ActivityError, ApplicationError
 
-from temporal.agent.llm_manager import LLMCallInput
+from temporal.agent.agent import ActivityOptions, ContextPolicy, ModelRouting
+from temporal.agent.contents import is_user_prompt
+from temporal.agent.llm_manager import LLMCallInput, PartialText, SummarizeInput, SummarizeOutput, CONVERSATION_CACHE_MISS, chain_contents_hash
+from temporal.agent.metrics import CHILD_WORKFLOW_DEPTH
 
 with workflow.unsafe.imports_passed_through():
     from asyncio import Future
@@ -18,7 +24,97 @@ with workflow.unsafe.imports_passed_through():
         FunctionCall,
         FinishReason
     )
+
+# Error type of prompts rejected because the session's prompt queue is full
+PROMPT_QUEUE_FULL = "PromptQueueFull"
+# Error type of prompts rejected because the session is ending
+SESSION_ENDING = "SessionEnding"
+
+# Most recent model choices carried over continue-as-new, so the input stays bounded
+MAX_CARRIED_MODEL_CHOICES = 100
+
+# Search attributes of the session's token usage, to be registered on the namespace
+PROMPT_TOKENS_ATTRIBUTE = SearchAttributeKey.for_int("AgentPromptTokens")
+CANDIDATE_TOKENS_ATTRIBUTE = SearchAttributeKey.for_int("AgentCandidateTokens")
+CACHED_TOKENS_ATTRIBUTE = SearchAttributeKey.for_int("AgentCachedTokens")
+TOTAL_TOKENS_ATTRIBUTE = SearchAttributeKey.for_int("AgentTotalTokens")
     
+@dataclass
+class AgentConfig:
+    """Per-agent settings used by the agent workflow."""
+    delta_contents: bool = False
+    max_history_events: int = 10000
+    max_history_bytes: int = 20 * 1024 * 1024
+    continue_as_new_keep_turns: int = 20
+    max_concurrent_calls: int = 10
+    context_policy: ContextPolicy = ContextPolicy.FULL
+    context_turns: int = 3
+    token_budget: Optional[int] = None
+    window_keep_turns: int = 2
+    max_queued_prompts: int = 10
+    usage_search_attributes: bool = False
+    stream: bool = False
+    model_tiers: List[str] = field(default_factory=list) # The agent's model_name, then its routing models
+    routing: ModelRouting = field(default_factory=ModelRouting)
+    local_functions: List[str] = field(default_factory=list)
+    function_options: Dict[str, ActivityOptions] = field(default_factory=dict)
+    llm_activity_options: ActivityOptions = field(default_factory=ActivityOptions)
+
+class RoutingReason(StrEnum):
+    """Why a model tier was picked for an LLM call."""
+    DEFAULT = "default"
+    MALFORMED_CALL = "malformed_call"
+    LONG_CONTEXT = "long_context"
+    KEYWORD = "keyword"
+    REQUESTED = "requested"
+
+@dataclass
+class ModelChoice:
+    """Model picked for an LLM call of an agent with model routing."""
+    turn: int
+    agent_path: str
+    model: str
+    reason: RoutingReason
+
+@dataclass
+class PartialTextSnapshot:
+    """Text streamed so far by the LLM calls in progress, by agent path."""
+    version: int
+    texts: Dict[str, str]
+
+@dataclass
+class TokenUsage:
+    """Token counts of the LLM calls of an agent."""
+    llm_calls: int = 0
+    prompt_tokens: int = 0
+    candidate_tokens: int = 0
+    cached_tokens: int = 0
+    total_tokens: int = 0
+
+    def add(self, other: "TokenUsage") -> None:
+        self.llm_calls += other.llm_calls
+        self.prompt_tokens += other.prompt_tokens
+        self.candidate_tokens += other.candidate_tokens
+        self.cached_tokens += other.cached_tokens
+        self.total_tokens += other.total_tokens
+
+    @property
+    def cached_ratio(self) -> float:
+        """Share of the prompt tokens served from a context cache."""
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+def merge_usage(into: Dict[str, TokenUsage], usage: Dict[str, TokenUsage]) -> None:
+    """Add token usage keyed by agent name to another."""
+    for agent_name, agent_usage in usage.items():
+        into.setdefault(agent_name, TokenUsage()).add(agent_usage)
+
+def total_usage(usage: Dict[str, TokenUsage]) -> TokenUsage:
+    """Sum the token usage of all agents."""
+    total = TokenUsage()
+    for agent_usage in usage.values():
+        total.add(agent_usage)
+    return total
+
 @dataclass
 class AgentWorkflowInput:
     """Input for the agent workflow."""
@@ -27,6 +123,92 @@ class AgentWorkflowInput:
     prompt: str = ""
     contents: List[Dict] = field(default_factory=list)
     is_root_agent: bool = False
+    agent_configs: Dict[str, AgentConfig] = field(default_factory=dict)
+    model_contents: List[str] = field(default_factory=list)
+    model_content_paths: List[str] = field(default_factory=list)
+    model_contents_offset: int = 0
+    root_workflow_id: Optional[str] = None
+    agent_path: Optional[str] = None
+    turn: int = 0
+    usage: Dict[str, TokenUsage] = field(default_factory=dict)
+    model_choices: List[ModelChoice] = field(default_factory=list)
+    requested_tier: int = 0
+
+@dataclass
+class ModelContentBatch:
+    """Model contents of one LLM turn, propagated from a sub-agent to the root workflow."""
+    agent_path: str
+    messages: List[str]
+
+@dataclass
+class TaggedModelContent:
+    """Model content along with the path of the agent that produced it."""
+    agent_path: str
+    text: str
+
+def compact_contents(contents: List[Dict], keep_turns: int) -> List[Dict]:
+    """Keep the contents of the last user turns only.
+
+    A turn starts at a user prompt, so function calls are never separated
+    from their responses.
+
+    Args:
+        contents: Serialized conversation contents
+        keep_turns: Number of most recent user turns to keep
+
+    Returns:
+        The contents starting at the oldest kept user turn
+    """
+    turn_starts = [i for i, c in enumerate(contents) if is_user_prompt(c)]
+    if keep_turns <= 0 or not turn_starts:
+        return []
+    if len(turn_starts) <= keep_turns:
+        return contents[turn_starts[0]:]
+    return contents[turn_starts[-keep_turns]:]
+
+SUMMARY_PREFIX = "Summary of the conversation so far:\n"
+
+def summary_content(summary: str) -> Content:
+    """Build the user content standing in for summarized turns."""
+    return Content(
+        role="user",
+        parts=[Part.from_text(f"{SUMMARY_PREFIX}{summary}")],
+    )
+
+def is_summary(content: Dict) -> bool:
+    """Check whether a serialized content stands in for summarized contents."""
+    parts = content.get("parts", [])
+    return content.get("role") == "user" and bool(parts) and parts[0].get("text", "").startswith(SUMMARY_PREFIX)
+
+def summary_range(contents: List[Dict], keep_turns: int) -> Optional[Tuple[int, int]]:
+    """Range of contents to summarize when a conversation exceeds its token budget.
+
+    These are the turns before the last keep_turns user turns. A conversation
+    with fewer turns, e.g. a sub-agent's single prompt followed by a long tool
+    loop, has the function call exchanges of its last turn summarized instead,
+    keeping its prompt and last keep_turns exchanges. Function calls are never
+    separated from their responses.
+
+    Returns:
+        The start and end of the range, or None when there is nothing worth summarizing
+    """
+    # an earlier summary is summarized again rather than counted as a turn
+    turn_starts = [i for i, c in enumerate(contents) if is_user_prompt(c) and not is_summary(c)]
+    if keep_turns <= 0 or not turn_starts:
+        cut = len(contents)
+    else:
+        cut = turn_starts[-keep_turns] if len(turn_starts) > keep_turns else turn_starts[0]
+    if cut >= 2:
+        return 0, cut
+    if not turn_starts:
+        return None
+
+    start = turn_starts[-1] + 1
+    exchange_starts = [i for i in range(start, len(contents)) if contents[i].get("role") == "model"]
+    if len(exchange_starts) <= max(keep_turns, 1):
+        return None
+    end = exchange_starts[-max(keep_turns, 1)]
+    return (start, end) if end - start >= 2 else None
 
 @workflow.defn
 class AgentWorkflow:
@@ -40,11 +222,33 @@ class AgentWorkflow:
         self.agent_name: str
         self.is_root_agent: bool = False
         self.sub_agents: Dict[any] = None
+        self.agent_configs: Dict[str, AgentConfig] = {}
+        self.config: AgentConfig = AgentConfig()
         self.contents: List[Content] = []
+        self.dict_contents: List[Dict] = [] # Serialized form of each content, appended once
         self.contents_starts_at: int = 0
-        self.pending_respond: Future = None
+        self.pending_respond: Future = None # Response of the prompt being handled
+        self.prompt_queue: Deque[Tuple[str, Future]] = deque() # Prompts waiting for the current turn
+        self.turn: int = 0 # Number of prompts handled by the session, across runs
         self.terminate: bool = False
+        self.continuing_as_new: bool = False # Releases thought waiters before continuing as new
         self.model_contents: Dict[str, List[str]] = {} # Stores agent and sub-agent's model contents
+        self.model_content_paths: List[str] = [] # Agent path of each of the agent's model contents
+        self.model_contents_offset: int = 0 # Number of model contents dropped by previous runs
+        self.root_workflow_id: str = None
+        self.agent_path: str = None
+        self.turn_model_contents_at: int = 0 # Position of the current turn's first model content
+        self.llm_synced_count: int = 0 # Number of contents cached by the LLM activity's worker
+        self.llm_synced_hash: str = ""
+        self.summary_cache: Tuple[str, asyncio.Task] = None # Hash of the summarized contents and the task summarizing them
+        self.last_token_count: int = 0 # Tokens of the last LLM call's prompt and response
+        self.usage: Dict[str, TokenUsage] = {} # Token usage of the agent and its sub-agents, by agent name
+        self.partial_texts: Dict[str, str] = {} # Text streamed by LLM calls in progress, by agent path
+        self.partial_version: int = 0
+        self.turn_tier: int = 0 # Routing tier the current turn is escalated to
+        self.turn_tier_reason: RoutingReason = RoutingReason.DEFAULT
+        self.requested_tier: int = 0 # Routing tier requested by the session for its next turn
+        self.model_choices: List[ModelChoice] = [] # Models picked for the agent's and sub-agents' calls
 
     @workflow.run
     async def run(self, agent_input: AgentWorkflowInput) -> List[Dict]:
@@ -58,11 +262,21 @@ class AgentWorkflow:
         """
         
         self.agent_name = agent_input.agent_name
-        self.contents = [Content.from_dict(c) for c in agent_input.contents]
+        self._set_contents([Content.from_dict(c) for c in agent_input.contents], agent_input.contents)
         self.contents_starts_at = len(self.contents)
-        self.model_contents[self.agent_name] = []
+        self.model_contents[self.agent_name] = list(agent_input.model_contents)
+        self.model_content_paths = list(agent_input.model_content_paths)
+        self.model_contents_offset = agent_input.model_contents_offset
+        self.turn = agent_input.turn
+        self.usage = dict(agent_input.usage)
+        self.model_choices = list(agent_input.model_choices)
+        self.requested_tier = agent_input.requested_tier
+        self.root_workflow_id = agent_input.root_workflow_id or workflow.info().workflow_id
+        self.agent_path = agent_input.agent_path or self.agent_name
         self.sub_agents = agent_input.sub_agents
         self.is_root_agent = agent_input.is_root_agent
+        self.agent_configs = agent_input.agent_configs
+        self.config = self.agent_configs.get(self.agent_name, AgentConfig())
         
         # handle prompt
         prompt = agent_input.prompt
@@ -73,90 +287,307 @@ class AgentWorkflow:
                 role="user",
                 parts=[Part.from_text(prompt)],
             )
-            self.contents.append(user_prompt_content)
+            self._append_content(user_prompt_content)
+            self._start_routing(prompt)
 
         # main loop to handle LLM responses
-        while not self.terminate:
-            candidate = await self._call_llm()
-            if candidate.finish_reason == FinishReason.MALFORMED_FUNCTION_CALL:
-                # handle malformed function call with a user prompt
-                user_prompt_content = Content(
-                    role="user",
-                    parts=[Part.from_text(candidate.finish_message)],
-                )
-                self.contents.append(user_prompt_content)
-                continue
+        try:
+            while not self.terminate:
+                await self._enforce_token_budget()
+                candidate = await self._call_llm()
+                if candidate.finish_reason == FinishReason.MALFORMED_FUNCTION_CALL:
+                    if self.config.routing.escalate_on_malformed_call:
+                        self._escalate(self.turn_tier + 1, RoutingReason.MALFORMED_CALL)
+                    # handle malformed function call with a user prompt
+                    user_prompt_content = Content(
+                        role="user",
+                        parts=[Part.from_text(candidate.finish_message)],
+                    )
+                    self._append_content(user_prompt_content)
+                    continue
                 
-            await self._store_content(candidate.content)
-            if candidate.function_calls:
-                await self._handle_function_calls(candidate)
-            elif candidate.finish_reason == FinishReason.STOP:
-                if self.is_root_agent:
-                    # root agent respond the final response then wait for the next prompt
-                    if self.pending_respond:
-                        self.pending_respond.set_result(candidate.content.text)
+                await self._store_content(candidate.content)
+                if candidate.function_calls:
+                    await self._handle_function_calls(candidate)
+                elif candidate.finish_reason == FinishReason.STOP:
+                    if self.is_root_agent:
+                        # root agent respond the final response then wait for the next prompt
+                        if self.pending_respond:
+                            self.pending_respond.set_result(candidate.content.text)
+                        self._upsert_usage_search_attributes()
                         await self._wait_for_prompt()
-                else:
-                    # sub-agent respond the new contents collected in the sub-agent
-                    return [c.to_dict() for c in self.contents[self.contents_starts_at:]]
+                    else:
+                        # sub-agent report its usage, then respond the new contents collected in the sub-agent
+                        await self._report_usage()
+                        return self.dict_contents[self.contents_starts_at:]
+        except (Exception, asyncio.CancelledError):
+            if not self.is_root_agent:
+                # a failed sub-agent still reports the tokens it used
+                await self._report_usage()
+            raise
 
         if self.pending_respond:
             self.pending_respond.set_result("")
+        # prompts queued behind the last turn get no response
+        while self.prompt_queue:
+            _, respond = self.prompt_queue.popleft()
+            respond.set_result("")
             
+    def _append_content(self, content: Content) -> None:
+        """Append a content to the conversation, serializing it once."""
+        self.contents.append(content)
+        self.dict_contents.append(content.to_dict())
+
+    def _set_contents(self, contents: List[Content], dict_contents: List[Dict] = None) -> None:
+        """Replace the conversation, reusing the serialized contents when given."""
+        self.contents = list(contents)
+        if dict_contents is None:
+            dict_contents = [c.to_dict() for c in contents]
+        self.dict_contents = list(dict_contents)
+
     async def _store_content(self, content: Content) -> None:
         """Store and propagate the content from the LLM."""
-        self.contents.append(content)
+        self._append_content(content)
         # store model contents separately for querying
         if content.role == "model":
+            messages: List[str] = []
             for part in content.parts:
                 try:
                     if part.text:
-                        self.model_contents[self.agent_name].append(part.text)
-                        # propagate model content to the parent workflow
-                        await self._propagate_model_content(part.text)
+                        messages.append(part.text)
                 except AttributeError:
                     pass # noop if part is not a text part
+            if messages:
+                self._append_model_contents(self.agent_path, messages)
+                # propagate model contents of the turn to the root workflow
+                await self._propagate_model_contents(messages)
+
+    def _append_model_contents(self, agent_path: str, messages: List[str]) -> None:
+        self.model_contents[self.agent_name].extend(messages)
+        self.model_content_paths.extend([agent_path] * len(messages))
+        # the streamed text is now part of the model contents
+        if self.partial_texts.pop(agent_path, None) is not None:
+            self.partial_version += 1
     
-    async def _propagate_model_content(self, message) -> None:
-        """ Propagate model contents to the parent workflow."""
+    async def _propagate_model_contents(self, messages: List[str]) -> None:
+        """Propagate model contents to the root workflow in a single signal."""
         if self.is_root_agent:
             return
-        parent_info = workflow.info().parent
-        if parent_info:
-            handle = workflow.get_external_workflow_handle(parent_info.workflow_id)
-            await handle.signal(AgentWorkflow.add_model_content, message)
+        handle = workflow.get_external_workflow_handle(self.root_workflow_id)
+        await handle.signal(
+            AgentWorkflow.add_model_contents,
+            ModelContentBatch(agent_path=self.agent_path, messages=messages),
+        )
     
     async def _call_llm(self) -> Candidate:
-        dict_content = [c.to_dict() for c in self.contents]
-        llm_input = LLMCallInput(
-            agent_name=self.agent_name,
-            contents=dict_content,
+        dict_content = list(self.dict_contents)
+        model_tier = self._route()
+        if self.config.delta_contents:
+            raw_rsp = await self._call_llm_with_delta(dict_content, model_tier)
+        else:
+            raw_rsp = await self._execute_call_llm(
+                LLMCallInput(
+                    agent_name=self.agent_name,
+                    contents=dict_content,
+                    model_tier=model_tier,
+                )
+            )
+        response = GenerationResponse.from_dict(raw_rsp)
+        self.last_token_count = response.usage_metadata.total_token_count
+        self._record_usage(raw_rsp.get("usage_metadata", {}))
+        return response.candidates[0]
+
+    def _start_routing(self, prompt: str) -> None:
+        """Reset the routing tier for a new turn, escalating it on request or on the prompt's keywords."""
+        self.turn_tier = 0
+        self.turn_tier_reason = RoutingReason.DEFAULT
+        if self.requested_tier:
+            self._escalate(self.requested_tier, RoutingReason.REQUESTED)
+            self.requested_tier = 0
+        keywords = self.config.routing.escalation_keywords
+        if any(keyword.lower() in prompt.lower() for keyword in keywords):
+            self._escalate(len(self.config.model_tiers) - 1, RoutingReason.KEYWORD)
+
+    def _escalate(self, tier: int, reason: RoutingReason) -> None:
+        """Escalate the rest of the turn to a routing tier, capped at the top tier."""
+        tier = min(tier, len(self.config.model_tiers) - 1)
+        if tier > self.turn_tier:
+            self.turn_tier = tier
+            self.turn_tier_reason = reason
+
+    def _route(self) -> int:
+        """Pick the routing tier of the next LLM call, recording the chosen model."""
+        tiers = self.config.model_tiers
+        if len(tiers) < 2:
+            return 0
+        tier, reason = self.turn_tier, self.turn_tier_reason
+        long_context_tokens = self.config.routing.long_context_tokens
+        if long_context_tokens and self.last_token_count >= long_context_tokens and tier < len(tiers) - 1:
+            tier, reason = len(tiers) - 1, RoutingReason.LONG_CONTEXT
+        self.model_choices.append(ModelChoice(
+            turn=self.turn,
+            agent_path=self.agent_path,
+            model=tiers[tier],
+            reason=reason,
+        ))
+        return tier
+
+    def _record_usage(self, usage_metadata: Dict) -> None:
+        """Add the usage metadata of an LLM response, as a dict, to the agent's token usage."""
+        self.usage.setdefault(self.agent_name, TokenUsage()).add(TokenUsage(
+            llm_calls=1,
+            prompt_tokens=usage_metadata.get("prompt_token_count", 0),
+            candidate_tokens=usage_metadata.get("candidates_token_count", 0),
+            cached_tokens=usage_metadata.get("cached_content_token_count", 0),
+            total_tokens=usage_metadata.get("total_token_count", 0),
+        ))
+
+    async def _report_usage(self) -> None:
+        """Roll up the token usage and model choices of a sub-agent and its own sub-agents into its parent."""
+        parent = workflow.info().parent
+        if parent is None:
+            return
+        handle = workflow.get_external_workflow_handle(parent.workflow_id, run_id=parent.run_id)
+        if self.usage:
+            await handle.signal(AgentWorkflow.add_usage, self.usage)
+        if self.model_choices:
+            await handle.signal(AgentWorkflow.add_model_choices, self.model_choices)
+
+    def _upsert_usage_search_attributes(self) -> None:
+        """Expose the session's total token usage as search attributes, when enabled."""
+        if not self.config.usage_search_attributes:
+            return
+        total = total_usage(self.usage)
+        workflow.upsert_search_attributes([
+            PROMPT_TOKENS_ATTRIBUTE.value_set(total.prompt_tokens),
+            CANDIDATE_TOKENS_ATTRIBUTE.value_set(total.candidate_tokens),
+            CACHED_TOKENS_ATTRIBUTE.value_set(total.cached_tokens),
+            TOTAL_TOKENS_ATTRIBUTE.value_set(total.total_tokens),
+        ])
+
+    async def _call_llm_with_delta(self, dict_content: List[Dict], model_tier: int = 0) -> Dict:
+        """Call the LLM with the new contents only, falling back to the full contents on a cache miss."""
+        if 0 < self.llm_synced_count <= len(dict_content):
+            delta = dict_content[self.llm_synced_count:]
+            try:
+                raw_rsp = await self._execute_call_llm(
+                    LLMCallInput(
+                        agent_name=self.agent_name,
+                        contents=delta,
+                        prefix_hash=self.llm_synced_hash,
+                        cache_contents=True,
+                        model_tier=model_tier,
+                    )
+                )
+                self.llm_synced_hash = chain_contents_hash(self.llm_synced_hash, delta)
+                self.llm_synced_count = len(dict_content)
+                return raw_rsp
+            except ActivityError as e:
+                if not (isinstance(e.cause, ApplicationError) and e.cause.type == CONVERSATION_CACHE_MISS):
+                    raise
+                workflow.logger.debug("Conversation cache miss, sending the full contents")
+
+        raw_rsp = await self._execute_call_llm(
+            LLMCallInput(
+                agent_name=self.agent_name,
+                contents=dict_content,
+                cache_contents=True,
+                model_tier=model_tier,
+            )
         )
-        raw_rsp = await workflow.execute_activity(
+        self.llm_synced_hash = chain_contents_hash("", dict_content)
+        self.llm_synced_count = len(dict_content)
+        return raw_rsp
+
+    async def _execute_call_llm(self, llm_input: LLMCallInput) -> Dict:
+        if self.config.stream:
+            llm_input.stream = True
+            llm_input.stream_to = self.root_workflow_id
+            llm_input.agent_path = self.agent_path
+        return await workflow.execute_activity(
             "call_llm",
             llm_input,
-            start_to_close_timeout=timedelta(seconds=60),
+            **self.config.llm_activity_options.to_kwargs(),
         )
-        return GenerationResponse.from_dict(raw_rsp).candidates[0]
 
     async def _wait_for_prompt(self):
-        count = len(self.contents)
-        await workflow.wait_condition(lambda: len(self.contents) != count)
+        """Wait for the next queued prompt and start its turn."""
+        self.pending_respond = None
+        if self.is_root_agent and not self.prompt_queue and self._should_continue_as_new():
+            # only continue as new when no prompt is in flight, so no update is dropped
+            self.continuing_as_new = True
+            await workflow.wait_condition(
+                lambda: bool(self.prompt_queue) or workflow.all_handlers_finished()
+            )
+            if not self.prompt_queue:
+                workflow.continue_as_new(self._continue_as_new_input())
+            self.continuing_as_new = False
+        await workflow.wait_condition(lambda: bool(self.prompt_queue))
+        self._start_turn(*self.prompt_queue.popleft())
+
+    def _start_turn(self, prompt: str, respond: Future) -> None:
+        """Add the prompt to the conversation, the turn's response resolving the given future."""
+        if prompt == "END":
+            self.terminate = True
+        self.turn += 1
+        self._append_content(Content(
+            role="user",
+            parts=[Part.from_text(prompt)],
+        ))
+        self.turn_model_contents_at = len(self.model_contents[self.agent_name])
+        self.pending_respond = respond
+        self._start_routing(prompt)
+
+    def _should_continue_as_new(self) -> bool:
+        """Check whether the history has grown past the configured thresholds."""
+        info = workflow.info()
+        return (
+            info.is_continue_as_new_suggested()
+            or info.get_current_history_length() >= self.config.max_history_events
+            or info.get_current_history_size() >= self.config.max_history_bytes
+        )
+
+    def _continue_as_new_input(self) -> AgentWorkflowInput:
+        """Build the input of the next run with compacted contents."""
+        model_contents = self.model_contents[self.agent_name]
+        carried_model_contents = model_contents[self.turn_model_contents_at:]
+        return AgentWorkflowInput(
+            agent_name=self.agent_name,
+            sub_agents=self.sub_agents,
+            contents=compact_contents(
+                self.dict_contents,
+                self.config.continue_as_new_keep_turns,
+            ),
+            is_root_agent=self.is_root_agent,
+            agent_configs=self.agent_configs,
+            model_contents=carried_model_contents,
+            model_content_paths=self.model_content_paths[self.turn_model_contents_at:],
+            model_contents_offset=self.model_contents_offset + len(model_contents) - len(carried_model_contents),
+            turn=self.turn,
+            usage=self.usage,
+            model_choices=self.model_choices[-MAX_CARRIED_MODEL_CHOICES:],
+            requested_tier=self.requested_tier,
+        )
 
     async def _handle_function_calls(self, candidate: Candidate) -> None:
-        """Handle function calls from the LLM."""
-        parts: List[Part] = []
-        for func in candidate.function_calls:
-            workflow.logger.debug(f"Handling function call: {func}")
-            response_part: Part
-            
-            if func.name in self.sub_agents.keys():
-                response_part = await self._invoke_as_child_workflow(func)
-            else:
-                response_part = await self._invoke_as_activity(func)
-            parts.append(response_part)
+        """Handle function calls from the LLM.
 
-        self.contents.append(Content(role="user", parts=parts))
+        Calls are dispatched concurrently, up to the agent's max_concurrent_calls,
+        and their responses are kept in the order of the calls.
+        """
+        semaphore = asyncio.Semaphore(self.config.max_concurrent_calls)
+
+        async def invoke(func: FunctionCall) -> Part:
+            async with semaphore:
+                workflow.logger.debug(f"Handling function call: {func}")
+                if func.name in self.sub_agents.keys():
+                    return await self._invoke_as_child_workflow(func)
+                return await self._invoke_as_activity(func)
+
+        parts: List[Part] = await asyncio.gather(
+            *(invoke(func) for func in candidate.function_calls)
+        )
+        self._append_content(Content(role="user", parts=list(parts)))
         
     async def _invoke_as_child_workflow(self, func: FunctionCall) -> None:
         prompt = json.dumps(func.args) # not sure if this is the right way to do it
@@ -164,9 +595,16 @@ class AgentWorkflow:
             agent_name=func.name,
             sub_agents=self.sub_agents[func.name],
             prompt=prompt,
-            contents=[c.to_dict() for c in self.contents]
+            contents=await self._sub_agent_contents(func.name),
+            agent_configs=self.agent_configs,
+            root_workflow_id=self.root_workflow_id,
+            agent_path=f"{self.agent_path}/{func.name}",
+            turn=self.turn,
+        )
+        child_id = f"{workflow.info().workflow_id}/{func.name}-{workflow.uuid4().hex[:6]}"
+        workflow.metric_meter().create_histogram(CHILD_WORKFLOW_DEPTH, "Depth of started sub-agents").record(
+            sub_agent_input.agent_path.count("/"), {"agent": func.name}
         )
-        child_id = f"{workflow.info().workflow_id}/{func.name}-{secrets.token_hex(3)}"
         func_rsp = await workflow.execute_child_workflow(
             AgentWorkflow.run,
             sub_agent_input,
@@ -179,14 +617,105 @@ class AgentWorkflow:
             response={"content": func_rsp},
         )
         
+    async def _sub_agent_contents(self, agent_name: str) -> List[Dict]:
+        """Select the contents passed to a sub-agent according to its context policy."""
+        config = self.agent_configs.get(agent_name, AgentConfig())
+        dict_contents = list(self.dict_contents)
+
+        if config.context_policy == ContextPolicy.NONE:
+            return []
+        if config.context_policy == ContextPolicy.LAST_N:
+            return compact_contents(dict_contents, config.context_turns)
+        if config.context_policy == ContextPolicy.USER_ONLY:
+            parts = [part for c in dict_contents if is_user_prompt(c) for part in c["parts"]]
+            return [{"role": "user", "parts": parts}] if parts else []
+        if config.context_policy == ContextPolicy.SUMMARY:
+            summary = await self._summarize(dict_contents)
+            if not summary:
+                workflow.logger.warning(f"Empty summary, passing the full contents to {agent_name}")
+                return dict_contents
+            return [summary_content(summary).to_dict()]
+        return dict_contents
+
+    async def _summarize(self, dict_contents: List[Dict]) -> str:
+        """Summarize the contents with this agent's model, reusing the summary of unchanged contents.
+
+        Sub-agents called in the same response share one summary activity.
+        """
+        contents_hash = chain_contents_hash("", dict_contents)
+        if self.summary_cache is None or self.summary_cache[0] != contents_hash:
+            task = asyncio.create_task(self._execute_summarize(dict_contents))
+            self.summary_cache = (contents_hash, task)
+        task = self.summary_cache[1]
+        try:
+            # shielded, so a cancelled sub-agent call does not cancel the summary of the others
+            return await asyncio.shield(task)
+        except Exception:
+            if self.summary_cache is not None and self.summary_cache[1] is task:
+                self.summary_cache = None # summarize again on the next call
+            raise
+
+    async def _execute_summarize(self, dict_contents: List[Dict]) -> str:
+        output: SummarizeOutput = await workflow.execute_activity(
+            "summarize_contents",
+            SummarizeInput(agent_name=self.agent_name, contents=dict_contents),
+            result_type=SummarizeOutput,
+            **self.config.llm_activity_options.to_kwargs(),
+        )
+        self._record_usage(output.usage_metadata)
+        return output.text
+
+    async def _enforce_token_budget(self) -> None:
+        """Replace older turns with a summary once the conversation exceeds the token budget.
+
+        The most recent turns are kept as is, or within a single long turn, its prompt
+        and most recent function call exchanges. Function calls and their responses
+        are never split.
+        """
+        if self.config.token_budget is None or self.last_token_count <= self.config.token_budget:
+            return
+
+        dict_contents = self.dict_contents
+        cut = summary_range(dict_contents, self.config.window_keep_turns)
+        if cut is None:
+            return # nothing worth summarizing beyond the kept turns
+        start, end = cut
+
+        summary = await self._summarize(dict_contents[start:end])
+        if not summary:
+            workflow.logger.warning("Empty summary, keeping the contents over the token budget")
+            return
+        workflow.logger.debug(
+            f"Summarized {end - start} contents over the token budget of {self.config.token_budget}"
+        )
+        summarized = summary_content(summary)
+        self._set_contents(
+            self.contents[:start] + [summarized] + self.contents[end:],
+            dict_contents[:start] + [summarized.to_dict()] + dict_contents[end:],
+        )
+        if self.contents_starts_at >= end:
+            self.contents_starts_at = self.contents_starts_at - (end - start) + 1
+        elif self.contents_starts_at > start:
+            self.contents_starts_at = start
+        self.llm_synced_count = 0
+        self.last_token_count = 0
+
     async def _invoke_as_activity(self, func: FunctionCall) -> None:
         func_args = next(iter(func.args.values()), dict()), # only use the first dataclass typed arg,
         workflow.logger.debug(f"Calling function: {func.name} with args: {func_args}")
-        func_rsp = await workflow.execute_activity(
-            func.name,
-            args=func_args,
-            start_to_close_timeout=timedelta(seconds=60),
-        )
+        options = self.config.function_options.get(func.name, ActivityOptions())
+        if func.name in self.config.local_functions:
+            func_rsp = await workflow.execute_local_activity(
+                func.name,
+                args=func_args,
+                **options.to_kwargs(local=True),
+            )
+        else:
+            func_rsp = await workflow.execute_activity(
+                func.name,
+                args=func_args,
+                **options.to_kwargs(),
+            )
         return Part.from_function_response(
             name=func.name,
             response={"content": func_rsp},
@@ -194,28 +723,133 @@ class AgentWorkflow:
 
     @workflow.update
     async def prompt(self, prompt: str) -> str:
-        """Update the workflow with a new prompt."""
+        """Update the workflow with a new prompt.
+
+        Prompts are queued and handled in order, one turn at a time, so clients
+        can send a prompt without waiting for the response to the previous one.
+        """
         workflow.logger.debug(f'prompt received: {prompt}')
-        if prompt == "END":
-            self.terminate = True
+        respond = asyncio.Future()
+        self.prompt_queue.append((prompt, respond))
+        # wait for respond to be resolved
+        await workflow.wait([respond])
+        return await respond
 
-        new_content = Content(
-            role="user",
-            parts=[Part.from_text(prompt)],
-        )
-        self.contents.append(new_content)
+    @prompt.validator
+    def validate_prompt(self, prompt: str) -> None:
+        """Reject prompts once the prompt queue is full, or the session is ending."""
+        if self.terminate:
+            raise ApplicationError("Session is ending", type=SESSION_ENDING, non_retryable=True)
+        if len(self.prompt_queue) >= self.config.max_queued_prompts:
+            raise ApplicationError(
+                f"Prompt queue is full ({len(self.prompt_queue)} prompts waiting)",
+                type=PROMPT_QUEUE_FULL,
+                non_retryable=True,
+            )
 
-        # wait for respond to be resolved
-        self.pending_respond = asyncio.Future()
-        await workflow.wait([self.pending_respond])
-        return await self.pending_respond
+    @workflow.update
+    async def wait_for_thoughts(self, watermark: int, timeout_seconds: float = 60) -> List[str]:
+        """Wait until model contents past the watermark exist and return them.
+
+        Returns an empty list when no new model content is produced within the
+        timeout, or when the workflow is about to continue as new.
+        """
+        model_contents = self.model_contents[self.agent_name]
+        try:
+            await workflow.wait_condition(
+                lambda: self.model_contents_offset + len(model_contents) > watermark or self.continuing_as_new,
+                timeout=timedelta(seconds=timeout_seconds),
+            )
+        except asyncio.TimeoutError:
+            pass
+        return await self.get_model_content(watermark)
 
     @workflow.query
     async def get_model_content(self, watermark: int) -> List[str]:
-        """Get the model's content."""
-        return self.model_contents[self.agent_name][watermark:]
+        """Get the model's content.
+
+        The watermark counts all model contents of the session, including the
+        ones dropped when the workflow continued as new.
+        """
+        start = max(watermark - self.model_contents_offset, 0)
+        return self.model_contents[self.agent_name][start:]
+    
+    @workflow.query
+    async def get_tagged_model_content(self, watermark: int) -> List[TaggedModelContent]:
+        """Get the model's content along with the path of the agent that produced it."""
+        start = max(watermark - self.model_contents_offset, 0)
+        return [
+            TaggedModelContent(agent_path=agent_path, text=text)
+            for agent_path, text in zip(
+                self.model_content_paths[start:],
+                self.model_contents[self.agent_name][start:],
+            )
+        ]
     
+    @workflow.update
+    async def wait_for_partial_text(self, version: int, timeout_seconds: float = 60) -> PartialTextSnapshot:
+        """Wait until the streamed text changes from the given version and return it.
+
+        Returns the unchanged snapshot when no text is streamed within the timeout.
+        """
+        try:
+            await workflow.wait_condition(
+                lambda: self.partial_version != version or self.continuing_as_new,
+                timeout=timedelta(seconds=timeout_seconds),
+            )
+        except asyncio.TimeoutError:
+            pass
+        return PartialTextSnapshot(version=self.partial_version, texts=dict(self.partial_texts))
+
+    @workflow.signal
+    async def add_partial_text(self, partial: PartialText) -> None:
+        """Signal to add text streamed by an LLM call in progress."""
+        self.partial_texts[partial.agent_path] = self.partial_texts.get(partial.agent_path, "") + partial.text
+        self.partial_version += 1
+
+    @workflow.query
+    async def get_usage(self) -> Dict[str, TokenUsage]:
+        """Get the token usage of the session by agent name, including finished sub-agents."""
+        return self.usage
+
+    @workflow.signal
+    async def add_usage(self, usage: Dict[str, TokenUsage]) -> None:
+        """Signal to roll up the token usage of a finished sub-agent."""
+        merge_usage(self.usage, usage)
+
+    @workflow.query
+    async def get_model_choices(self) -> List[ModelChoice]:
+        """Get the models picked for the LLM calls of routed agents, including finished sub-agents."""
+        return self.model_choices
+
+    @workflow.signal
+    async def add_model_choices(self, choices: List[ModelChoice]) -> None:
+        """Signal to roll up the model choices of a finished sub-agent."""
+        self.model_choices.extend(choices)
+
+    @workflow.signal
+    async def escalate(self, tier: Optional[int] = None) -> None:
+        """Signal to escalate the running turn, or the next one when idle, to a routing tier.
+
+        Args:
+            tier: Routing tier, 1 for the first model of the agent's routing, the top tier if None
+        """
+        top = len(self.config.model_tiers) - 1
+        tier = top if tier is None else tier
+        if self.pending_respond is not None:
+            self._escalate(tier, RoutingReason.REQUESTED)
+        else:
+            self.requested_tier = max(self.requested_tier, tier)
+
     @workflow.signal
     async def add_model_content(self, message: str) -> None:
-        """Signal to update the model's content."""
-        self.model_contents[self.agent_name].append(message)
\ No newline at end of file
+        """Signal to update the model's content.
+
+        Kept for sub-agents started before model contents were batched.
+        """
+        self._append_model_contents("", [message])
+
+    @workflow.signal
+    async def add_model_contents(self, batch: ModelContentBatch) -> None:
+        """Signal to add the model contents of a sub-agent's LLM turn."""
+        self._append_model_contents(batch.agent_path, batch.messages)
@@ -4,7 +4,9 @@ from dataclasses import dataclass
 from typing import List, Dict, Any
 
 from temporal.agent.llm_manager import LLMManager
-from temporal.agent.agent import Agent
+from datetime import timedelta
+
+from temporal.agent.agent import Agent, ActivityOptions, activity_options, cache_results, local_activity
 
 
 @dataclass
@@ -115,6 +117,77 @@ class TestLLM:
         assert len(manager.llms) == 1  # Only root agent should be present
 
 
+class TestAgent:
+    """Test suite for the Agent class."""
+
+    def test_local_functions(self):
+        """Test that local functions are exposed as tools and detected from the decorator."""
+        def get_order_status(order_id: str) -> str:
+            return "shipped"
+
+        @local_activity
+        def greet(name: str) -> str:
+            return f"hi {name}"
+
+        def search_orders(query: str) -> str:
+            return "[]"
+
+        agent = Agent(
+            name="Store Agent",
+            functions=[greet, search_orders],
+            local_functions=[get_order_status]
+        )
+
+        assert agent.functions == [greet, search_orders, get_order_status]
+        assert agent.local_functions == ["greet", "get_order_status"]
+
+    def test_function_options(self):
+        """Test that options declared on a function take precedence over the agent's defaults."""
+        @activity_options(start_to_close_timeout=300, heartbeat_timeout=30, non_retryable_error_types=["ValueError"])
+        def search_code(query: str) -> str:
+            return "[]"
+
+        def get_repos(org: str) -> str:
+            return "[]"
+
+        agent = Agent(
+            name="Code Agent",
+            functions=[search_code, get_repos],
+            activity_options=ActivityOptions(start_to_close_timeout=10, maximum_attempts=2)
+        )
+
+        search_kwargs = agent.function_options["search_code"].to_kwargs()
+        assert search_kwargs["start_to_close_timeout"] == timedelta(seconds=300)
+        assert search_kwargs["heartbeat_timeout"] == timedelta(seconds=30)
+        assert search_kwargs["retry_policy"].non_retryable_error_types == ["ValueError"]
+        assert "heartbeat_timeout" not in agent.function_options["search_code"].to_kwargs(local=True)
+
+        repos_kwargs = agent.function_options["get_repos"].to_kwargs()
+        assert repos_kwargs["start_to_close_timeout"] == timedelta(seconds=10)
+        assert repos_kwargs["retry_policy"].maximum_attempts == 2
+
+    def test_cached_functions(self):
+        """Test that cached functions are opted in through the agent or the decorator."""
+        @cache_results(ttl=600)
+        def get_repos(org: str) -> str:
+            return "[]"
+
+        def get_channels() -> str:
+            return "[]"
+
+        def post_message(text: str) -> str:
+            return "ok"
+
+        agent = Agent(
+            name="Code Agent",
+            functions=[get_repos, get_channels, post_message],
+            cached_functions=[get_channels],
+            cache_ttl=120,
+        )
+
+        assert agent.cache_ttls == {"get_repos": 600, "get_channels": 120}
+
+
 if __name__ == "__main__":
     # Run the tests
     pytest.main([__file__, "-v"])
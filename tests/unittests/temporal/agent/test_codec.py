@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import os
+import time
+import pytest
+
+from temporalio.api.common.v1 import Payload
+
+from temporal.agent.codec import (
+    CodecChain,
+    CompressionCodec,
+    FileBlobStore,
+    OffloadCodec,
+    COMPRESSION_ENCODINGS,
+    OFFLOAD_ENCODING,
+)
+
+
+def blob_key(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class TestOffloadCodec:
+    """Test suite for the OffloadCodec class."""
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        """Blob store in a temporary directory."""
+        return FileBlobStore(str(tmp_path / "blobs"))
+
+    @pytest.fixture
+    def large_payload(self):
+        return Payload(metadata={"encoding": b"json/plain"}, data=b'"' + b"x" * 2048 + b'"')
+
+    @pytest.mark.asyncio
+    async def test_offload_roundtrip(self, store, large_payload):
+        """Test that large payloads are offloaded and restored."""
+        codec = OffloadCodec(store, threshold=1024)
+
+        encoded = await codec.encode([large_payload])
+        assert encoded[0].metadata["encoding"] == OFFLOAD_ENCODING
+        assert encoded[0].ByteSize() < 1024
+
+        decoded = await codec.decode(encoded)
+        assert decoded == [large_payload]
+
+    @pytest.mark.asyncio
+    async def test_small_payloads_untouched(self, store):
+        """Test that payloads under the threshold stay inline."""
+        codec = OffloadCodec(store, threshold=1024)
+        payload = Payload(metadata={"encoding": b"json/plain"}, data=b'"hello"')
+
+        assert await codec.encode([payload]) == [payload]
+        assert await codec.decode([payload]) == [payload]
+        assert os.listdir(store.directory) == []
+
+    @pytest.mark.asyncio
+    async def test_identical_payloads_deduplicated(self, store, large_payload):
+        """Test that identical payloads share one blob."""
+        codec = OffloadCodec(store, threshold=1024)
+
+        first = await codec.encode([large_payload])
+        second = await codec.encode([large_payload])
+
+        assert first == second
+        assert len(os.listdir(store.directory)) == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_writes_of_same_blob(self, store):
+        """Test that concurrent writes of the same blob neither clobber each other nor fail."""
+        data = b"x" * 1024 * 1024
+        key = blob_key(data)
+        await asyncio.gather(*(store.put(key, data) for _ in range(8)))
+
+        assert await store.get(key) == data
+        assert os.listdir(store.directory) == [key]
+
+    @pytest.mark.asyncio
+    async def test_prune(self, store):
+        """Test that blobs not written again within the age are deleted, and the others kept."""
+        keys = {data: blob_key(data) for data in [b"old", b"reused", b"new"]}
+        for data, key in keys.items():
+            await store.put(key, data)
+        past = time.time() - 3600
+        for data in [b"old", b"reused"]:
+            os.utime(store._path(keys[data]), (past, past))
+        await store.put(keys[b"reused"], b"reused")
+
+        assert await store.prune(older_than=600) == 1
+        assert sorted(os.listdir(store.directory)) == sorted([keys[b"new"], keys[b"reused"]])
+
+    @pytest.mark.asyncio
+    async def test_invalid_keys_rejected(self, store, tmp_path):
+        """Test that blob references other than a SHA-256 hash never reach the filesystem."""
+        (tmp_path / "secret").write_bytes(b"secret")
+        codec = OffloadCodec(store)
+        for key in ["../secret", "../" * 8 + "etc/passwd", blob_key(b"x").upper(), blob_key(b"x")[:63]]:
+            with pytest.raises(ValueError):
+                await codec.decode([Payload(metadata={"encoding": OFFLOAD_ENCODING}, data=key.encode())])
+        with pytest.raises(ValueError):
+            await store.put("../secret", b"overwritten")
+        assert (tmp_path / "secret").read_bytes() == b"secret"
+
+
+
+class TestCompressionCodec:
+    """Test suite for the CompressionCodec class."""
+
+    @pytest.fixture
+    def payload(self):
+        contents = b'[' + b','.join([b'{"role": "user", "parts": [{"text": "Where is my order?"}]}'] * 100) + b']'
+        return Payload(metadata={"encoding": b"json/plain"}, data=contents)
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("algorithm", ["gzip", "zstd"])
+    async def test_compression_roundtrip(self, payload, algorithm):
+        """Test that payloads are compressed and restored with each algorithm."""
+        if algorithm == "zstd":
+            pytest.importorskip("zstandard")
+        codec = CompressionCodec(algorithm=algorithm, threshold=1024)
+
+        encoded = await codec.encode([payload])
+        assert encoded[0].metadata["encoding"] == COMPRESSION_ENCODINGS[algorithm]
+        assert encoded[0].ByteSize() < payload.ByteSize()
+
+        assert await codec.decode(encoded) == [payload]
+
+    @pytest.mark.asyncio
+    async def test_decodes_other_algorithm_and_uncompressed(self, payload):
+        """Test that histories written with another algorithm or without compression stay readable."""
+        pytest.importorskip("zstandard")
+        gzip_encoded = await CompressionCodec(algorithm="gzip", threshold=0).encode([payload])
+        codec = CompressionCodec(algorithm="zstd")
+
+        assert await codec.decode(gzip_encoded + [payload]) == [payload, payload]
+
+    def test_unsupported_algorithm(self):
+        """Test that unknown algorithms are rejected."""
+        with pytest.raises(ValueError):
+            CompressionCodec(algorithm="lz4")
+
+    @pytest.mark.asyncio
+    async def test_chain_with_offload(self, payload, tmp_path):
+        """Test that a chain compresses before offloading and decodes in reverse."""
+        codec = CodecChain([
+            CompressionCodec(algorithm="gzip", threshold=0),
+            OffloadCodec(FileBlobStore(str(tmp_path)), threshold=0),
+        ])
+
+        encoded = await codec.encode([payload])
+        assert encoded[0].metadata["encoding"] == OFFLOAD_ENCODING
+        assert await codec.decode(encoded) == [payload]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,124 @@
+import pytest
+import time
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+from vertexai.generative_models import FunctionDeclaration, Tool
+
+from temporal.agent.context_cache import ContextCache, early_turns_end
+
+
+def user_prompt(text: str) -> dict:
+    return {"role": "user", "parts": [{"text": text}]}
+
+
+def model_text(text: str) -> dict:
+    return {"role": "model", "parts": [{"text": text}]}
+
+
+def function_response(name: str) -> dict:
+    return {"role": "user", "parts": [{"function_response": {"name": name, "response": {"content": "ok"}}}]}
+
+
+CONTENTS = [
+    user_prompt("first"), model_text("a"),
+    user_prompt("second"), function_response("get_repos"), model_text("b"),
+    user_prompt("third"),
+]
+
+
+class TestEarlyTurnsEnd:
+    """Test suite for early_turns_end."""
+
+    def test_early_turns(self):
+        assert early_turns_end(CONTENTS, 1) == 2
+        assert early_turns_end(CONTENTS, 2) == 5
+
+    def test_turn_in_progress_not_cached(self):
+        assert early_turns_end(CONTENTS, 3) == 0
+        assert early_turns_end(CONTENTS, 0) == 0
+
+
+class TestContextCache:
+    """Test suite for the ContextCache class."""
+
+    @pytest.fixture
+    def tool(self):
+        return Tool(function_declarations=[FunctionDeclaration(
+            name="get_repos", description="List repos", parameters={"type": "object", "properties": {}},
+        )])
+
+    @pytest.fixture
+    def mock_caching(self):
+        with patch('temporal.agent.context_cache.caching.CachedContent') as mock_cached_content, \
+             patch('temporal.agent.context_cache.CachedGenerativeModel') as mock_model:
+            yield mock_cached_content, mock_model
+
+    @pytest.fixture
+    def cache(self, tool):
+        cache = ContextCache()
+        cache.register("root-agent", "gemini-2.0-flash-001", "Long instruction", tool, ttl=600, turns=1)
+        return cache
+
+    @pytest.mark.asyncio
+    async def test_creates_once_and_reuses(self, cache, mock_caching):
+        """Test that the prefix is cached once and later calls only send the remaining contents."""
+        mock_cached_content, mock_model = mock_caching
+
+        model, key, remaining = await cache.resolve("root-agent", CONTENTS)
+        assert model is mock_model.from_cached_content.return_value
+        assert remaining == CONTENTS[2:]
+        create_kwargs = mock_cached_content.create.call_args.kwargs
+        assert create_kwargs["system_instruction"] == "Long instruction"
+        assert create_kwargs["ttl"] == timedelta(seconds=600)
+        assert [c.to_dict() for c in create_kwargs["contents"]] == CONTENTS[:2]
+
+        # the next turn shares the cached prefix
+        again, again_key, remaining = await cache.resolve("root-agent", CONTENTS + [model_text("c")])
+        assert (again, again_key) == (model, key)
+        assert remaining == CONTENTS[2:] + [model_text("c")]
+        mock_cached_content.create.assert_called_once()
+        assert cache.stats() == {"hits": 2, "created": 1, "refreshed": 0, "fallbacks": 0, "entries": 1}
+
+    @pytest.mark.asyncio
+    async def test_refreshes_ttl(self, cache, mock_caching):
+        """Test that a cached content close to expiring has its TTL extended when used."""
+        mock_cached_content, _ = mock_caching
+        _, key, _ = await cache.resolve("root-agent", CONTENTS)
+        cache.entries[key].expires_at = time.monotonic() + 60
+
+        await cache.resolve("root-agent", CONTENTS)
+        mock_cached_content.create.return_value.update.assert_called_once_with(ttl=timedelta(seconds=600))
+        assert cache.entries[key].expires_at > time.monotonic() + 500
+        assert cache.stats()["refreshed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_falls_back_when_not_cacheable(self, cache, mock_caching):
+        """Test that a prefix failing to be cached is called uncached, without retrying until its TTL."""
+        mock_cached_content, _ = mock_caching
+        mock_cached_content.create.side_effect = Exception("below the minimum token count")
+
+        for _ in range(2):
+            model, key, remaining = await cache.resolve("root-agent", CONTENTS)
+            assert (model, key, remaining) == (None, None, CONTENTS)
+        mock_cached_content.create.assert_called_once()
+        assert cache.stats()["fallbacks"] == 2
+
+    @pytest.mark.asyncio
+    async def test_invalidate_recreates(self, cache, mock_caching):
+        """Test that a cached content found deleted is created again on the next call."""
+        mock_cached_content, _ = mock_caching
+        _, key, _ = await cache.resolve("root-agent", CONTENTS)
+        cache.invalidate(key)
+
+        await cache.resolve("root-agent", CONTENTS)
+        assert mock_cached_content.create.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_not_registered(self, cache):
+        """Test that agents without context caching are called uncached."""
+        assert await cache.resolve("sub-agent", CONTENTS) == (None, None, CONTENTS)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,118 @@
+import pytest
+from unittest.mock import patch
+
+from vertexai.generative_models import Content, GenerationResponse
+
+from temporal.agent.agent import Agent
+from temporal.agent.fake_llm import FakeLLMBackend, FakeReply, FakeRule
+from temporal.agent.llm_manager import LLMCallInput, LLMManager, SummarizeInput
+
+
+def user_prompt(text: str) -> dict:
+    return {"role": "user", "parts": [{"text": text}]}
+
+
+def function_response(name: str) -> dict:
+    return {"role": "user", "parts": [{"function_response": {"name": name, "response": {"content": "ok"}}}]}
+
+
+def contents(*dicts) -> list:
+    return [Content.from_dict(d) for d in dicts]
+
+
+class TestFakeLLMBackend:
+    """Test suite for the FakeLLMBackend class."""
+
+    @pytest.fixture
+    def backend(self):
+        return FakeLLMBackend(rules=[
+            FakeRule(FakeReply(text="Found 3 repos."), after_function="get_repos"),
+            FakeRule(FakeReply.call("get_repos", org="temporalio"), agent="root-agent", prompt_contains="repos"),
+            FakeRule([FakeReply(text="first"), FakeReply(text="then")], agent="sub-agent"),
+        ])
+
+    @pytest.mark.asyncio
+    async def test_rules(self, backend):
+        """Test that the first matching rule replies, and unmatched requests get the default reply."""
+        model = backend.create_model("root-agent", "gemini-2.0-flash", "Be brief")
+
+        response = await model.generate_content_async(contents(user_prompt("List the repos")))
+        assert response.candidates[0].function_calls[0].name == "get_repos"
+        assert dict(response.candidates[0].function_calls[0].args) == {"org": "temporalio"}
+
+        response = await model.generate_content_async(
+            contents(user_prompt("List the repos"), function_response("get_repos"))
+        )
+        assert response.text == "Found 3 repos."
+
+        response = await model.generate_content_async(contents(user_prompt("Hello")))
+        assert response.text == "Done."
+        assert backend.calls == {"root-agent": 3}
+
+    @pytest.mark.asyncio
+    async def test_canned_replies(self, backend):
+        """Test that a list of replies is played in order, repeating the last one."""
+        model = backend.create_model("sub-agent", "gemini-2.0-flash", "")
+        texts = [(await model.generate_content_async(contents(user_prompt("Hi")))).text for _ in range(3)]
+        assert texts == ["first", "then", "then"]
+
+    @pytest.mark.asyncio
+    async def test_callable_reply(self):
+        """Test that a callable reply is built from the request, falling through when it returns None."""
+        backend = FakeLLMBackend().add_rule(
+            lambda request: FakeReply(text=request.last_prompt().upper()) if "echo" in request.last_prompt() else None
+        )
+        model = backend.create_model("root-agent", "gemini-2.0-flash", "")
+        assert (await model.generate_content_async(contents(user_prompt("echo me")))).text == "ECHO ME"
+        assert (await model.generate_content_async(contents(user_prompt("hello")))).text == "Done."
+
+    @pytest.mark.asyncio
+    async def test_latency_and_tokens(self):
+        """Test that replies wait for their latency and report the configured or estimated tokens."""
+        backend = FakeLLMBackend(latency=1.5, chars_per_token=1).add_rule(
+            FakeReply(text="Hi", latency=0.2, prompt_tokens=1000), prompt_contains="fast",
+        )
+        model = backend.create_model("root-agent", "gemini-2.0-flash", "Be brief")
+
+        with patch("temporal.agent.fake_llm.asyncio.sleep") as mock_sleep:
+            response = await model.generate_content_async(contents(user_prompt("fast")))
+            assert response.usage_metadata.prompt_token_count == 1000
+            assert response.usage_metadata.candidates_token_count == len('[{"text": "Hi"}]')
+            mock_sleep.assert_called_once_with(0.2)
+
+            response = await model.generate_content_async(contents(user_prompt("slow")))
+            assert response.usage_metadata.prompt_token_count > len("Be brief")
+            mock_sleep.assert_called_with(1.5)
+
+    @pytest.mark.asyncio
+    async def test_stream(self):
+        """Test that streamed replies spread the text over chunks, ending with the function calls and usage."""
+        backend = FakeLLMBackend(stream_chunks=2).add_rule(
+            FakeReply(text="Found 3 repos.", function_calls=[{"name": "get_repos", "args": {}}])
+        )
+        model = backend.create_model("root-agent", "gemini-2.0-flash", "")
+
+        stream = await model.generate_content_async(contents(user_prompt("Hi")), stream=True)
+        chunks = [chunk.to_dict() async for chunk in stream]
+        assert [c["candidates"][0]["content"]["parts"][0] for c in chunks] == [{"text": "Found 3"}, {"text": " repos."}]
+        assert chunks[-1]["candidates"][0]["content"]["parts"][1] == {"function_call": {"name": "get_repos", "args": {}}}
+        assert chunks[-1]["candidates"][0]["finish_reason"] == "STOP"
+        assert "usage_metadata" in chunks[-1]
+
+    @pytest.mark.asyncio
+    async def test_llm_manager(self):
+        """Test that LLMManager calls and summarizes through the fake backend without Vertex AI."""
+        backend = FakeLLMBackend(default=FakeReply(text="Summary", function_calls=[{"name": "search", "args": {}}]))
+        manager = LLMManager(root_agent=Agent(name="Root Agent"), backend=backend)
+
+        response = await manager.call_llm(LLMCallInput(agent_name="root-agent", contents=[user_prompt("Hi")]))
+        parts = GenerationResponse.from_dict(response).candidates[0].content.to_dict()["parts"]
+        assert parts == [{"text": "Summary"}, {"function_call": {"name": "search", "args": {}}}]
+
+        # function calls are disabled for summaries
+        summary = await manager.summarize_contents(SummarizeInput(agent_name="root-agent", contents=[user_prompt("Hi")]))
+        assert summary.text == "Summary"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
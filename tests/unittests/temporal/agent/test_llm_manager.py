@@ -1,9 +1,23 @@
 import pytest
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import AsyncMock, Mock, patch, MagicMock, PropertyMock
 from dataclasses import dataclass
 
-from temporal.agent.llm_manager import LLMManager, LLMCallInput
-from temporal.agent.agent import Agent
+from google.api_core import exceptions as google_exceptions
+from temporalio.exceptions import ApplicationError
+from vertexai.generative_models import GenerationResponse
+
+from temporal.agent.llm_manager import (
+    LLMManager,
+    LLMCallInput,
+    PartialText,
+    SummarizeInput,
+    SummarizeOutput,
+    CONVERSATION_CACHE_MISS,
+    chain_contents_hash,
+)
+from temporal.agent.agent import Agent, ModelRouting
+from temporal.agent.fake_llm import FakeLLMBackend, FakeReply
+from temporal.agent.response_cache import InMemoryResponseCache
 
 
 @dataclass
@@ -52,7 +66,7 @@ class TestLLMManager:
         
         return root_agent
 
-    @patch('temporal.agent.llm_manager.GenerativeModel')
+    @patch('temporal.agent.llm_backend.GenerativeModel')
     @patch('temporal.agent.llm_manager.create_enhanced_tool')
     def test_llm_manager_initialization(self, mock_create_tool, mock_gen_model, mock_agent):
         """Test LLMManager initialization with agents."""
@@ -83,11 +97,12 @@ class TestLLMManager:
             sub_agents={"sub-agent": MockSchema}
         )
 
+    @pytest.mark.asyncio
     @patch('temporal.agent.llm_manager.Content')
     @patch('temporal.agent.llm_manager.GenerationConfig')
-    def test_call_llm(self, mock_gen_config, mock_content, mock_agent):
+    async def test_call_llm(self, mock_gen_config, mock_content, mock_agent):
         """Test the call_llm activity."""
-        with patch('temporal.agent.llm_manager.GenerativeModel') as mock_gen_model, \
+        with patch('temporal.agent.llm_backend.GenerativeModel') as mock_gen_model, \
              patch('temporal.agent.llm_manager.create_enhanced_tool') as mock_create_tool:
             
             # Setup mocks
@@ -97,7 +112,7 @@ class TestLLMManager:
             mock_model = Mock()
             mock_response = Mock()
             mock_response.to_dict.return_value = {"response": "test result"}
-            mock_model.generate_content.return_value = mock_response
+            mock_model.generate_content_async = AsyncMock(return_value=mock_response)
             mock_gen_model.return_value = mock_model
             
             mock_content_obj = Mock()
@@ -121,7 +136,7 @@ class TestLLMManager:
             )
             
             # Call the method
-            result = manager.call_llm(call_input)
+            result = await manager.call_llm(call_input)
             
             # Verify Content.from_dict was called for each content
             assert mock_content.from_dict.call_count == len(test_contents)
@@ -129,9 +144,9 @@ class TestLLMManager:
             # Verify GenerationConfig was created with temperature=0
             mock_gen_config.assert_called_once_with(temperature=0)
             
-            # Verify generate_content was called with correct parameters
-            mock_model.generate_content.assert_called_once()
-            call_args = mock_model.generate_content.call_args
+            # Verify generate_content_async was called with correct parameters
+            mock_model.generate_content_async.assert_called_once()
+            call_args = mock_model.generate_content_async.call_args
             
             assert call_args[1]['generation_config'] == mock_config_obj
             assert call_args[1]['tools'] == [mock_tool]
@@ -139,6 +154,297 @@ class TestLLMManager:
             # Verify result
             assert result == {"response": "test result"}
 
+    @pytest.mark.asyncio
+    @patch('temporal.agent.llm_manager.activity')
+    @patch('temporal.agent.llm_manager.Content')
+    @patch('temporal.agent.llm_manager.GenerationConfig')
+    async def test_call_llm_with_delta_contents(self, mock_gen_config, mock_content, mock_activity, mock_agent):
+        """Test that delta calls are expanded from the worker-local conversation cache."""
+        with patch('temporal.agent.llm_backend.GenerativeModel') as mock_gen_model, \
+             patch('temporal.agent.llm_manager.create_enhanced_tool'):
+
+            mock_model = Mock()
+            mock_model.generate_content_async = AsyncMock(return_value=Mock())
+            mock_model.generate_content_async.return_value.to_dict.return_value = {"response": "test result"}
+            mock_gen_model.return_value = mock_model
+            mock_content.from_dict.side_effect = lambda c: c
+            mock_activity.info.return_value.workflow_run_id = "run-1"
+            mock_activity.in_activity.return_value = False
+
+            manager = LLMManager(root_agent=mock_agent)
+
+            first_turn = [{"role": "user", "parts": [{"text": "Hello"}]}]
+            second_turn = [
+                {"role": "model", "parts": [{"text": "Hi there!"}]},
+                {"role": "user", "parts": [{"text": "How are you?"}]}
+            ]
+
+            await manager.call_llm(LLMCallInput(agent_name="root-agent", contents=first_turn, cache_contents=True))
+            await manager.call_llm(LLMCallInput(
+                agent_name="root-agent",
+                contents=second_turn,
+                prefix_hash=chain_contents_hash("", first_turn),
+                cache_contents=True
+            ))
+
+            call_args = mock_model.generate_content_async.call_args
+            assert call_args[1]['contents'] == first_turn + second_turn
+            assert manager.conversations["run-1"] == (
+                chain_contents_hash("", first_turn + second_turn),
+                first_turn + second_turn
+            )
+
+            # Unknown prefix falls back to the workflow with a non-retryable error
+            with pytest.raises(ApplicationError) as exc_info:
+                await manager.call_llm(LLMCallInput(
+                    agent_name="root-agent",
+                    contents=second_turn,
+                    prefix_hash="unknown",
+                    cache_contents=True
+                ))
+            assert exc_info.value.type == CONVERSATION_CACHE_MISS
+            assert exc_info.value.non_retryable
+
+            # A failed generation leaves the cache as it was, so the retry still finds its prefix
+            third_turn = [{"role": "user", "parts": [{"text": "And then?"}]}]
+            third_input = LLMCallInput(
+                agent_name="root-agent",
+                contents=third_turn,
+                prefix_hash=chain_contents_hash("", first_turn + second_turn),
+                cache_contents=True
+            )
+            mock_model.generate_content_async.side_effect = RuntimeError("unavailable")
+            with pytest.raises(RuntimeError):
+                await manager.call_llm(third_input)
+            assert manager.conversations["run-1"][0] == chain_contents_hash("", first_turn + second_turn)
+
+            mock_model.generate_content_async.side_effect = None
+            await manager.call_llm(third_input)
+            assert mock_model.generate_content_async.call_args[1]['contents'] == first_turn + second_turn + third_turn
+
+
+    @pytest.mark.asyncio
+    @patch('temporal.agent.llm_manager.Content')
+    @patch('temporal.agent.llm_manager.GenerationConfig')
+    async def test_summarize_contents(self, mock_gen_config, mock_content, mock_agent):
+        """Test the summarize_contents activity."""
+        with patch('temporal.agent.llm_backend.GenerativeModel') as mock_gen_model, \
+             patch('temporal.agent.llm_manager.create_enhanced_tool') as mock_create_tool:
+
+            mock_tool = Mock()
+            mock_create_tool.return_value = mock_tool
+
+            mock_model = Mock()
+            mock_model.generate_content_async = AsyncMock(return_value=Mock())
+            mock_model.generate_content_async.return_value.text = "The user said hello."
+            mock_model.generate_content_async.return_value.to_dict.return_value = {
+                "usage_metadata": {"prompt_token_count": 12, "candidates_token_count": 5},
+            }
+            mock_gen_model.return_value = mock_model
+
+            manager = LLMManager(root_agent=mock_agent)
+
+            result = await manager.summarize_contents(SummarizeInput(
+                agent_name="sub-agent",
+                contents=[{"role": "user", "parts": [{"text": "Hello"}]}],
+                max_output_tokens=256
+            ))
+
+            # The summary request is appended after the conversation
+            call_args = mock_model.generate_content_async.call_args
+            assert len(call_args[1]['contents']) == 2
+            assert call_args[1]['tools'] == [mock_tool]
+            mock_gen_config.assert_called_once_with(temperature=0, max_output_tokens=256)
+            assert result == SummarizeOutput(
+                text="The user said hello.",
+                usage_metadata={"prompt_token_count": 12, "candidates_token_count": 5},
+            )
+
+            # responses without text, e.g. blocked ones, give an empty summary
+            type(mock_model.generate_content_async.return_value).text = PropertyMock(
+                side_effect=ValueError("Response has no candidates (and thus no text).")
+            )
+            result = await manager.summarize_contents(SummarizeInput(agent_name="sub-agent", contents=[]))
+            assert result.text == ""
+
+    @pytest.mark.asyncio
+    @patch('temporal.agent.llm_manager.activity')
+    async def test_call_llm_streaming(self, mock_activity, mock_agent):
+        """Test that streamed chunks are forwarded as partial text and assembled into one response."""
+        chunks = [
+            {"candidates": [{"content": {"role": "model", "parts": [{"text": "Found "}]}}]},
+            {"candidates": [{"content": {"role": "model", "parts": [{"text": "3 repos."}]}}]},
+            {
+                "candidates": [{
+                    "content": {"role": "model", "parts": [{"function_call": {"name": "get_repos", "args": {}}}]},
+                    "finish_reason": "STOP",
+                }],
+                "usage_metadata": {"prompt_token_count": 10, "candidates_token_count": 5, "total_token_count": 15},
+            },
+        ]
+
+        async def stream():
+            for chunk in chunks:
+                yield GenerationResponse.from_dict(chunk)
+
+        with patch('temporal.agent.llm_backend.GenerativeModel') as mock_gen_model, \
+             patch('temporal.agent.llm_manager.create_enhanced_tool'):
+            mock_model = Mock()
+            mock_model.generate_content_async = AsyncMock(return_value=stream())
+            mock_gen_model.return_value = mock_model
+            mock_activity.in_activity.return_value = False
+            signal = mock_activity.client.return_value.get_workflow_handle.return_value.signal = AsyncMock()
+
+            manager = LLMManager(root_agent=mock_agent, stream_flush_interval=0)
+            result = await manager.call_llm(LLMCallInput(
+                agent_name="sub-agent",
+                contents=[{"role": "user", "parts": [{"text": "Hello"}]}],
+                stream=True,
+                stream_to="root-workflow",
+                agent_path="root-agent/sub-agent",
+            ))
+
+            assert mock_model.generate_content_async.call_args.kwargs["stream"] is True
+            mock_activity.client.return_value.get_workflow_handle.assert_called_with("root-workflow")
+            assert [c.args[1] for c in signal.call_args_list] == [
+                PartialText(agent_path="root-agent/sub-agent", text="Found "),
+                PartialText(agent_path="root-agent/sub-agent", text="3 repos."),
+            ]
+            assert mock_activity.heartbeat.call_count == 3
+
+            assert result["candidates"][0]["content"]["parts"] == [
+                {"text": "Found 3 repos."},
+                {"function_call": {"name": "get_repos", "args": {}}},
+            ]
+            assert result["candidates"][0]["finish_reason"] == "STOP"
+            assert result["usage_metadata"]["total_token_count"] == 15
+
+    @pytest.mark.asyncio
+    @patch('temporal.agent.llm_manager.activity')
+    async def test_call_llm_streaming_part_order(self, mock_activity, mock_agent):
+        """Test that streamed parts keep their order and the text left at the end is forwarded."""
+        chunks = [
+            {"candidates": [{"content": {"role": "model", "parts": [{"text": "Let me "}, {"text": "search."}]}}]},
+            {"candidates": [{"content": {"role": "model", "parts": [{"function_call": {"name": "get_repos", "args": {}}}]}}]},
+            {"candidates": [{"content": {"role": "model", "parts": [{"text": "Then "}]}}]},
+            {"candidates": [{"content": {"role": "model", "parts": [{"text": "summarize."}]}, "finish_reason": "STOP"}]},
+        ]
+
+        async def stream():
+            for chunk in chunks:
+                yield GenerationResponse.from_dict(chunk)
+
+        with patch('temporal.agent.llm_backend.GenerativeModel') as mock_gen_model, \
+             patch('temporal.agent.llm_manager.create_enhanced_tool'):
+            mock_model = Mock()
+            mock_model.generate_content_async = AsyncMock(return_value=stream())
+            mock_gen_model.return_value = mock_model
+            mock_activity.in_activity.return_value = False
+            signal = mock_activity.client.return_value.get_workflow_handle.return_value.signal = AsyncMock()
+
+            # the stream is shorter than the flush interval
+            manager = LLMManager(root_agent=mock_agent, stream_flush_interval=60)
+            result = await manager.call_llm(LLMCallInput(
+                agent_name="sub-agent",
+                contents=[{"role": "user", "parts": [{"text": "Hello"}]}],
+                stream=True,
+                stream_to="root-workflow",
+                agent_path="root-agent/sub-agent",
+            ))
+
+            assert [c.args[1] for c in signal.call_args_list] == [
+                PartialText(agent_path="root-agent/sub-agent", text="Let me search.Then summarize."),
+            ]
+            assert result["candidates"][0]["content"]["parts"] == [
+                {"text": "Let me search."},
+                {"function_call": {"name": "get_repos", "args": {}}},
+                {"text": "Then summarize."},
+            ]
+
+
+    @pytest.mark.asyncio
+    @patch('temporal.agent.llm_manager.activity')
+    async def test_call_llm_context_cache_fallback(self, mock_activity, mock_agent):
+        """Test that calls use the agent's cached content, falling back to an uncached call when it is gone."""
+        with patch('temporal.agent.llm_backend.GenerativeModel') as mock_gen_model, \
+             patch('temporal.agent.llm_manager.create_enhanced_tool') as mock_create_tool:
+            mock_tool = Mock()
+            mock_create_tool.return_value = mock_tool
+            mock_model = Mock()
+            mock_model.generate_content_async = AsyncMock(return_value=Mock(to_dict=Mock(return_value={"response": "uncached"})))
+            mock_gen_model.return_value = mock_model
+            mock_activity.in_activity.return_value = False
+
+            manager = LLMManager(root_agent=mock_agent)
+            cached_model = Mock()
+            cached_model.generate_content_async = AsyncMock(return_value=Mock(to_dict=Mock(return_value={"response": "cached"})))
+            contents = [{"role": "user", "parts": [{"text": "Hello"}]}]
+            manager.context_cache.resolve = AsyncMock(return_value=(cached_model, "key", contents))
+            manager.context_cache.invalidate = Mock()
+
+            result = await manager.call_llm(LLMCallInput(agent_name="root-agent", contents=contents))
+            assert result == {"response": "cached"}
+            # the instruction and tools come from the cached content
+            assert cached_model.generate_content_async.call_args.kwargs["tools"] is None
+            mock_model.generate_content_async.assert_not_called()
+
+            cached_model.generate_content_async.side_effect = google_exceptions.NotFound("cached content expired")
+            result = await manager.call_llm(LLMCallInput(agent_name="root-agent", contents=contents))
+            assert result == {"response": "uncached"}
+            manager.context_cache.invalidate.assert_called_once_with("key")
+            assert mock_model.generate_content_async.call_args.kwargs["tools"] == [mock_tool]
+
+
+    @pytest.mark.asyncio
+    async def test_call_llm_response_cache(self, mock_agent):
+        """Test that identical requests are served from the response cache with the same payload."""
+        response = {
+            "candidates": [{"content": {"role": "model", "parts": [{"text": "Hi there!"}]}, "finish_reason": "STOP"}],
+            "usage_metadata": {"prompt_token_count": 3, "candidates_token_count": 3, "total_token_count": 6},
+        }
+        with patch('temporal.agent.llm_backend.GenerativeModel') as mock_gen_model:
+            mock_model = Mock()
+            mock_model.generate_content_async = AsyncMock(return_value=Mock(to_dict=Mock(return_value=response)))
+            mock_gen_model.return_value = mock_model
+
+            manager = LLMManager(root_agent=mock_agent, response_cache=InMemoryResponseCache())
+            contents = [{"role": "user", "parts": [{"text": "Hello"}]}]
+            first = await manager.call_llm(LLMCallInput(agent_name="root-agent", contents=contents))
+            second = await manager.call_llm(LLMCallInput(agent_name="root-agent", contents=contents))
+            other = await manager.call_llm(LLMCallInput(agent_name="sub-agent", contents=contents))
+
+            assert first == second == other == response
+            # the sub-agent has its own instruction and tools
+            assert mock_model.generate_content_async.call_count == 2
+            assert manager.response_cache.stats()["hits"] == 1
+
+    @pytest.mark.asyncio
+    @patch('temporal.agent.llm_manager.record_llm_call')
+    @patch('temporal.agent.llm_manager.activity')
+    async def test_call_llm_model_tiers(self, mock_activity, mock_record, mock_agent):
+        """Test that calls use the model of their routing tier, in the metrics and the response cache key too."""
+        mock_agent.routing = ModelRouting(models=["gemini-2.5-flash", "gemini-2.5-pro"])
+        backend = (
+            FakeLLMBackend()
+            .add_rule(FakeReply(text="flash"), model="gemini-2.5-flash")
+            .add_rule(FakeReply(text="pro"), model="gemini-2.5-pro")
+        )
+        manager = LLMManager(root_agent=mock_agent, backend=backend, response_cache=InMemoryResponseCache())
+        contents = [{"role": "user", "parts": [{"text": "Hello"}]}]
+
+        texts = []
+        for tier in [0, 1, 2, 5]:
+            response = await manager.call_llm(LLMCallInput(agent_name="root-agent", contents=contents, model_tier=tier))
+            texts.append(GenerationResponse.from_dict(response).text)
+
+        assert texts == ["Done.", "flash", "pro", "pro"]
+        # the tier beyond the top one is served from the cache entry of the top model
+        assert manager.response_cache.stats()["hits"] == 1
+        assert [c.args[2] for c in mock_record.call_args_list] == [
+            "gemini-2.0-flash", "gemini-2.5-flash", "gemini-2.5-pro",
+        ]
+
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
\ No newline at end of file
@@ -0,0 +1,105 @@
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from temporalio.worker import ExecuteActivityInput
+
+from temporal.agent.metrics import (
+    ACTIVITY_SCHEDULE_TO_START_LATENCY,
+    LLM_CACHED_TOKENS,
+    LLM_CACHED_TOKEN_RATIO,
+    LLM_INPUT_TOKENS,
+    LLM_LATENCY,
+    LLM_OUTPUT_TOKENS,
+    TOOL_CALLS,
+    TOOL_LATENCY,
+    MetricsInterceptor,
+    record_llm_call,
+)
+
+
+def instruments(meter: MagicMock) -> dict:
+    """Map the metric names created on a mock meter to their mock instrument."""
+    created = {}
+    for factory in ("create_counter", "create_histogram_float", "create_histogram_timedelta"):
+        for call in getattr(meter, factory).call_args_list:
+            created[call.args[0]] = getattr(meter, factory).return_value
+    return created
+
+
+class TestRecordLLMCall:
+    """Test suite for the LLM call metrics."""
+
+    def test_latency_and_tokens(self):
+        """Test that the latency and each kind of tokens are recorded per agent and model."""
+        meter = MagicMock()
+        record_llm_call(
+            meter, "root-agent", "gemini-2.0-flash", "call_llm", timedelta(milliseconds=800),
+            {"prompt_token_count": 1200, "candidates_token_count": 80, "cached_content_token_count": 1000},
+        )
+
+        assert set(instruments(meter)) == {
+            LLM_LATENCY, LLM_INPUT_TOKENS, LLM_OUTPUT_TOKENS, LLM_CACHED_TOKENS, LLM_CACHED_TOKEN_RATIO,
+        }
+        attributes = {"agent": "root-agent", "model": "gemini-2.0-flash", "operation": "call_llm"}
+        meter.create_histogram_timedelta.return_value.record.assert_called_once_with(timedelta(milliseconds=800), attributes)
+        assert [call.args for call in meter.create_counter.return_value.add.call_args_list] == [
+            (1200, attributes), (80, attributes), (1000, attributes),
+        ]
+        meter.create_histogram_float.return_value.record.assert_called_once_with(1000 / 1200, attributes)
+
+    def test_missing_usage(self):
+        """Test that absent token counts are not recorded."""
+        meter = MagicMock()
+        record_llm_call(meter, "root-agent", "gemini-2.0-flash", "call_llm", timedelta(), {})
+        meter.create_counter.assert_not_called()
+        meter.create_histogram_float.assert_not_called()
+
+
+class TestMetricsInterceptor:
+    """Test suite for the activity metrics interceptor."""
+
+    def activity_info(self, activity_type: str) -> MagicMock:
+        scheduled = datetime(2025, 1, 1)
+        return MagicMock(
+            activity_type=activity_type,
+            current_attempt_scheduled_time=scheduled,
+            started_time=scheduled + timedelta(milliseconds=25),
+        )
+
+    async def execute(self, activity_type: str, next_result: dict) -> MagicMock:
+        meter = MagicMock()
+        next_inbound = MagicMock()
+        next_inbound.execute_activity = AsyncMock(**next_result)
+        inbound = MetricsInterceptor().intercept_activity(next_inbound)
+        with patch("temporal.agent.metrics.activity.info", return_value=self.activity_info(activity_type)), \
+                patch("temporal.agent.metrics.activity.metric_meter", return_value=meter):
+            try:
+                await inbound.execute_activity(ExecuteActivityInput(fn=None, args=[], executor=None, headers={}))
+            except RuntimeError:
+                pass
+        return meter
+
+    @pytest.mark.asyncio
+    async def test_tool_error(self):
+        """Test that tool latency, errors and schedule-to-start latency are recorded."""
+        meter = await self.execute("get_repos", {"side_effect": RuntimeError("rate limited")})
+
+        assert set(instruments(meter)) == {ACTIVITY_SCHEDULE_TO_START_LATENCY, TOOL_LATENCY, TOOL_CALLS}
+        meter.create_counter.return_value.add.assert_called_once_with(
+            1, {"activity_type": "get_repos", "error": True}
+        )
+
+    @pytest.mark.asyncio
+    async def test_llm_activity(self):
+        """Test that LLM activities only record their schedule-to-start latency here."""
+        meter = await self.execute("call_llm", {"return_value": {}})
+
+        assert set(instruments(meter)) == {ACTIVITY_SCHEDULE_TO_START_LATENCY}
+        meter.create_histogram_timedelta.return_value.record.assert_called_once_with(
+            timedelta(milliseconds=25), {"activity_type": "call_llm"}
+        )
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,114 @@
+import json
+import pytest
+
+from vertexai.generative_models import FunctionDeclaration, GenerationResponse, Tool
+
+from temporal.agent.response_cache import (
+    InMemoryResponseCache,
+    SQLiteResponseCache,
+    is_cacheable,
+    response_cache_key,
+)
+
+
+def response(text: str, finish_reason: str = "STOP") -> dict:
+    return GenerationResponse.from_dict({
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finish_reason": finish_reason}],
+        "usage_metadata": {"prompt_token_count": 12, "candidates_token_count": 3, "total_token_count": 15},
+    }).to_dict()
+
+
+@pytest.fixture
+def tool():
+    return Tool(function_declarations=[FunctionDeclaration(
+        name="get_repos", description="List repos", parameters={"type": "object", "properties": {}},
+    )])
+
+
+class TestResponseCacheKey:
+    """Test suite for response_cache_key."""
+
+    def test_stable(self, tool):
+        """Test that the key only depends on the request, not on dict ordering."""
+        contents = [{"role": "user", "parts": [{"text": "Hello"}]}]
+        key = response_cache_key("gemini-2.0-flash", "Be brief", tool, contents, {"temperature": 0})
+        reordered = [{"parts": [{"text": "Hello"}], "role": "user"}]
+        assert response_cache_key("gemini-2.0-flash", "Be brief", tool, reordered, {"temperature": 0}) == key
+
+    def test_request_fields(self, tool):
+        """Test that the model, instruction and contents are part of the key."""
+        contents = [{"role": "user", "parts": [{"text": "Hello"}]}]
+        keys = {
+            response_cache_key("gemini-2.0-flash", "Be brief", tool, contents, {"temperature": 0}),
+            response_cache_key("gemini-2.5-pro", "Be brief", tool, contents, {"temperature": 0}),
+            response_cache_key("gemini-2.0-flash", "Be thorough", tool, contents, {"temperature": 0}),
+            response_cache_key("gemini-2.0-flash", "Be brief", tool, contents + contents, {"temperature": 0}),
+        }
+        assert len(keys) == 4
+
+    def test_is_cacheable(self):
+        assert is_cacheable(response("Done."))
+        assert not is_cacheable(response("Do", finish_reason="MAX_TOKENS"))
+        assert not is_cacheable({"candidates": []})
+
+
+class TestInMemoryResponseCache:
+    """Test suite for the InMemoryResponseCache class."""
+
+    def test_identical_payload(self):
+        """Test that a hit returns a payload equal to the original to_dict(), and a copy of it."""
+        cache = InMemoryResponseCache()
+        original = response("Found 3 repos.")
+        cache.put("key", original)
+
+        cached = cache.get("key")
+        assert cached == original
+        cached["candidates"].clear()
+        assert cache.get("key") == original
+        assert cache.get("other") is None
+        assert cache.stats() == {"hits": 2, "misses": 1, "evictions": 0, "entries": 1, "bytes": cache.bytes}
+
+    def test_evicts_least_recently_used(self):
+        """Test that the least recently used responses are evicted beyond the size limit."""
+        size = len(json.dumps(response("a")))
+        cache = InMemoryResponseCache(max_bytes=2 * size)
+        cache.put("a", response("a"))
+        cache.put("b", response("b"))
+        cache.get("a")
+        cache.put("c", response("c"))
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None and cache.get("c") is not None
+        assert cache.evictions == 1
+
+
+class TestSQLiteResponseCache:
+    """Test suite for the SQLiteResponseCache class."""
+
+    def test_persists(self, tmp_path):
+        """Test that responses survive reopening the database."""
+        path = str(tmp_path / "responses.db")
+        cache = SQLiteResponseCache(path)
+        cache.put("key", response("Found 3 repos."))
+        cache.close()
+
+        reopened = SQLiteResponseCache(path)
+        assert reopened.get("key") == response("Found 3 repos.")
+        assert reopened.size()["entries"] == 1
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        """Test that the least recently used responses are evicted beyond the size limit."""
+        size = len(json.dumps(response("a")))
+        cache = SQLiteResponseCache(str(tmp_path / "responses.db"), max_bytes=2 * size)
+        cache.put("a", response("a"))
+        cache.put("b", response("b"))
+        cache.get("a")
+        cache.put("c", response("c"))
+
+        assert cache.get("b") is None
+        assert cache.get("a") == response("a")
+        assert cache.stats()["evictions"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
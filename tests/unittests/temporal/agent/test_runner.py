@@ -10,6 +10,9 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../.
 
 from temporal.agent.runner import Runner
 from temporal.agent.agent import Agent
+from temporal.agent.fake_llm import FakeLLMBackend
+from temporal.agent.llm_backend import VertexBackend
+from temporal.agent.timing import InMemorySpanSink, TimingInterceptor
 from temporal.agent.workflow import AgentWorkflow, AgentWorkflowInput
 
         # Use standalone functions instead of methods
@@ -30,6 +33,7 @@ class TestRunner:
         agent.name = "Test Agent"
         agent.functions = [sample_function]
         agent.sub_agents = []
+        agent.cache_ttls = {}
         return agent
 
     @pytest.fixture
@@ -39,6 +43,7 @@ class TestRunner:
         sub_agent.name = "Sub Agent"
         sub_agent.functions = [another_function]
         sub_agent.sub_agents = []
+        sub_agent.cache_ttls = {}
         return sub_agent
     
     @pytest.fixture
@@ -48,6 +53,7 @@ class TestRunner:
         sub_agent.name = "Sub Agent"
         sub_agent.functions = [another_function]
         sub_agent.sub_agents = []
+        sub_agent.cache_ttls = {}
         return sub_agent    
 
     @pytest.fixture
@@ -79,6 +85,43 @@ class TestRunner:
         assert len(activities) > 0
         assert callable(activities[0])
 
+    def test_cached_functions_to_activities(self, mock_agent):
+        """Test that cached functions are registered as caching activities under their own name."""
+        mock_agent.cache_ttls = {"sample_function": 60}
+        runner = Runner(app_name="test-app", agent=mock_agent)
+
+        activities = runner._functions_to_activities(mock_agent)
+
+        assert activities[0] is not sample_function
+        assert getattr(activities[0], "__temporal_activity_definition").name == "sample_function"
+        assert activities[0]("a") == activities[0]("a") == "Result: a"
+        assert runner.tool_cache.stats()["hits"] == {"sample_function": 1}
+
+    def test_llm_backend(self, mock_agent):
+        """Test that Vertex AI is only initialized when no other LLM backend is given."""
+        with patch('temporal.agent.llm_backend.vertexai.init') as mock_init:
+            runner = Runner(app_name="test-app", agent=mock_agent, region="europe-west1")
+            assert isinstance(runner.llm_backend, VertexBackend)
+            mock_init.assert_called_once_with(project=runner.gcp_project, location="europe-west1")
+
+            mock_init.reset_mock()
+            backend = FakeLLMBackend()
+            runner = Runner(app_name="test-app", agent=mock_agent, llm_backend=backend)
+            assert runner.llm_backend is backend
+            mock_init.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_tool_threads(self, mock_agent):
+        """Test that the tool thread pool has a thread for every concurrent activity by default."""
+        runner = Runner(app_name="test-app", agent=mock_agent, max_concurrent_activities=200)
+        runner.client = Mock()
+        with patch('temporal.agent.runner.LLMManager'), patch('temporal.agent.runner.Worker') as mock_worker:
+            await runner.worker
+
+        kwargs = mock_worker.call_args.kwargs
+        assert kwargs["max_concurrent_activities"] == 200
+        assert kwargs["activity_executor"]._max_workers == 200
+
     @pytest.mark.asyncio
     async def test_connect(self, runner):
         """Test _connect method."""
@@ -91,6 +134,19 @@ class TestRunner:
             mock_client.connect.assert_called_once_with(runner.temporal_address)
             assert runner.client == mock_client_instance
 
+    @pytest.mark.asyncio
+    async def test_connect_with_span_sink(self, mock_agent):
+        """Test that the timing interceptor is installed on the client when a span sink is set."""
+        runner = Runner(app_name="test-app", agent=mock_agent, span_sink=InMemorySpanSink())
+        with patch('temporal.agent.runner.Client') as mock_client:
+            mock_client.connect = AsyncMock(return_value=AsyncMock())
+
+            await runner._connect()
+
+            interceptors = mock_client.connect.call_args.kwargs["interceptors"]
+            assert isinstance(interceptors[0], TimingInterceptor)
+            assert interceptors[0].sink is runner.span_sink
+
     @pytest.mark.asyncio
     async def test_thoughts(self, runner):
         """Test thoughts method."""
@@ -0,0 +1,154 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from temporal.agent.agent import Agent
+from temporal.agent.session import Session
+from temporal.agent.session_pool import SessionPool
+from temporal.agent.workflow import AgentWorkflow, ModelChoice, PartialTextSnapshot, RoutingReason, TokenUsage
+
+
+class TestSession:
+    """Test suite for the Session class."""
+
+    @pytest.fixture
+    def mock_handle(self):
+        return AsyncMock()
+
+    @pytest.fixture
+    def session(self, mock_handle):
+        """Create a Session with a mock client."""
+        mock_client = MagicMock()
+        mock_client.get_workflow_handle = MagicMock(return_value=mock_handle)
+        return Session(agent=Agent(name="Test Agent"), client=mock_client, session_id="abc")
+
+    @pytest.mark.asyncio
+    async def test_stream_thoughts(self, session, mock_handle):
+        """Test that thoughts are long-polled and the watermark advances."""
+        mock_handle.execute_update = AsyncMock(side_effect=[["Thought 1"], [], ["Thought 2", "Thought 3"]])
+
+        thoughts = []
+        with patch('temporal.agent.session.asyncio.sleep', new=AsyncMock()) as mock_sleep:
+            async for thought in session.stream_thoughts(watermark=4, timeout=30):
+                thoughts.append(thought)
+                if len(thoughts) == 3:
+                    break
+
+        assert thoughts == ["Thought 1", "Thought 2", "Thought 3"]
+        assert [c.kwargs["args"] for c in mock_handle.execute_update.call_args_list] == [[4, 30], [5, 30], [5, 30]]
+        mock_handle.execute_update.assert_called_with(AgentWorkflow.wait_for_thoughts, args=[5, 30])
+        # only the empty long poll backs off
+        mock_sleep.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_stream_partial_text(self, session, mock_handle):
+        """Test that partial text is long-polled by version, backing off when unchanged."""
+        mock_handle.execute_update = AsyncMock(side_effect=[
+            PartialTextSnapshot(version=2, texts={"test-agent": "Found"}),
+            PartialTextSnapshot(version=2, texts={"test-agent": "Found"}),
+            PartialTextSnapshot(version=3, texts={"test-agent": "Found 3 repos"}),
+        ])
+
+        texts = []
+        with patch('temporal.agent.session.asyncio.sleep', new=AsyncMock()) as mock_sleep:
+            async for partial in session.stream_partial_text(timeout=30):
+                texts.append(partial)
+                if len(texts) == 2:
+                    break
+
+        assert texts == [{"test-agent": "Found"}, {"test-agent": "Found 3 repos"}]
+        assert [c.kwargs["args"] for c in mock_handle.execute_update.call_args_list] == [[-1, 30], [2, 30], [2, 30]]
+        mock_handle.execute_update.assert_called_with(AgentWorkflow.wait_for_partial_text, args=[2, 30])
+        mock_sleep.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_usage(self, session, mock_handle):
+        """Test that the session's token usage is queried from the workflow."""
+        usage = {"test-agent": TokenUsage(llm_calls=2, prompt_tokens=300, candidate_tokens=40, total_tokens=340)}
+        mock_handle.query = AsyncMock(return_value=usage)
+
+        assert await session.usage() == usage
+        mock_handle.query.assert_called_once_with(AgentWorkflow.get_usage)
+
+    @pytest.mark.asyncio
+    async def test_model_routing(self, session, mock_handle):
+        """Test that escalations are signaled to the workflow and the model choices queried from it."""
+        choices = [ModelChoice(turn=1, agent_path="test-agent", model="gemini-2.5-pro", reason=RoutingReason.REQUESTED)]
+        mock_handle.query = AsyncMock(return_value=choices)
+
+        await session.escalate()
+        mock_handle.signal.assert_called_once_with(AgentWorkflow.escalate, None)
+        assert await session.model_choices() == choices
+        mock_handle.query.assert_called_once_with(AgentWorkflow.get_model_choices)
+
+
+
+class TestSessionPool:
+    """Test suite for the SessionPool class."""
+
+    @pytest.fixture
+    def pool(self):
+        """Create a pool whose sessions don't reach a Temporal server."""
+        pool = SessionPool(agent=Agent(name="Test Agent"), client=MagicMock(), size=2, ttl=60)
+        pool._warm_session = AsyncMock(side_effect=lambda: MagicMock(spec=Session, workflow_id="session"))
+        return pool
+
+    @pytest.mark.asyncio
+    async def test_acquire_from_warm_pool(self, pool):
+        """Test that warm sessions are handed out and the pool is refilled."""
+        await pool._fill()
+        assert len(pool.idle) == 2
+        warm = [session for _, session in pool.idle]
+
+        session = await pool.acquire()
+        assert session is warm[0]
+        assert pool._refill_needed.is_set()
+
+        await pool._fill()
+        assert len(pool.idle) == 2
+        assert pool._warm_session.call_count == 3
+
+    @pytest.mark.asyncio
+    async def test_acquire_from_empty_pool(self, pool):
+        """Test that a session is started on demand when no warm session is left."""
+        session = await pool.acquire()
+        assert session is not None
+        pool._warm_session.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_expired_sessions_are_stopped(self, pool):
+        """Test that idle sessions past the TTL are stopped instead of handed out."""
+        await pool._fill()
+        expired = [session for _, session in pool.idle]
+        pool.idle = type(pool.idle)((warmed_at - 120, session) for warmed_at, session in pool.idle)
+
+        session = await pool.acquire()
+
+        assert session not in expired
+        for expired_session in expired:
+            expired_session.stop.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_close_during_refill(self):
+        """Test that sessions still warming up when the pool closes are stopped rather than leaked."""
+        blocked = asyncio.Event() # never set, the second session stays warming
+        sessions = [MagicMock(spec=Session, workflow_id=f"session-{i}", started=False) for i in range(2)]
+        for session, thoughts in zip(sessions, [AsyncMock(), AsyncMock(side_effect=blocked.wait)]):
+            session.start = AsyncMock()
+            session.thoughts = thoughts
+            session.stop = AsyncMock()
+
+        pool = SessionPool(agent=Agent(name="Test Agent"), client=MagicMock(), size=2, ttl=60)
+        with patch('temporal.agent.session_pool.Session', side_effect=sessions):
+            pool.refill_task = asyncio.create_task(pool._fill())
+            while sessions[1].thoughts.await_count == 0:
+                await asyncio.sleep(0)
+            await pool.close()
+
+        assert not pool.idle and not pool.starting
+        for session in sessions:
+            session.stop.assert_awaited_once()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
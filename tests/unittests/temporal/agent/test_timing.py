@@ -0,0 +1,99 @@
+import json
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from temporalio import client
+from temporalio.converter import DataConverter
+from temporalio.worker import ExecuteActivityInput
+
+from temporal.agent.timing import (
+    FileSpanSink,
+    InMemorySpanSink,
+    Span,
+    TimingInterceptor,
+    TURN_HEADER,
+)
+
+
+class TestSpanSinks:
+    """Test suite for the span sinks."""
+
+    def test_turn_breakdown(self):
+        """Test that the in-memory sink totals the time of each phase of a turn."""
+        sink = InMemorySpanSink()
+        sink.emit(Span(phase="llm", name="call_llm", duration_ms=100, workflow_id="wf", turn=1))
+        sink.emit(Span(phase="llm", name="call_llm", duration_ms=50, workflow_id="wf", turn=1))
+        sink.emit(Span(phase="tool", name="get_repos", duration_ms=20, workflow_id="wf", turn=1))
+        sink.emit(Span(phase="llm", name="call_llm", duration_ms=70, workflow_id="wf", turn=2))
+
+        assert sink.turn_breakdown(1) == {"llm": 150, "tool": 20}
+
+    def test_file_sink(self, tmp_path):
+        """Test that the file sink appends one JSON line per span."""
+        path = tmp_path / "spans.jsonl"
+        sink = FileSpanSink(str(path))
+        sink.emit(Span(phase="serialization", name="call_llm", duration_ms=1.5, workflow_id="wf", turn=3))
+        sink.emit(Span(phase="prompt", name="prompt", duration_ms=900, workflow_id="wf"))
+        sink.flush()
+
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [line["phase"] for line in lines] == ["serialization", "prompt"]
+        assert lines[0]["turn"] == 3
+
+        sink.emit(Span(phase="llm", name="call_llm", duration_ms=70, workflow_id="wf"))
+        sink.close()
+        assert len(path.read_text().splitlines()) == 3
+
+
+class TestTimingInterceptor:
+    """Test suite for the client and activity interceptors."""
+
+    @pytest.mark.asyncio
+    async def test_prompt_span(self):
+        """Test that prompt updates sent by the client are timed."""
+        sink = InMemorySpanSink()
+        next_outbound = MagicMock()
+        next_outbound.start_workflow_update = AsyncMock(return_value="handle")
+        outbound = TimingInterceptor(sink).intercept_client(next_outbound)
+
+        update_input = MagicMock(spec=client.StartWorkflowUpdateInput, id="wf", run_id=None, update="prompt")
+        assert await outbound.start_workflow_update(update_input) == "handle"
+        other_input = MagicMock(spec=client.StartWorkflowUpdateInput, id="wf", run_id=None, update="wait_for_thoughts")
+        await outbound.start_workflow_update(other_input)
+
+        assert [(s.phase, s.workflow_id) for s in sink.spans] == [("prompt", "wf")]
+
+    @pytest.mark.asyncio
+    async def test_activity_span(self):
+        """Test that activity executions are timed with the turn from the headers."""
+        sink = InMemorySpanSink()
+        next_inbound = MagicMock()
+        next_inbound.execute_activity = AsyncMock(side_effect=RuntimeError("rate limited"))
+        inbound = TimingInterceptor(sink).intercept_activity(next_inbound)
+
+        scheduled = datetime(2025, 1, 1)
+        info = MagicMock(
+            activity_type="get_repos",
+            attempt=2,
+            workflow_id="wf",
+            workflow_run_id="run",
+            current_attempt_scheduled_time=scheduled,
+            started_time=scheduled + timedelta(milliseconds=40),
+        )
+        converter = DataConverter.default.payload_converter
+        activity_input = ExecuteActivityInput(
+            fn=None, args=[], executor=None, headers={TURN_HEADER: converter.to_payload(4)},
+        )
+        with patch("temporal.agent.timing.activity.info", return_value=info), \
+                patch("temporal.agent.timing.activity.payload_converter", return_value=converter):
+            with pytest.raises(RuntimeError):
+                await inbound.execute_activity(activity_input)
+
+        span = sink.spans[0]
+        assert (span.phase, span.name, span.turn) == ("activity_execution", "get_repos", 4)
+        assert span.attributes == {"attempt": 2, "kind": "tool", "schedule_to_start_ms": 40, "error": "RuntimeError"}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
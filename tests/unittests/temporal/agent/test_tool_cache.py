@@ -0,0 +1,140 @@
+import pytest
+from unittest.mock import MagicMock, Mock, patch
+
+from pydantic import BaseModel
+
+from temporal.agent.metrics import TOOL_CACHE_LOOKUPS
+from temporal.agent.tool_cache import ToolResultCache, cache_key, cached_activity
+
+
+class SearchSchema(BaseModel):
+    query: str
+    language: str = None
+
+
+class TestCacheKey:
+    """Test suite for the canonical cache keys."""
+
+    def test_equivalent_arguments(self):
+        """Test that arguments with the same canonical JSON give the same key."""
+        assert cache_key("search", ({"b": 1, "a": "x"},), {}) == cache_key("search", ({"a": "x", "b": 1},), {})
+        assert cache_key("search", (SearchSchema(query="temporal"),), {}) == \
+            cache_key("search", ({"query": "temporal", "language": None},), {})
+
+    def test_different_arguments(self):
+        """Test that different functions or arguments give different keys."""
+        assert cache_key("search", ("a",), {}) != cache_key("search", ("b",), {})
+        assert cache_key("search", ("a",), {}) != cache_key("get_repos", ("a",), {})
+
+    def test_exact_values(self):
+        """Test that whitespace and None fields are part of the key."""
+        assert cache_key("search", ("temporal",), {}) != cache_key("search", (" temporal",), {})
+        assert cache_key("search", ({"query": "temporal"},), {}) != \
+            cache_key("search", ({"query": "temporal", "language": None},), {})
+
+
+class TestToolResultCache:
+    """Test suite for the ToolResultCache class."""
+
+    def test_hit_and_miss(self):
+        """Test that stored results are served and counted per function."""
+        cache = ToolResultCache()
+        assert cache.get("search", "key") == (False, None)
+        cache.put("key", "result", ttl=60)
+        assert cache.get("search", "key") == (True, "result")
+
+        stats = cache.stats()
+        assert stats["hits"] == {"search": 1}
+        assert stats["misses"] == {"search": 1}
+        assert stats["entries"] == 1
+
+    def test_expiry(self):
+        """Test that results are no longer served after their TTL."""
+        cache = ToolResultCache()
+        with patch("temporal.agent.tool_cache.time.monotonic", return_value=100):
+            cache.put("key", "result", ttl=60)
+        with patch("temporal.agent.tool_cache.time.monotonic", return_value=161):
+            assert cache.get("search", "key") == (False, None)
+        assert cache.stats()["entries"] == 0
+
+    def test_lru_eviction(self):
+        """Test that the least recently used results are evicted beyond the bounds."""
+        cache = ToolResultCache(max_entries=2, max_bytes=10)
+        cache.put("a", "aaaa", ttl=60)
+        cache.put("b", "bbbb", ttl=60)
+        cache.get("search", "a")
+        cache.put("c", "cccc", ttl=60)
+
+        assert cache.get("search", "b") == (False, None)
+        assert cache.get("search", "a") == (True, "aaaa")
+        assert cache.stats()["evictions"] == 1
+
+        cache.put("d", "d" * 20, ttl=60) # over max_bytes, never cached
+        assert cache.get("search", "d") == (False, None)
+
+
+class TestCachedActivity:
+    """Test suite for the caching activity wrapper."""
+
+    def test_sync_function(self):
+        """Test that a function runs once per distinct arguments."""
+        calls = Mock(return_value="[]")
+
+        def get_repos(org: str) -> str:
+            return calls(org)
+
+        cached = cached_activity(get_repos, ToolResultCache(), ttl=60)
+        assert getattr(cached, "__temporal_activity_definition").name == "get_repos"
+        assert cached("temporalio") == cached("temporalio") == "[]"
+        cached("other")
+        assert calls.call_count == 2
+
+    def test_errors_not_cached(self):
+        """Test that failed calls run again."""
+        calls = Mock(side_effect=[RuntimeError("rate limited"), "[]"])
+
+        def get_repos(org: str) -> str:
+            return calls(org)
+
+        cached = cached_activity(get_repos, ToolResultCache(), ttl=60)
+        with pytest.raises(RuntimeError):
+            cached("temporalio")
+        assert cached("temporalio") == "[]"
+
+    @pytest.mark.asyncio
+    async def test_async_function(self):
+        """Test that coroutine functions are cached as coroutine activities."""
+        calls = Mock(return_value="[]")
+
+        async def search(search: SearchSchema) -> str:
+            return calls(search)
+
+        cached = cached_activity(search, ToolResultCache(), ttl=60)
+        assert await cached(SearchSchema(query="workflow")) == "[]"
+        assert await cached(SearchSchema(query="workflow")) == "[]"
+        assert calls.call_count == 1
+        await cached(SearchSchema(query="workflow "))
+        assert calls.call_count == 2
+
+    def test_lookup_metrics(self):
+        """Test that activities count their cache hits and misses."""
+        meter = MagicMock()
+
+        def get_repos(org: str) -> str:
+            return "[]"
+
+        cached = cached_activity(get_repos, ToolResultCache(), ttl=60)
+        with patch("temporal.agent.tool_cache.activity.in_activity", return_value=True), \
+                patch("temporal.agent.tool_cache.activity.metric_meter", return_value=meter):
+            cached("temporalio")
+            cached("temporalio")
+
+        meter.create_counter.assert_called_with(TOOL_CACHE_LOOKUPS, "Tool result cache lookups, by hit")
+        assert [call.args for call in meter.create_counter.return_value.add.call_args_list] == [
+            (1, {"activity_type": "get_repos", "hit": False}),
+            (1, {"activity_type": "get_repos", "hit": True}),
+        ]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,806 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from temporalio import workflow
+from temporalio.converter import DataConverter
+from temporalio.exceptions import ApplicationError
+from temporalio.testing import WorkflowEnvironment
+from temporalio.worker import Worker
+from temporalio.worker.workflow_sandbox import SandboxedWorkflowRunner
+from vertexai.generative_models import Content, GenerationResponse, Part
+
+from temporal.agent.agent import Agent, ActivityOptions, ContextPolicy, ModelRouting
+from temporal.agent.fake_llm import FakeLLMBackend, FakeReply
+from temporal.agent.llm_manager import LLMManager, SummarizeOutput
+from temporal.agent.session import Session
+from temporal.agent.workflow import (
+    AgentWorkflow,
+    AgentWorkflowInput,
+    AgentConfig,
+    MAX_CARRIED_MODEL_CHOICES,
+    ModelChoice,
+    ModelContentBatch,
+    PROMPT_QUEUE_FULL,
+    PartialText,
+    RoutingReason,
+    SESSION_ENDING,
+    TaggedModelContent,
+    TokenUsage,
+    compact_contents,
+)
+
+
+def user_prompt(text: str) -> dict:
+    return {"role": "user", "parts": [{"text": text}]}
+
+
+def model_text(text: str) -> dict:
+    return {"role": "model", "parts": [{"text": text}]}
+
+
+def function_call(name: str) -> dict:
+    return {"role": "model", "parts": [{"function_call": {"name": name, "args": {}}}]}
+
+
+def function_response(name: str) -> dict:
+    return {"role": "user", "parts": [{"function_response": {"name": name, "response": {"content": "ok"}}}]}
+
+
+class TestCompactContents:
+    """Test suite for compact_contents."""
+
+    @pytest.fixture
+    def contents(self):
+        """Conversation with three user turns, the second one calling a function."""
+        return [
+            user_prompt("first"),
+            model_text("first answer"),
+            user_prompt("second"),
+            function_call("get_order_status"),
+            function_response("get_order_status"),
+            model_text("second answer"),
+            user_prompt("third"),
+            model_text("third answer"),
+        ]
+
+    def test_keeps_last_turns(self, contents):
+        """Test that compaction starts at a user prompt, keeping function pairs intact."""
+        assert compact_contents(contents, keep_turns=2) == contents[2:]
+        assert compact_contents(contents, keep_turns=1) == contents[6:]
+
+    def test_keeps_everything_below_limit(self, contents):
+        """Test that short conversations are carried over as is."""
+        assert compact_contents(contents, keep_turns=20) == contents
+
+    def test_keep_no_turns(self, contents):
+        """Test that compaction can drop the whole conversation."""
+        assert compact_contents(contents, keep_turns=0) == []
+
+
+
+class TestSubAgentContents:
+    """Test suite for the context passed to sub-agent child workflows."""
+
+    @pytest.fixture
+    def contents(self):
+        """Conversation ending with a call to a sub-agent."""
+        return [
+            user_prompt("first"),
+            model_text("first answer"),
+            user_prompt("second"),
+            function_call("search-agent"),
+        ]
+
+    def agent_workflow(self, contents, config: AgentConfig) -> AgentWorkflow:
+        agent_workflow = AgentWorkflow()
+        agent_workflow.agent_name = "root-agent"
+        agent_workflow._set_contents([Content.from_dict(c) for c in contents])
+        agent_workflow.agent_configs = {"search-agent": config}
+        return agent_workflow
+
+    @pytest.mark.asyncio
+    async def test_full_context(self, contents):
+        """Test that the full policy passes the whole conversation."""
+        agent_workflow = self.agent_workflow(contents, AgentConfig())
+        result = await agent_workflow._sub_agent_contents("search-agent")
+        assert len(result) == len(contents)
+
+    @pytest.mark.asyncio
+    async def test_no_context(self, contents):
+        """Test that the none policy passes nothing."""
+        agent_workflow = self.agent_workflow(contents, AgentConfig(context_policy=ContextPolicy.NONE))
+        assert await agent_workflow._sub_agent_contents("search-agent") == []
+
+    @pytest.mark.asyncio
+    async def test_last_n_context(self, contents):
+        """Test that the last_n policy passes the last user turns only."""
+        agent_workflow = self.agent_workflow(
+            contents, AgentConfig(context_policy=ContextPolicy.LAST_N, context_turns=1)
+        )
+        result = await agent_workflow._sub_agent_contents("search-agent")
+        assert [c["role"] for c in result] == ["user", "model"]
+        assert result[0]["parts"][0]["text"] == "second"
+
+    @pytest.mark.asyncio
+    async def test_user_only_context(self, contents):
+        """Test that the user_only policy merges the user prompts in one content."""
+        agent_workflow = self.agent_workflow(contents, AgentConfig(context_policy=ContextPolicy.USER_ONLY))
+        result = await agent_workflow._sub_agent_contents("search-agent")
+        assert result == [{"role": "user", "parts": [{"text": "first"}, {"text": "second"}]}]
+
+    @pytest.mark.asyncio
+    async def test_summary_context_shared(self, contents):
+        """Test that sub-agents called in the same response share one summary activity."""
+        agent_workflow = self.agent_workflow(contents, AgentConfig(context_policy=ContextPolicy.SUMMARY))
+        agent_workflow.agent_configs["other-agent"] = AgentConfig(context_policy=ContextPolicy.SUMMARY)
+
+        async def summarize(*args, **kwargs):
+            await asyncio.sleep(0.01)
+            return SummarizeOutput(
+                text="The user asked twice.",
+                usage_metadata={"prompt_token_count": 40, "candidates_token_count": 8, "total_token_count": 48},
+            )
+
+        with patch("temporal.agent.workflow.workflow.execute_activity", side_effect=summarize) as mock_execute:
+            results = await asyncio.gather(
+                agent_workflow._sub_agent_contents("search-agent"),
+                agent_workflow._sub_agent_contents("other-agent"),
+            )
+            assert results[0] == results[1]
+            assert "The user asked twice." in results[0][0]["parts"][0]["text"]
+            mock_execute.assert_called_once()
+        # the shared summary is accounted once
+        assert agent_workflow.usage == {
+            "root-agent": TokenUsage(llm_calls=1, prompt_tokens=40, candidate_tokens=8, total_tokens=48),
+        }
+
+    @pytest.mark.asyncio
+    async def test_failed_summary_retried(self, contents):
+        """Test that a failed summary is not reused by later calls."""
+        agent_workflow = self.agent_workflow(contents, AgentConfig(context_policy=ContextPolicy.SUMMARY))
+        with patch(
+            "temporal.agent.workflow.workflow.execute_activity",
+            side_effect=[RuntimeError("unavailable"), SummarizeOutput(text="The user asked twice.")],
+        ) as mock_execute:
+            with pytest.raises(RuntimeError):
+                await agent_workflow._sub_agent_contents("search-agent")
+            await agent_workflow._sub_agent_contents("search-agent")
+            assert mock_execute.call_count == 2
+
+    @pytest.mark.asyncio
+    @patch("temporal.agent.workflow.workflow.logger")
+    async def test_empty_summary_context(self, mock_logger, contents):
+        """Test that the full contents are passed when the model returned no summary."""
+        agent_workflow = self.agent_workflow(contents, AgentConfig(context_policy=ContextPolicy.SUMMARY))
+        with patch("temporal.agent.workflow.workflow.execute_activity", return_value=SummarizeOutput(text="")):
+            assert await agent_workflow._sub_agent_contents("search-agent") == contents
+
+
+class TestFunctionCalls:
+    """Test suite for the concurrent dispatch of function calls."""
+
+    @pytest.fixture
+    def agent_workflow(self):
+        agent_workflow = AgentWorkflow()
+        agent_workflow.sub_agents = {}
+        agent_workflow.config = AgentConfig(max_concurrent_calls=2)
+        return agent_workflow
+
+    def candidate(self, names):
+        return GenerationResponse.from_dict({"candidates": [{"content": {
+            "role": "model",
+            "parts": [{"function_call": {"name": name, "args": {}}} for name in names],
+        }}]}).candidates[0]
+
+    @pytest.mark.asyncio
+    @patch("temporal.agent.workflow.workflow.logger")
+    async def test_responses_keep_call_order(self, mock_logger, agent_workflow):
+        """Test that responses follow the order of the calls, not the order they finish in."""
+        delays = {"slow": 0.03, "medium": 0.02, "fast": 0.0}
+        finished = []
+
+        async def invoke(func):
+            await asyncio.sleep(delays[func.name])
+            finished.append(func.name)
+            return Part.from_function_response(name=func.name, response={"content": func.name})
+
+        with patch.object(agent_workflow, "_invoke_as_activity", side_effect=invoke):
+            await agent_workflow._handle_function_calls(self.candidate(["slow", "medium", "fast"]))
+
+        assert finished == ["medium", "fast", "slow"] # fast waits for medium's slot
+        parts = agent_workflow.dict_contents[-1]["parts"]
+        assert [part["function_response"]["name"] for part in parts] == ["slow", "medium", "fast"]
+
+    @pytest.mark.asyncio
+    @patch("temporal.agent.workflow.workflow.logger")
+    async def test_max_concurrent_calls(self, mock_logger, agent_workflow):
+        """Test that no more than max_concurrent_calls calls are in flight at once."""
+        in_flight, peak = 0, 0
+
+        async def invoke(func):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return Part.from_function_response(name=func.name, response={"content": "ok"})
+
+        with patch.object(agent_workflow, "_invoke_as_activity", side_effect=invoke):
+            await agent_workflow._handle_function_calls(self.candidate([f"tool_{i}" for i in range(5)]))
+
+        assert peak == 2
+        assert len(agent_workflow.dict_contents[-1]["parts"]) == 5
+
+
+
+class TestModelContents:
+    """Test suite for model contents propagated to the root workflow."""
+
+    @pytest.mark.asyncio
+    async def test_tagged_model_contents(self):
+        """Test that batches from sub-agents are interleaved with the root's own contents."""
+        agent_workflow = AgentWorkflow()
+        agent_workflow.agent_name = "root-agent"
+        agent_workflow.model_contents["root-agent"] = []
+        agent_workflow.model_contents_offset = 2
+
+        agent_workflow._append_model_contents("root-agent", ["Let me search."])
+        await agent_workflow.add_model_contents(
+            ModelContentBatch(agent_path="root-agent/search-agent/thread-agent", messages=["Found it.", "Done."])
+        )
+
+        assert await agent_workflow.get_model_content(2) == ["Let me search.", "Found it.", "Done."]
+        assert await agent_workflow.get_tagged_model_content(3) == [
+            TaggedModelContent(agent_path="root-agent/search-agent/thread-agent", text="Found it."),
+            TaggedModelContent(agent_path="root-agent/search-agent/thread-agent", text="Done."),
+        ]
+
+
+
+class TestTokenBudget:
+    """Test suite for the token-budgeted conversation window."""
+
+    @pytest.fixture
+    def agent_workflow(self):
+        """Workflow whose last LLM call went over its token budget."""
+        agent_workflow = AgentWorkflow()
+        agent_workflow.config = AgentConfig(token_budget=100, window_keep_turns=1)
+        agent_workflow.last_token_count = 200
+        agent_workflow._set_contents([Content.from_dict(c) for c in [
+            user_prompt("first"),
+            function_call("get_order_status"),
+            function_response("get_order_status"),
+            model_text("first answer"),
+            user_prompt("second"),
+        ]])
+        agent_workflow._summarize = AsyncMock(return_value="The user asked for an order status.")
+        return agent_workflow
+
+    @pytest.mark.asyncio
+    @patch('temporal.agent.workflow.workflow.logger')
+    async def test_summarizes_older_turns(self, mock_logger, agent_workflow):
+        """Test that older turns are replaced by a summary, keeping function pairs together."""
+        await agent_workflow._enforce_token_budget()
+
+        summarized = agent_workflow._summarize.call_args[0][0]
+        assert [c["role"] for c in summarized] == ["user", "model", "user", "model"]
+        contents = [c.to_dict() for c in agent_workflow.contents]
+        assert contents[0]["parts"][0]["text"].endswith("The user asked for an order status.")
+        assert contents[1] == user_prompt("second")
+        assert agent_workflow.dict_contents == contents
+        assert agent_workflow.last_token_count == 0
+
+    @pytest.mark.asyncio
+    async def test_within_budget(self, agent_workflow):
+        """Test that conversations within the budget are left untouched."""
+        agent_workflow.last_token_count = 50
+        await agent_workflow._enforce_token_budget()
+
+        agent_workflow._summarize.assert_not_called()
+        assert len(agent_workflow.contents) == 5
+
+    @pytest.mark.asyncio
+    @patch('temporal.agent.workflow.workflow.logger')
+    async def test_summarizes_tool_loop(self, mock_logger):
+        """Test that a single prompt followed by a long tool loop has its older exchanges summarized."""
+        agent_workflow = AgentWorkflow()
+        agent_workflow.config = AgentConfig(token_budget=100, window_keep_turns=1)
+        agent_workflow._summarize = AsyncMock(return_value="Searched twice.")
+        agent_workflow._set_contents([Content.from_dict(c) for c in [
+            user_prompt("find it"),
+            function_call("search"), function_response("search"),
+            function_call("search"), function_response("search"),
+            function_call("get_thread"), function_response("get_thread"),
+        ]])
+
+        agent_workflow.last_token_count = 200
+        await agent_workflow._enforce_token_budget()
+        assert [c["role"] for c in agent_workflow._summarize.call_args[0][0]] == ["model", "user", "model", "user"]
+        assert agent_workflow.dict_contents[0] == user_prompt("find it")
+        assert agent_workflow.dict_contents[1]["parts"][0]["text"].endswith("Searched twice.")
+        assert agent_workflow.dict_contents[2:] == [function_call("get_thread"), function_response("get_thread")]
+
+        # the next pass summarizes the earlier summary again, rather than counting it as a turn
+        for content in [function_call("reply"), function_response("reply")]:
+            agent_workflow._append_content(Content.from_dict(content))
+        agent_workflow.last_token_count = 200
+        await agent_workflow._enforce_token_budget()
+        summarized = agent_workflow._summarize.call_args[0][0]
+        assert summarized[0]["parts"][0]["text"].endswith("Searched twice.")
+        assert summarized[1:] == [function_call("get_thread"), function_response("get_thread")]
+        assert agent_workflow.dict_contents[0] == user_prompt("find it")
+        assert agent_workflow.dict_contents[2:] == [function_call("reply"), function_response("reply")]
+
+
+
+class TestSerializedContents:
+    """Test suite for the serialized contents cache."""
+
+    @pytest.mark.asyncio
+    async def test_contents_serialized_once(self):
+        """Test that appended contents are serialized once and kept in sync."""
+        agent_workflow = AgentWorkflow()
+        agent_workflow._set_contents([], [])
+
+        agent_workflow._append_content(Content.from_dict(user_prompt("first")))
+        agent_workflow._append_content(Content.from_dict(model_text("first answer")))
+
+        with patch.object(Content, "to_dict", side_effect=AssertionError("serialized again")):
+            assert agent_workflow.dict_contents == [user_prompt("first"), model_text("first answer")]
+            assert await agent_workflow._sub_agent_contents("search-agent") == agent_workflow.dict_contents
+
+
+
+class TestPromptQueue:
+    """Test suite for the queued prompts of a root session."""
+
+    @pytest.fixture
+    def agent_workflow(self):
+        agent_workflow = AgentWorkflow()
+        agent_workflow.agent_name = "root-agent"
+        agent_workflow.model_contents["root-agent"] = ["earlier thought"]
+        agent_workflow.config = AgentConfig(max_queued_prompts=2)
+        return agent_workflow
+
+    @pytest.mark.asyncio
+    async def test_start_turn(self, agent_workflow):
+        """Test that a turn starts with its prompt and resolves its own future."""
+        respond = asyncio.Future()
+        agent_workflow._start_turn("first", respond)
+
+        assert agent_workflow.dict_contents == [user_prompt("first")]
+        assert agent_workflow.pending_respond is respond
+        assert agent_workflow.turn_model_contents_at == 1
+        assert not agent_workflow.terminate
+
+    @pytest.mark.asyncio
+    async def test_end_prompt_terminates(self, agent_workflow):
+        """Test that the END prompt terminates the session once its turn starts."""
+        agent_workflow._start_turn("END", asyncio.Future())
+        assert agent_workflow.terminate
+
+    @pytest.mark.asyncio
+    async def test_validator_rejects_full_queue(self, agent_workflow):
+        """Test that prompts are rejected past the configured queue depth."""
+        agent_workflow.validate_prompt("first")
+        agent_workflow.prompt_queue.append(("first", asyncio.Future()))
+        agent_workflow.validate_prompt("second")
+        agent_workflow.prompt_queue.append(("second", asyncio.Future()))
+
+        with pytest.raises(ApplicationError) as exc_info:
+            agent_workflow.validate_prompt("third")
+        assert exc_info.value.type == PROMPT_QUEUE_FULL
+
+    def test_validator_rejects_after_end(self, agent_workflow):
+        """Test that prompts are rejected once the session is ending."""
+        agent_workflow.terminate = True
+        with pytest.raises(ApplicationError) as exc_info:
+            agent_workflow.validate_prompt("first")
+        assert exc_info.value.type == SESSION_ENDING
+
+
+class TestTokenUsage:
+    """Test suite for the token usage accounting."""
+
+    @pytest.fixture
+    def agent_workflow(self):
+        agent_workflow = AgentWorkflow()
+        agent_workflow.agent_name = "root-agent"
+        return agent_workflow
+
+    def usage_metadata(self, prompt: int, candidates: int, cached: int = 0) -> dict:
+        return GenerationResponse.from_dict({
+            "candidates": [],
+            "usage_metadata": {
+                "prompt_token_count": prompt,
+                "candidates_token_count": candidates,
+                "cached_content_token_count": cached,
+                "total_token_count": prompt + candidates,
+            },
+        }).to_dict()["usage_metadata"]
+
+    @pytest.mark.asyncio
+    async def test_usage_rollup(self, agent_workflow):
+        """Test that the agent's LLM calls and the usage reported by sub-agents add up."""
+        agent_workflow._record_usage(self.usage_metadata(100, 10))
+        agent_workflow._record_usage(self.usage_metadata(200, 20, cached=100))
+        await agent_workflow.add_usage({
+            "search-agent": TokenUsage(llm_calls=1, prompt_tokens=50, candidate_tokens=5, total_tokens=55),
+            "root-agent": TokenUsage(llm_calls=1, prompt_tokens=1, candidate_tokens=1, total_tokens=2),
+        })
+
+        assert await agent_workflow.get_usage() == {
+            "root-agent": TokenUsage(llm_calls=3, prompt_tokens=301, candidate_tokens=31, cached_tokens=100, total_tokens=332),
+            "search-agent": TokenUsage(llm_calls=1, prompt_tokens=50, candidate_tokens=5, total_tokens=55),
+        }
+
+    @pytest.mark.asyncio
+    async def test_failed_sub_agent_reports_usage(self):
+        """Test that a failing sub-agent still reports the tokens it used to its parent."""
+        agent_workflow = AgentWorkflow()
+        agent_workflow._call_llm = AsyncMock(side_effect=RuntimeError("unavailable"))
+        agent_workflow._report_usage = AsyncMock()
+
+        with pytest.raises(RuntimeError):
+            await agent_workflow.run(AgentWorkflowInput(
+                agent_name="search-agent", prompt="find repos", root_workflow_id="root",
+            ))
+        agent_workflow._report_usage.assert_awaited_once()
+
+    def test_cached_ratio(self):
+        """Test the share of prompt tokens served from a context cache."""
+        assert TokenUsage(prompt_tokens=4000, cached_tokens=3000).cached_ratio == 0.75
+        assert TokenUsage().cached_ratio == 0.0
+
+    @patch("temporal.agent.workflow.workflow.upsert_search_attributes")
+    def test_search_attributes(self, mock_upsert, agent_workflow):
+        """Test that the session's total usage is set as search attributes when enabled."""
+        agent_workflow.usage = {
+            "root-agent": TokenUsage(llm_calls=1, prompt_tokens=100, candidate_tokens=10, total_tokens=110),
+            "search-agent": TokenUsage(llm_calls=1, prompt_tokens=50, candidate_tokens=5, total_tokens=55),
+        }
+        agent_workflow._upsert_usage_search_attributes()
+        mock_upsert.assert_not_called()
+
+        agent_workflow.config = AgentConfig(usage_search_attributes=True)
+        agent_workflow._upsert_usage_search_attributes()
+        updates = {update.key.name: update.value for update in mock_upsert.call_args.args[0]}
+        assert updates == {
+            "AgentPromptTokens": 150,
+            "AgentCandidateTokens": 15,
+            "AgentCachedTokens": 0,
+            "AgentTotalTokens": 165,
+        }
+
+
+class TestPartialText:
+    """Test suite for the partial text streamed to the session."""
+
+    @pytest.fixture
+    def agent_workflow(self):
+        agent_workflow = AgentWorkflow()
+        agent_workflow.agent_name = "root-agent"
+        agent_workflow.model_contents = {"root-agent": []}
+        return agent_workflow
+
+    @pytest.mark.asyncio
+    async def test_partial_text_until_response(self, agent_workflow):
+        """Test that partial text accumulates per agent path and is dropped with the full response."""
+        await agent_workflow.add_partial_text(PartialText(agent_path="root-agent/search-agent", text="Found "))
+        await agent_workflow.add_partial_text(PartialText(agent_path="root-agent/search-agent", text="3 repos"))
+        await agent_workflow.add_partial_text(PartialText(agent_path="root-agent", text="Let me"))
+        assert agent_workflow.partial_version == 3
+        assert agent_workflow.partial_texts == {"root-agent/search-agent": "Found 3 repos", "root-agent": "Let me"}
+
+        agent_workflow._append_model_contents("root-agent/search-agent", ["Found 3 repos."])
+        assert agent_workflow.partial_version == 4
+        assert agent_workflow.partial_texts == {"root-agent": "Let me"}
+
+        agent_workflow._append_model_contents("root-agent/other-agent", ["Done."])
+        assert agent_workflow.partial_version == 4
+
+
+class TestModelRouting:
+    """Test suite for the routing of LLM calls across model tiers."""
+
+    @pytest.fixture
+    def agent_workflow(self):
+        agent_workflow = AgentWorkflow()
+        agent_workflow.agent_name = "root-agent"
+        agent_workflow.agent_path = "root-agent"
+        agent_workflow.model_contents["root-agent"] = []
+        agent_workflow.config = AgentConfig(
+            model_tiers=["gemini-2.0-flash", "gemini-2.5-flash", "gemini-2.5-pro"],
+            routing=ModelRouting(
+                models=["gemini-2.5-flash", "gemini-2.5-pro"],
+                long_context_tokens=1000,
+                escalation_keywords=["think hard"],
+            ),
+        )
+        return agent_workflow
+
+    def models(self, agent_workflow):
+        return [(choice.model, choice.reason) for choice in agent_workflow.model_choices]
+
+    @pytest.mark.asyncio
+    async def test_default_tier(self, agent_workflow):
+        """Test that calls use the agent's model until something escalates them."""
+        agent_workflow._start_turn("Hello", asyncio.Future())
+        assert agent_workflow._route() == 0
+        assert agent_workflow.model_choices == [
+            ModelChoice(turn=1, agent_path="root-agent", model="gemini-2.0-flash", reason=RoutingReason.DEFAULT),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_malformed_call_escalates_turn(self, agent_workflow):
+        """Test that escalations last until the end of the turn, one tier per malformed call."""
+        agent_workflow._start_turn("Hello", asyncio.Future())
+        agent_workflow._escalate(agent_workflow.turn_tier + 1, RoutingReason.MALFORMED_CALL)
+        assert agent_workflow._route() == 1
+        agent_workflow._escalate(agent_workflow.turn_tier + 1, RoutingReason.MALFORMED_CALL)
+        agent_workflow._escalate(agent_workflow.turn_tier + 1, RoutingReason.MALFORMED_CALL)
+        assert agent_workflow._route() == 2
+
+        agent_workflow._start_turn("Next", asyncio.Future())
+        assert agent_workflow._route() == 0
+        assert self.models(agent_workflow) == [
+            ("gemini-2.5-flash", RoutingReason.MALFORMED_CALL),
+            ("gemini-2.5-pro", RoutingReason.MALFORMED_CALL),
+            ("gemini-2.0-flash", RoutingReason.DEFAULT),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_long_context(self, agent_workflow):
+        """Test that calls past the long context threshold use the top tier."""
+        agent_workflow._start_turn("Hello", asyncio.Future())
+        agent_workflow.last_token_count = 1000
+        assert agent_workflow._route() == 2
+        assert self.models(agent_workflow) == [("gemini-2.5-pro", RoutingReason.LONG_CONTEXT)]
+
+    @pytest.mark.asyncio
+    async def test_keywords(self, agent_workflow):
+        """Test that prompts with an escalation keyword start at the top tier."""
+        agent_workflow._start_turn("Think hard about the release", asyncio.Future())
+        assert agent_workflow._route() == 2
+        assert self.models(agent_workflow) == [("gemini-2.5-pro", RoutingReason.KEYWORD)]
+
+    @pytest.mark.asyncio
+    async def test_escalate_signal(self, agent_workflow):
+        """Test that an escalation requested while idle applies to the next turn, and to the running one otherwise."""
+        await agent_workflow.escalate(1)
+        agent_workflow._start_turn("Hello", asyncio.Future())
+        assert agent_workflow._route() == 1
+
+        await agent_workflow.escalate()
+        assert agent_workflow._route() == 2
+        assert self.models(agent_workflow) == [
+            ("gemini-2.5-flash", RoutingReason.REQUESTED),
+            ("gemini-2.5-pro", RoutingReason.REQUESTED),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_no_routing(self):
+        """Test that agents without routing models neither escalate nor record choices."""
+        agent_workflow = AgentWorkflow()
+        agent_workflow.config = AgentConfig(model_tiers=["gemini-2.0-flash"])
+        agent_workflow._escalate(1, RoutingReason.MALFORMED_CALL)
+        assert agent_workflow._route() == 0
+        assert await agent_workflow.get_model_choices() == []
+
+    @pytest.mark.asyncio
+    async def test_model_choices_rollup(self, agent_workflow):
+        """Test that the model choices reported by sub-agents are kept with the agent's own."""
+        agent_workflow._start_turn("Hello", asyncio.Future())
+        agent_workflow._route()
+        sub_agent_choice = ModelChoice(
+            turn=1, agent_path="root-agent/search-agent", model="gemini-2.5-pro", reason=RoutingReason.LONG_CONTEXT,
+        )
+        await agent_workflow.add_model_choices([sub_agent_choice])
+        assert (await agent_workflow.get_model_choices())[1] == sub_agent_choice
+
+    @pytest.mark.asyncio
+    async def test_continue_as_new_keeps_routing(self, agent_workflow):
+        """Test that the model choices and a pending escalation survive continue-as-new."""
+        agent_workflow.agent_configs = {"root-agent": agent_workflow.config}
+        agent_workflow._start_turn("Hello", asyncio.Future())
+        agent_workflow._route()
+        agent_workflow.pending_respond = None # turn answered, the escalation waits for the next one
+        await agent_workflow.escalate(2)
+
+        next_workflow = AgentWorkflow()
+        next_workflow.terminate = True # stop right after restoring the state
+        next_input = agent_workflow._continue_as_new_input()
+        next_input.root_workflow_id = "root"
+        with patch.object(next_workflow, "_wait_for_prompt", new=AsyncMock()):
+            await next_workflow.run(next_input)
+
+        assert next_workflow.model_choices == agent_workflow.model_choices
+        next_workflow._start_turn("Next", asyncio.Future())
+        assert next_workflow._route() == 2
+
+    @pytest.mark.asyncio
+    async def test_continue_as_new_input_bounded(self, agent_workflow):
+        """Test that the carried model choices don't grow over repeated continue-as-new."""
+        agent_workflow.agent_configs = {"root-agent": agent_workflow.config}
+        converter = DataConverter.default.payload_converter
+        sizes = []
+        for cycle in range(5):
+            for _ in range(MAX_CARRIED_MODEL_CHOICES):
+                agent_workflow._start_turn("Hello", asyncio.Future())
+                agent_workflow._route()
+            next_input = agent_workflow._continue_as_new_input()
+            sizes.append(converter.to_payloads([next_input])[0].ByteSize())
+
+            agent_workflow = AgentWorkflow()
+            agent_workflow.terminate = True # stop right after restoring the state
+            next_input.root_workflow_id = "root"
+            with patch.object(agent_workflow, "_wait_for_prompt", new=AsyncMock()):
+                await agent_workflow.run(next_input)
+            agent_workflow.agent_path = "root-agent"
+
+        assert len(next_input.model_choices) == MAX_CARRIED_MODEL_CHOICES
+        assert next_input.model_choices[-1].turn == agent_workflow.turn
+        assert max(sizes[1:]) - min(sizes[1:]) < 0.05 * min(sizes[1:])
+
+
+class TestContinueAsNew:
+    """Test suite for a root session continuing as new between turns."""
+
+    def response(self, text: str, tokens: int) -> dict:
+        return GenerationResponse.from_dict({
+            "candidates": [{"content": model_text(text), "finish_reason": "STOP"}],
+            "usage_metadata": {
+                "prompt_token_count": tokens,
+                "candidates_token_count": 1,
+                "total_token_count": tokens + 1,
+            },
+        }).to_dict()
+
+    @pytest.mark.asyncio
+    async def test_run_continues_as_new(self):
+        """Test that a queued prompt holds off continue-as-new, and the next run gets the compacted state."""
+        requests = []
+
+        async def execute_call_llm(agent_workflow, llm_input):
+            requests.append(llm_input.contents)
+            prompt = llm_input.contents[-1]["parts"][0]["text"]
+            return self.response(f"Answer to {prompt}", tokens=10)
+
+        async def wait_condition(fn, timeout=None):
+            while not fn():
+                await asyncio.sleep(0)
+
+        config = AgentConfig(max_history_events=2, continue_as_new_keep_turns=1)
+        info = MagicMock(workflow_id="root-agent-1234")
+        info.is_continue_as_new_suggested.return_value = False
+        info.get_current_history_size.return_value = 0
+
+        agent_workflow = AgentWorkflow()
+        # the history grows with the conversation, past the threshold after the first turn
+        info.get_current_history_length.side_effect = lambda: len(agent_workflow.dict_contents)
+        responds = [asyncio.Future() for _ in range(2)]
+        agent_workflow.prompt_queue.extend(zip(["first", "second"], responds))
+        with (
+            patch.object(AgentWorkflow, "_execute_call_llm", new=execute_call_llm),
+            patch("temporal.agent.workflow.workflow.info", return_value=info),
+            patch("temporal.agent.workflow.workflow.wait_condition", new=wait_condition),
+            patch("temporal.agent.workflow.workflow.all_handlers_finished", return_value=True),
+            patch("temporal.agent.workflow.workflow.continue_as_new", side_effect=asyncio.CancelledError) as mock_continue,
+        ):
+            with pytest.raises(asyncio.CancelledError):
+                await agent_workflow.run(AgentWorkflowInput(
+                    agent_name="root-agent",
+                    is_root_agent=True,
+                    agent_configs={"root-agent": config},
+                ))
+            # the second prompt was queued when the first turn ended, so both were answered in this run
+            assert [respond.result() for respond in responds] == ["Answer to first", "Answer to second"]
+            mock_continue.assert_called_once()
+            next_input = mock_continue.call_args.args[0]
+
+            next_workflow = AgentWorkflow()
+            info.get_current_history_length.side_effect = lambda: len(next_workflow.dict_contents)
+            responds = [asyncio.Future() for _ in range(2)]
+            next_workflow.prompt_queue.extend(zip(["third", "END"], responds))
+            await next_workflow.run(next_input)
+
+        assert requests[-1] == [
+            user_prompt("second"),
+            model_text("Answer to second"),
+            user_prompt("third"),
+        ]
+        assert responds[0].result() == "Answer to third"
+        assert next_workflow.turn == 4
+        assert next_workflow.usage == {
+            "root-agent": TokenUsage(llm_calls=3, prompt_tokens=30, candidate_tokens=3, total_tokens=33),
+        }
+
+    @pytest.mark.asyncio
+    async def test_session_continues_as_new(self):
+        """Test that a session keeps its conversation and usage across a continue-as-new on the test server."""
+        try:
+            env = await WorkflowEnvironment.start_time_skipping()
+        except RuntimeError as e:
+            pytest.skip(f"Temporal test server unavailable: {e}")
+        agent = Agent(name="root-agent", max_history_events=10, continue_as_new_keep_turns=1)
+        requests = []
+
+        def reply(request):
+            requests.append(request.contents)
+            prompt = request.last_prompt()
+            # the first answer takes long enough for the second prompt to queue behind it
+            return FakeReply(text=f"Answer to {prompt}", latency=1.0 if prompt == "first" else 0.0)
+
+        backend = FakeLLMBackend().add_rule(reply)
+        llm_manager = LLMManager(agent, backend=backend)
+        async with env, Worker(
+            env.client,
+            task_queue="agent-task-queue",
+            workflows=[AgentWorkflow],
+            activities=[llm_manager.call_llm, llm_manager.summarize_contents],
+        ):
+            async with Session(agent=agent, client=env.client) as session:
+                handle = env.client.get_workflow_handle(session.workflow_id)
+                first_run_id = (await handle.describe()).run_id
+
+                first = asyncio.create_task(session.prompt("first"))
+                while not requests:
+                    await asyncio.sleep(0.05)
+                assert await asyncio.gather(first, session.prompt("second")) == [
+                    "Answer to first", "Answer to second",
+                ]
+                assert await session.prompt("third") == "Answer to third"
+
+                assert (await handle.describe()).run_id != first_run_id
+                assert requests[-1] == [
+                    user_prompt("second"),
+                    model_text("Answer to second"),
+                    user_prompt("third"),
+                ]
+                assert (await session.usage())["root-agent"].llm_calls == 3
+
+
+class TestAgentWorkflowInput:
+    """Test suite for the workflow input payload."""
+
+    def test_payload_roundtrip(self):
+        """Test that the input, including defaulted and nested settings, survives the data converter."""
+        converter = DataConverter.default.payload_converter
+        agent_input = AgentWorkflowInput(
+            agent_name="root-agent",
+            sub_agents={"search-agent": {}},
+            contents=[user_prompt("first")],
+            is_root_agent=True,
+            usage={"root-agent": TokenUsage(llm_calls=1, prompt_tokens=10, total_tokens=10)},
+            model_choices=[
+                ModelChoice(turn=1, agent_path="root-agent", model="gemini-2.5-pro", reason=RoutingReason.KEYWORD),
+            ],
+            requested_tier=1,
+            agent_configs={
+                "root-agent": AgentConfig(),
+                "search-agent": AgentConfig(
+                    context_policy=ContextPolicy.SUMMARY,
+                    token_budget=1000,
+                    function_options={"search": ActivityOptions(heartbeat_timeout=30)},
+                    model_tiers=["gemini-2.0-flash", "gemini-2.5-pro"],
+                    routing=ModelRouting(models=["gemini-2.5-pro"], long_context_tokens=100000),
+                ),
+            },
+        )
+
+        payloads = converter.to_payloads([agent_input])
+        assert converter.from_payloads(payloads, [AgentWorkflowInput]) == [agent_input]
+
+
+class TestWorkflowSandbox:
+    """Test suite for loading the workflow in the worker's sandbox."""
+
+    @pytest.mark.asyncio
+    async def test_sandbox_validation(self):
+        """Test that the workflow and the modules it imports pass the sandbox restrictions."""
+        SandboxedWorkflowRunner().prepare_workflow(workflow._Definition.must_from_class(AgentWorkflow))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])